@@ -0,0 +1,390 @@
+"""
+End-to-end performance benchmark against a stub Ollama server and a synthetic workbook:
+/query latency percentiles and throughput, ingestion time and structured search times
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import httpx
+import numpy as np
+import pandas as pd
+
+import rag_backend.main as main
+from rag_backend.config import settings
+from rag_backend.rag_agent import embed_store
+from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+from rag_backend.rag_agent.load_excel import load_excel_data
+from rag_backend.rag_agent.rag_chain import build_rag_chain
+
+DEPARTMENTS = ["Engineering", "Sales", "Finance", "Marketing", "Operations", "Human Resources", "Legal", "Support"]
+TITLES = ["Engineer", "Senior Engineer", "Manager", "Director", "Analyst", "Specialist", "Coordinator", "Lead"]
+LOCATIONS = ["New York", "Austin", "London", "Toronto", "Remote", "Singapore"]
+SKILLS = ["Python", "SQL", "Negotiation", "Excel", "Kubernetes", "Design", "Forecasting", "Recruiting"]
+FIRST_NAMES = ["Alex", "Jordan", "Sam", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Patel", "Kim", "Nguyen", "Brown", "Lopez", "Khan", "Silva"]
+
+DEFAULT_QUESTIONS = [
+    "Who works in Engineering in Austin?",
+    "Which employees know Kubernetes?",
+    "Who is a Director in Sales?",
+    "Tell me about someone in Legal based in London",
+    "Who should I contact about recruiting?",
+    "Which analysts work remotely?",
+]
+
+
+class StubOllamaServer:
+    """
+    Minimal Ollama API on a local port: deterministic hashing embeddings from
+    /api/embeddings and a fixed streamed answer from /api/generate, each after a
+    configurable delay standing in for model time.
+    """
+
+    def __init__(self, embed_delay: float = 0.0, generate_delay: float = 0.0, answer_tokens: int = 20,
+                 dim: int = 384, model: str = "phi3"):
+        self.embed_delay = embed_delay
+        self.generate_delay = generate_delay
+        self.answer_tokens = answer_tokens
+        self.model = model
+        self.embeddings = HashingEmbeddings(dim=dim)
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, payload: Dict, status: int = 200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.rstrip("/")
+                stub._count(path)
+                if path == "/api/tags":
+                    self._json({"models": [{"name": stub.model}]})
+                else:
+                    self._json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                path = self.path.rstrip("/")
+                stub._count(path)
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if path == "/api/embeddings":
+                    time.sleep(stub.embed_delay)
+                    self._json({"embedding": stub.embeddings.embed_query(request.get("prompt", ""))})
+                elif path == "/api/generate":
+                    self._generate(request)
+                else:
+                    self._json({"error": "not found"}, status=404)
+
+            def _generate(self, request: Dict):
+                tokens = [f"token{i} " for i in range(stub.answer_tokens)]
+                if not request.get("stream", True):
+                    time.sleep(stub.generate_delay)
+                    self._json({"model": stub.model, "response": "".join(tokens), "done": True})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                delay = stub.generate_delay / max(1, len(tokens))
+                lines = [{"model": stub.model, "response": t, "done": False} for t in tokens]
+                lines.append({"model": stub.model, "response": "", "done": True})
+                for line in lines:
+                    time.sleep(delay)
+                    data = (json.dumps(line) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def write_synthetic_workbook(path: Path, rows: int, seed: int = 0) -> Path:
+    """Write an employee workbook with the columns of the real HR export and ``rows`` rows"""
+    rng = np.random.default_rng(seed)
+    first = rng.choice(FIRST_NAMES, rows)
+    last = rng.choice(LAST_NAMES, rows)
+    start = pd.Timestamp("2010-01-01") + pd.to_timedelta(rng.integers(0, 5000, rows), unit="D")
+    pd.DataFrame({
+        "Name": [f"{f} {l} {i}" for i, (f, l) in enumerate(zip(first, last))],
+        "Email": [f"{f.lower()}.{l.lower()}{i}@company.com" for i, (f, l) in enumerate(zip(first, last))],
+        "Title": rng.choice(TITLES, rows),
+        "Department": rng.choice(DEPARTMENTS, rows),
+        "Location": rng.choice(LOCATIONS, rows),
+        "Start Date": start,
+        "Skills": [", ".join(rng.choice(SKILLS, 2, replace=False)) for _ in range(rows)],
+    }).to_excel(path, index=False)
+    return path
+
+
+def latency_summary(latencies_ms: Sequence[float]) -> Dict[str, float]:
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    if not len(values):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(len(values)),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+@contextmanager
+def overrides(target, **values) -> Iterator[None]:
+    """Temporarily set attributes on a module or the settings object"""
+    previous = {name: getattr(target, name) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+def benchmark_ingestion(workbook: Path) -> Dict:
+    """Parse the workbook (cold, then from its snapshot) and build the index from scratch"""
+    cold_ms = _timed(load_excel_data, str(workbook))
+    cached_ms = _timed(load_excel_data, str(workbook))
+    with overrides(embed_store, EXCEL_PATH=workbook, INDEX_PATH=Path(settings.faiss_index_path)):
+        embed_ms = _timed(embed_store.embed_and_store, full_rebuild=True)
+    return {
+        "load_excel_cold_ms": round(cold_ms, 3),
+        "load_excel_snapshot_ms": round(cached_ms, 3),
+        "embed_and_store_ms": round(embed_ms, 3),
+    }
+
+
+def benchmark_engine(workbook: Path, repeats: int = 50, seed: int = 0) -> Dict:
+    """Load time and per-call latency of EmployeeQueryEngine lookups"""
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    engine = EmployeeQueryEngine(str(workbook))
+    load_ms = (time.perf_counter() - start) * 1000
+    emails = engine.df["email"].to_numpy()
+    operations = {
+        "search_by_name": lambda: engine.search_by_name(str(rng.choice(LAST_NAMES))),
+        "search_by_department": lambda: engine.search_by_department(str(rng.choice(DEPARTMENTS))),
+        "search_by_role": lambda: engine.search_by_role(str(rng.choice(TITLES))),
+        "get_employee_by_email": lambda: engine.get_employee_by_email(str(rng.choice(emails))),
+        "search_by_experience": lambda: engine.search_by_experience(min_years=float(rng.integers(1, 10))),
+        "get_department_stats": engine.get_department_stats,
+    }
+    return {
+        "load_ms": round(load_ms, 3),
+        "operations": {name: latency_summary([_timed(op) for _ in range(repeats)])
+                       for name, op in operations.items()},
+    }
+
+
+async def _drive_queries(questions: Sequence[str], total: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://benchmark", timeout=None) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/query", json={
+                    "message": questions[i % len(questions)], "include_timings": True})
+                latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+                return
+            for name, ms in (response.json().get("timings") or {}).items():
+                stages.setdefault(name, []).append(ms)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "qps": round(total / wall, 3) if wall else None,
+        "latency": latency_summary(latencies),
+        "stages_mean_ms": {name: round(float(np.mean(v)), 3) for name, v in sorted(stages.items())},
+    }
+
+
+def benchmark_queries(questions: Sequence[str], total: int, concurrency: int) -> Dict:
+    """Serve ``total`` /query requests through the app with at most ``concurrency`` in flight"""
+    chain = build_rag_chain()
+    # Every request takes the RAG path: no structured shortcut, no cached answers
+    with overrides(main, rag_chain=chain, query_router=None), overrides(settings, enable_query_cache=False):
+        return asyncio.run(_drive_queries(list(questions), total, concurrency))
+
+
+def run_benchmark(rows: int = 1000, requests: int = 100, concurrency: int = 4, embed_delay: float = 0.0,
+                  generate_delay: float = 0.0, answer_tokens: int = 20, engine_repeats: int = 50,
+                  questions: Sequence[str] = DEFAULT_QUESTIONS, workdir: Optional[Path] = None,
+                  seed: int = 0) -> Dict:
+    """
+    Build a synthetic workbook and index in ``workdir`` (a temporary directory by
+    default), point the backend at a stub Ollama server and measure every stage.
+    Global settings are restored afterwards.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(workdir or tmp)
+        root.mkdir(parents=True, exist_ok=True)
+        workbook = write_synthetic_workbook(root / "employees.xlsx", rows, seed=seed)
+        with StubOllamaServer(embed_delay, generate_delay, answer_tokens) as stub, overrides(
+            settings,
+            ollama_base_url=stub.url,
+            embedding_provider="ollama",
+            embedding_reduced_dim=None,
+            faiss_index_path=str(root / "faiss_index"),
+            embedding_cache_path=str(root / "embedding_cache.sqlite"),
+            data_snapshot_dir=str(root / "data_cache"),
+            enable_data_snapshot=True,
+        ):
+            report = {
+                "config": {
+                    "rows": rows, "requests": requests, "concurrency": concurrency,
+                    "embed_delay_s": embed_delay, "generate_delay_s": generate_delay,
+                    "answer_tokens": answer_tokens, "index_type": settings.faiss_index_type,
+                    "retriever": settings.rag_retriever, "seed": seed,
+                },
+                "ingestion": benchmark_ingestion(workbook),
+                "engine": benchmark_engine(workbook, repeats=engine_repeats, seed=seed),
+                "query": benchmark_queries(questions, requests, concurrency),
+                "stub_requests": dict(stub.requests),
+            }
+    return report
+
+
+def _metrics(report: Dict) -> Dict[str, float]:
+    """Flatten the lower-is-better numbers of a report for comparison"""
+    flat = dict(report["ingestion"])
+    flat["engine_load_ms"] = report["engine"]["load_ms"]
+    for name, summary in report["engine"]["operations"].items():
+        flat[f"engine_{name}_p95_ms"] = summary["p95_ms"]
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        flat[f"query_{key}"] = report["query"]["latency"][key]
+    return flat
+
+
+def compare_reports(current: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """Metrics that got more than ``tolerance`` slower than the baseline, plus any QPS drop beyond it"""
+    regressions = []
+    now, before = _metrics(current), _metrics(baseline)
+    for name, value in now.items():
+        old = before.get(name)
+        if old and value > old * (1 + tolerance):
+            regressions.append({"metric": name, "baseline": old, "current": value, "ratio": round(value / old, 3)})
+    qps, old_qps = current["query"]["qps"], baseline["query"]["qps"]
+    if qps and old_qps and qps < old_qps * (1 - tolerance):
+        regressions.append({"metric": "query_qps", "baseline": old_qps, "current": qps,
+                            "ratio": round(qps / old_qps, 3)})
+    return regressions
+
+
+def _print_report(report: Dict):
+    config, query = report["config"], report["query"]
+    print(f"\n{config['rows']} rows, {query['requests']} queries at concurrency {query['concurrency']}")
+    for name, value in report["ingestion"].items():
+        print(f"  {name:<28} {value:>10.1f}")
+    latency = query["latency"]
+    print(f"  /query p50/p95/p99 ms       {latency['p50_ms']:.1f} / {latency['p95_ms']:.1f} / "
+          f"{latency['p99_ms']:.1f}  ({query['qps']} QPS, {query['errors']} errors)")
+    for name, ms in query["stages_mean_ms"].items():
+        print(f"    {name:<26} {ms:>10.2f}")
+    print(f"  engine load ms              {report['engine']['load_ms']:.1f}")
+    for name, summary in report["engine"]["operations"].items():
+        print(f"    {name:<26} p50 {summary['p50_ms']:.3f}  p95 {summary['p95_ms']:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, structured search and /query end to end")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="Seconds the stub spends per embedding")
+    parser.add_argument("--generate-delay", type=float, default=0.0, help="Seconds the stub spends per answer")
+    parser.add_argument("--answer-tokens", type=int, default=20)
+    parser.add_argument("--engine-repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep the workbook and index here instead of a temporary directory")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --json report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run_benchmark(rows=args.rows, requests=args.requests, concurrency=args.concurrency,
+                           embed_delay=args.embed_delay, generate_delay=args.generate_delay,
+                           answer_tokens=args.answer_tokens, engine_repeats=args.engine_repeats,
+                           workdir=Path(args.workdir) if args.workdir else None, seed=args.seed)
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} (x{r['ratio']})")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline")
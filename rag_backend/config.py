@@ -1,8 +1,9 @@
 """
 Configuration management for the RAG backend
 """
+import glob
 import os
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -21,20 +22,68 @@ class Settings(BaseSettings):
     # Ollama Configuration
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "phi3"
-    ollama_embedding_model: str = "phi3"
+    ollama_embedding_model: str = "phi3"  # Can be a smaller dedicated model (e.g. nomic-embed-text); rebuild the index after changing
+    ollama_num_ctx: Optional[int] = None  # Context window; None uses the model default
+    ollama_num_predict: Optional[int] = None  # Max answer tokens; None uses the model default
+    ollama_temperature: Optional[float] = None
+    ollama_keep_alive: Optional[str] = None  # Keep models loaded between requests, e.g. "30m"; None uses Ollama's default
+    ollama_max_connections: int = 32  # Pooled HTTP connections to Ollama shared by embeddings, generation and health
+    ollama_keepalive_expiry: float = 60.0  # Seconds an idle pooled connection stays open
+    health_probe_interval: float = 10.0  # Seconds between background Ollama/index health checks
+    health_probe_timeout: float = 2.0  # Ollama reachability timeout for one health check
+    startup_preload_models: bool = True  # Load the LLM and embedding models into Ollama while the index loads
+    startup_preload_timeout: float = 120.0  # Seconds allowed for Ollama to load one model
+    startup_warmup_query: Optional[str] = "Who works in Engineering?"  # Run once before reporting ready; None skips
     
     # FAISS Configuration
     faiss_index_path: str = "faiss_index"
     faiss_allow_dangerous_deserialization: bool = True
+    faiss_index_type: str = "flat"  # flat | ivf_flat | hnsw | ivf_pq
+    faiss_nlist: int = 100  # IVF lists (clamped for small corpora)
+    faiss_nprobe: int = 8  # IVF lists searched per query
+    faiss_hnsw_m: int = 32
+    faiss_ef_construction: int = 200
+    faiss_ef_search: int = 64  # HNSW candidate list size per query
+    faiss_pq_m: int = 16  # PQ sub-quantizers (must divide the vector dimension)
+    faiss_pq_nbits: int = 8
+    index_watch_interval: int = 10  # Seconds between checks for a rebuilt index; 0 disables hot reload
+    
+    # Embedding Pipeline Configuration
+    embedding_provider: str = "ollama"  # ollama | hashing (offline lexical stand-in, no model server needed)
+    hashing_embedding_dim: int = 384
+    embedding_reduced_dim: Optional[int] = None  # Project vectors to this many dimensions before indexing; None keeps them
+    embedding_reduction: str = "pca"  # pca | truncate (keep leading dims, for Matryoshka-trained models)
+    embedding_batch_size: int = 32
+    embedding_concurrency: int = 4  # Parallel requests to Ollama while indexing
+    embedding_max_retries: int = 3
+    embedding_cache_path: str = "embedding_cache.sqlite"
     
     # Data Configuration
     excel_data_path: str = "../data/MasterEmployeeProfiles.xlsx"
+    excel_data_paths: Optional[List[str]] = None  # Glob patterns of workbooks to ingest together; None uses excel_data_path
+    excel_sheets: Optional[List[str]] = None  # Sheet names to read from each workbook, ["*"] for all; None = first sheet
+    ingest_workers: int = 0  # Processes parsing sheets in parallel; 0 = one per CPU
+    enable_data_snapshot: bool = True  # Cache parsed workbooks as Parquet/pickle snapshots
+    data_snapshot_dir: str = "data_cache"
+    document_columns: Optional[List[str]] = None  # Columns (in order) included in each row's text; None = all
+    ingest_chunk_size: int = 1000  # Rows turned into Documents and embedded per chunk
     
     # RAG Configuration
-    rag_chain_type: str = "stuff"
+    rag_chain_type: str = "stuff"  # stuff | map_reduce | refine | map_rerank
     rag_k: int = 4  # Number of documents to retrieve
-    rag_search_type: str = "similarity"
-    
+    rag_search_type: str = "similarity"  # similarity | mmr
+    rag_retriever: str = "hybrid"  # vector | hybrid (BM25 + vector, fused by reciprocal rank)
+    hybrid_fetch_k: int = 20  # Candidates taken from each retriever before fusion
+    hybrid_rrf_k: int = 60  # RRF rank constant; larger values flatten rank differences
+    hybrid_vector_weight: float = 0.5  # Share of the fused score given to vector ranks (rest to BM25)
+    rag_department_shards: bool = False  # Per-department sub-indexes so department-filtered searches scan only their shard
+    
+    # Context Budget Configuration
+    enable_context_compression: bool = True  # Trim retrieved records to question-relevant fields
+    context_max_tokens: int = 1024  # Approximate token budget for retrieved context in the prompt
+    context_core_fields: List[str] = ["name", "title", "department"]  # Always kept (substring of field name)
+    context_max_answer_tokens: Optional[int] = 256  # Caps num_predict; None leaves it to OLLAMA_NUM_PREDICT
+
     # Logging Configuration
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -47,12 +96,30 @@ class Settings(BaseSettings):
     
     # Security Configuration
     enable_rate_limiting: bool = False
-    rate_limit_requests: int = 100
+    rate_limit_requests: int = 100  # Queries per client per window (a batch counts each query)
     rate_limit_window: int = 3600  # 1 hour
+    rate_limit_burst: Optional[int] = None  # Token bucket size; None allows the whole window's quota at once
+    admin_token: Optional[str] = None  # Enables /admin endpoints, which require it as X-Admin-Token
+    trusted_client_hosts: List[str] = []  # Peer addresses (e.g. the Teams bot) whose X-Client-Id is honoured
+    client_id_secret: Optional[str] = None  # Callers sending it as X-Client-Secret may also set X-Client-Id
     
     # Performance Configuration
-    max_concurrent_requests: int = 10
+    max_concurrent_requests: int = 10  # Requests admitted at once (running + queued)
     request_timeout: int = 30
+    rag_worker_threads: int = 2  # Threads running blocking RAG work
+    bulk_max_queue_depth: int = 4  # Bulk work (batches, X-Priority: bulk) is shed once this many requests wait
+    batch_max_queries: int = 50  # Largest batch accepted by /query/batch
+    batch_concurrency: int = 2  # Generations from one batch running at once
+    
+    # Routing Configuration
+    enable_query_router: bool = True  # Answer structured lookups from the employee table without the LLM
+    
+    # Answer Cache Configuration
+    enable_query_cache: bool = True
+    query_cache_max_size: int = 256
+    query_cache_ttl: int = 3600  # Seconds; 0 disables expiry
+    enable_semantic_cache: bool = True  # Also match paraphrased questions by embedding
+    query_cache_similarity_threshold: float = 0.95
     
     class Config:
         env_file = ".env"
@@ -63,15 +130,28 @@ settings = Settings()
 
 def get_excel_path() -> str:
     """Get the absolute path to the Excel file"""
-    # If it's a relative path, make it absolute from the project root
+    # If it's a relative path, resolve it from the rag_backend directory
+    # (the default "../data/..." points at the project's data folder)
     if not os.path.isabs(settings.excel_data_path):
-        # Get the directory where this config file is located
         config_dir = os.path.dirname(os.path.abspath(__file__))
-        # Go up to the project root and then to the data directory
-        project_root = os.path.dirname(config_dir)
-        return os.path.join(project_root, settings.excel_data_path)
+        return os.path.normpath(os.path.join(config_dir, settings.excel_data_path))
     return settings.excel_data_path
 
+def get_excel_sources() -> List[str]:
+    """Workbooks to ingest: matches of EXCEL_DATA_PATHS globs, or just the EXCEL_DATA_PATH workbook"""
+    if not settings.excel_data_paths:
+        return [get_excel_path()]
+    config_dir = os.path.dirname(os.path.abspath(__file__))
+    sources = []
+    for pattern in settings.excel_data_paths:
+        if not os.path.isabs(pattern):
+            pattern = os.path.join(config_dir, pattern)
+        for path in sorted(glob.glob(os.path.normpath(pattern), recursive=True)):
+            # Skip Excel's "~$" lock files for workbooks that are open
+            if not os.path.basename(path).startswith("~$") and path not in sources:
+                sources.append(path)
+    return sources
+
 def get_faiss_index_path() -> str:
     """Get the absolute path to the FAISS index"""
     if not os.path.isabs(settings.faiss_index_path):
@@ -79,14 +159,30 @@ def get_faiss_index_path() -> str:
         return os.path.join(config_dir, settings.faiss_index_path)
     return settings.faiss_index_path
 
+def get_snapshot_dir() -> str:
+    """Get the absolute path to the directory holding parsed workbook snapshots"""
+    if not os.path.isabs(settings.data_snapshot_dir):
+        config_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(config_dir, settings.data_snapshot_dir)
+    return settings.data_snapshot_dir
+
+def get_embedding_cache_path() -> str:
+    """Get the absolute path to the on-disk embedding cache"""
+    if not os.path.isabs(settings.embedding_cache_path):
+        config_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(config_dir, settings.embedding_cache_path)
+    return settings.embedding_cache_path
+
 def validate_configuration() -> bool:
     """Validate that all required configuration is present"""
     errors = []
     
-    # Check if Excel file exists
-    excel_path = get_excel_path()
-    if not os.path.exists(excel_path):
-        errors.append(f"Excel file not found: {excel_path}")
+    # Check that the workbook(s) exist
+    if settings.excel_data_paths:
+        if not get_excel_sources():
+            errors.append(f"No workbooks match: {settings.excel_data_paths}")
+    elif not os.path.exists(get_excel_path()):
+        errors.append(f"Excel file not found: {get_excel_path()}")
     
     # Check if FAISS index exists
     faiss_path = get_faiss_index_path()
@@ -95,12 +191,10 @@ def validate_configuration() -> bool:
     
     # Check Ollama connection
     try:
-        import requests
-        response = requests.get(f"{settings.ollama_base_url}/api/tags", timeout=5)
-        if response.status_code != 200:
-            errors.append(f"Ollama not accessible at {settings.ollama_base_url}")
+        from rag_backend.rag_agent.ollama_client import get_ollama_client
+        get_ollama_client().list_models(timeout=5)
     except Exception as e:
-        errors.append(f"Cannot connect to Ollama: {e}")
+        errors.append(f"Cannot connect to Ollama at {settings.ollama_base_url}: {e}")
     
     if errors:
         print("Configuration validation failed:")
@@ -121,6 +215,8 @@ def print_configuration():
     print(f"  Ollama URL: {settings.ollama_base_url}")
     print(f"  Ollama Model: {settings.ollama_model}")
     print(f"  Excel Path: {get_excel_path()}")
+    if settings.excel_data_paths:
+        print(f"  Excel Sources: {get_excel_sources()} (sheets: {settings.excel_sheets or 'first'})")
     print(f"  FAISS Index Path: {get_faiss_index_path()}")
     print(f"  RAG K: {settings.rag_k}")
     print(f"  Log Level: {settings.log_level}")
@@ -0,0 +1,71 @@
+"""
+Background health prober: checks Ollama on an interval so /health answers from cache
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from rag_backend.rag_agent.ollama_client import OllamaClient
+
+
+class HealthProber:
+    """
+    Polls Ollama's /api/tags every ``interval`` seconds and keeps the latest result.
+    Readers never wait on the network; a check that fails or times out marks Ollama
+    unavailable until the next successful one.
+    """
+
+    def __init__(self, client: OllamaClient, interval: float = 10.0, timeout: float = 2.0,
+                 required_models: Optional[List[str]] = None):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.required_models = required_models or []
+        self._status: Dict[str, Any] = {
+            "ollama_available": False,
+            "missing_models": [],
+            "latency_ms": None,
+            "error": "not checked yet",
+            "checked_at": None,
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def status(self) -> Dict[str, Any]:
+        return dict(self._status)
+
+    async def probe(self) -> Dict[str, Any]:
+        """Run one check now and cache its result"""
+        start = time.perf_counter()
+        try:
+            models = await asyncio.wait_for(self.client.alist_models(timeout=self.timeout), self.timeout)
+            # Ollama reports tagged names ("phi3:latest"); a bare configured name matches any tag
+            names = set(models) | {m.split(":")[0] for m in models}
+            status = {
+                "ollama_available": True,
+                "missing_models": [m for m in self.required_models if m not in names],
+                "error": None,
+            }
+        except Exception as e:
+            status = {"ollama_available": False, "missing_models": [], "error": str(e) or type(e).__name__}
+        status["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        status["checked_at"] = time.time()
+        self._status = status
+        return self.status()
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,13 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple, Union
+import asyncio
+import hmac
+import json
 import logging
-from rag_backend.rag_agent.rag_chain import build_rag_chain
+import math
+import threading
+import time
+from rag_backend.rag_agent.query_cache import QueryCache, index_version, unit_vector
+from rag_backend.rag_agent.query_filters import filters_key, normalize_filters
+from rag_backend.config import settings, get_faiss_index_path, get_excel_sources
+from rag_backend.query_pool import QueryPool, PoolSaturatedError, PoolTimeoutError
+from rag_backend.health import HealthProber
+from rag_backend.rate_limit import TokenBucketLimiter
+from rag_backend.rag_agent.ollama_client import close_ollama_client, get_ollama_client
+from rag_backend.startup import StartupProgress
+from rag_backend.metrics import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUESTS_TOTAL, QUERIES_TOTAL, REGISTRY, StageTimings, activate, record_stage,
+    stage,
+)
 import os
 
+if TYPE_CHECKING:
+    from rag_backend.rag_agent.query_router import QueryRouter
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,34 +53,341 @@ static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
 if os.path.isdir(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
-# Global RAG chain instance
+# Global RAG chain instance (swapped atomically on index reload)
 rag_chain = None
+loaded_index_version = None
+last_reload: Optional[Dict[str, Any]] = None
+index_reload_lock = asyncio.Lock()
+index_watch_task = None
+init_task = None
+
+# Structured fast path (populated on startup)
+query_router: Optional["QueryRouter"] = None
+
+# Index, router and model loading run in the background after startup; /ready reports progress
+startup = StartupProgress()
+
+# The RAG pipeline (LangChain, FAISS, pandas) takes seconds to import, so it is loaded on
+# first use (by the background initialization) rather than when this module is imported
+def build_rag_chain():
+    from rag_backend.rag_agent.rag_chain import build_rag_chain as build
+    return build()
+
+def chain_config() -> Dict[str, Any]:
+    from rag_backend.rag_agent.rag_chain import chain_config as config
+    return config()
+
+def answer_query(chain, query: str, filters: Optional[Dict[str, Any]] = None, query_vector=None) -> Dict[str, Any]:
+    from rag_backend.rag_agent.rag_chain import answer_query as answer
+    return answer(chain, query, filters, query_vector)
+
+def answer_from_documents(chain, query: str, docs) -> Dict[str, Any]:
+    from rag_backend.rag_agent.rag_chain import answer_from_documents as answer
+    return answer(chain, query, docs)
+
+def batch_retrieve(chain, queries: List[str], filters=None, vectors=None):
+    from rag_backend.rag_agent.rag_chain import batch_retrieve as retrieve
+    return retrieve(chain, queries, filters, vectors)
+
+def stream_rag_answer(chain, query: str, filters: Optional[Dict[str, Any]] = None, query_vector=None):
+    from rag_backend.rag_agent.rag_chain import stream_rag_answer as stream
+    return stream(chain, query, filters, query_vector)
+
+def warm_up(chain, query: str) -> int:
+    from rag_backend.rag_agent.rag_chain import warm_up as run
+    return run(chain, query)
+
+# Bounded pool that keeps blocking LLM calls off the event loop
+query_pool = QueryPool(
+    max_workers=settings.rag_worker_threads,
+    max_in_flight=settings.max_concurrent_requests,
+    timeout=settings.request_timeout,
+    bulk_max_queue_depth=settings.bulk_max_queue_depth,
+)
+
+# Per-client query quota, enforced when enable_rate_limiting is set
+rate_limiter = TokenBucketLimiter(
+    capacity=settings.rate_limit_burst or settings.rate_limit_requests,
+    refill_rate=settings.rate_limit_requests / max(1, settings.rate_limit_window),
+)
+
+# Cache of answers for repeated questions, invalidated when the index changes
+answer_cache = QueryCache(
+    max_size=settings.query_cache_max_size if settings.enable_query_cache else 0,
+    ttl=settings.query_cache_ttl,
+    similarity_threshold=settings.query_cache_similarity_threshold,
+)
+
+def _ollama_models() -> List[Tuple[str, bool]]:
+    """(model, is_embedding_model) pairs the app needs from Ollama"""
+    models = [(settings.ollama_model, False)]
+    if settings.embedding_provider == "ollama":
+        models.append((settings.ollama_embedding_model, True))
+    return models
+
+# Ollama reachability, refreshed in the background so /health never waits on the network
+health_prober = HealthProber(
+    get_ollama_client(),
+    interval=settings.health_probe_interval,
+    timeout=settings.health_probe_timeout,
+    required_models=list(dict.fromkeys(model for model, _ in _ollama_models())),
+)
+
+def _collect_gauges():
+    pool = query_pool.stats()
+    return [
+        ("rag_pool_in_flight", "Queries admitted to the worker pool", pool["in_flight"]),
+        ("rag_pool_queue_depth", "Admitted queries waiting for a worker", pool["queue_depth"]),
+        ("rag_pool_queued_interactive", "Interactive queries waiting for a worker",
+         pool["queued_by_priority"]["interactive"]),
+        ("rag_pool_queued_bulk", "Bulk queries waiting for a worker", pool["queued_by_priority"]["bulk"]),
+        ("rag_cache_entries", "Answers held in the query cache", answer_cache.stats().get("size", 0)),
+        ("rag_index_documents", "Documents in the loaded FAISS index",
+         len(rag_chain.retriever.vectorstore.index_to_docstore_id) if rag_chain else 0),
+        ("rag_ollama_available", "1 if the last background health check reached Ollama",
+         int(health_prober.status()["ollama_available"])),
+        ("rag_ready", "1 once background initialization has finished with an index loaded", int(_is_ready())),
+    ]
+
+def _collect_counters():
+    pool = query_pool.stats()
+    cache = answer_cache.stats()
+    return [
+        ("rag_pool_rejected_total", "Queries rejected because the pool was saturated", pool["rejected"]),
+        ("rag_pool_timed_out_total", "Queries that exceeded the request timeout", pool["timed_out"]),
+        ("rag_pool_rejected_bulk_total", "Bulk queries shed or rejected", pool["rejected_by_priority"]["bulk"]),
+        ("rag_rate_limited_total", "Requests refused by the per-client rate limit", rate_limiter.limited),
+        ("rag_cache_hits_total", "Exact query cache hits", cache.get("hits", 0)),
+        ("rag_cache_semantic_hits_total", "Semantic query cache hits", cache.get("semantic_hits", 0)),
+        ("rag_cache_misses_total", "Query cache misses", cache.get("misses", 0)),
+    ]
+
+REGISTRY.register_collector(_collect_gauges)
+REGISTRY.register_collector(_collect_counters, "counter")
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """Count requests and time them (for streams, until the response starts)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS_TOTAL.inc(method=request.method, path=path, status=status)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, path=path)
+
+class QueryFilters(BaseModel):
+    """Restrict retrieval to matching employees; values are case-insensitive and a list matches any of them"""
+    model_config = {"extra": "forbid"}
+
+    department: Optional[Union[str, List[str]]] = None
+    title: Optional[Union[str, List[str]]] = None
+    location: Optional[Union[str, List[str]]] = None
+    start_year_min: Optional[int] = None
+    start_year_max: Optional[int] = None
 
 class QueryRequest(BaseModel):
     message: str
     include_sources: Optional[bool] = False
+    include_timings: Optional[bool] = False  # Return a per-stage latency breakdown
+    filters: Optional[QueryFilters] = None  # Filtered questions always go through RAG retrieval
+
+    def normalized_filters(self) -> Optional[Dict[str, Any]]:
+        return normalize_filters(self.filters.model_dump(exclude_none=True)) if self.filters else None
 
 class QueryResponse(BaseModel):
     response: str
     sources: Optional[list] = None
     confidence: Optional[float] = None
+    cached: bool = False
+    routing: Optional[Dict[str, Any]] = None
+    context: Optional[Dict[str, Any]] = None  # Prompt size and how retrieved context was trimmed
+    timings: Optional[Dict[str, float]] = None  # Milliseconds per pipeline stage, when requested
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    result: Optional[QueryResponse] = None
+    error: Optional[Dict[str, Any]] = None  # {"status": HTTP-style code, "message": ...}
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    index_loaded: bool
+    finished: bool  # Background initialization has run every step
+    elapsed_seconds: float  # Since the process started importing the app (frozen once finished)
+    steps: Dict[str, Dict[str, Any]]  # step -> {"status", "seconds", "error"}
 
 class HealthResponse(BaseModel):
     status: str
     ollama_available: bool
     faiss_index_loaded: bool
     total_employees: Optional[int] = None
+    missing_models: List[str] = []  # Configured models Ollama does not have
+    ollama_error: Optional[str] = None
+    ollama_checked_at: Optional[float] = None  # Unix time of the last background check
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the RAG chain on startup"""
-    global rag_chain
+def _attach_chain(chain, version):
+    """Make a freshly built chain the live one and drop answers from the old index"""
+    global rag_chain, loaded_index_version
+    if settings.enable_query_cache and settings.enable_semantic_cache:
+        answer_cache.embed_fn = chain.retriever.vectorstore.embeddings.embed_query
+    # Requests already running keep their reference to the previous chain
+    rag_chain = chain
+    loaded_index_version = version
+    if not answer_cache.invalidate_if_changed(version):
+        answer_cache.invalidate()
+
+def _build_warm_chain():
+    """Load the index and exercise it once so the first real query is not a cold start"""
+    chain = build_rag_chain()
+    try:
+        chain.retriever.get_relevant_documents("warm up")
+    except Exception as e:
+        logger.warning(f"Index warm-up failed (serving anyway): {e}")
+    return chain
+
+async def reload_rag_chain(reason: str) -> Dict[str, Any]:
+    """Build and warm a new chain in the background, then swap it in"""
+    global last_reload
+    async with index_reload_lock:
+        start = time.perf_counter()
+        version = index_version(get_faiss_index_path())
+        chain = await asyncio.to_thread(_build_warm_chain)
+        if query_router is not None:
+            await asyncio.to_thread(query_router.engine.load_data)
+        _attach_chain(chain, version)
+        last_reload = {
+            "reason": reason,
+            "seconds": round(time.perf_counter() - start, 3),
+            "total_documents": len(chain.retriever.vectorstore.index_to_docstore_id),
+            "completed_at": time.time(),
+        }
+        logger.info(f"RAG chain reloaded ({reason}) in {last_reload['seconds']}s")
+        return last_reload
+
+async def _watch_index():
+    """Reload the chain when the index on disk changes and has stopped changing"""
+    pending = None
+    while True:
+        await asyncio.sleep(settings.index_watch_interval)
+        version = index_version(get_faiss_index_path())
+        if version is None or version == loaded_index_version:
+            pending = None
+            continue
+        if version != pending:
+            # Wait one more interval so we don't load a half-written index
+            pending = version
+            continue
+        try:
+            await reload_rag_chain("index changed on disk")
+        except Exception as e:
+            logger.error(f"Failed to reload RAG chain: {e}")
+        pending = None
+
+def _load_query_router() -> Optional["QueryRouter"]:
+    """Load the employee table for structured lookups"""
+    if not settings.enable_query_router:
+        return None
+    from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+    from rag_backend.rag_agent.query_router import QueryRouter
+    return QueryRouter(EmployeeQueryEngine(get_excel_sources(), sheets=settings.excel_sheets))
+
+async def _init_query_router():
+    global query_router
+    if not settings.enable_query_router:
+        startup.skip("query_router", "disabled")
+        return
+    try:
+        with startup.step("query_router"):
+            query_router = await asyncio.to_thread(_load_query_router)
+    except Exception as e:
+        logger.error(f"Failed to load structured query router (RAG only): {e}")
+
+async def _init_index():
     try:
-        rag_chain = build_rag_chain()
+        async with index_reload_lock:
+            with startup.step("index"):
+                version = index_version(get_faiss_index_path())
+                chain = await asyncio.to_thread(build_rag_chain)
+                _attach_chain(chain, version)
         logger.info("RAG chain initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize RAG chain: {e}")
-        raise
+
+async def _preload_models():
+    """Have Ollama load every model the app uses, in parallel, and keep them resident for OLLAMA_KEEP_ALIVE"""
+    if not settings.startup_preload_models:
+        startup.skip("models", "disabled")
+        return
+    client = get_ollama_client()
+    try:
+        with startup.step("models"):
+            await asyncio.gather(*(
+                asyncio.to_thread(client.preload, model, embedding, settings.ollama_keep_alive,
+                                  settings.startup_preload_timeout)
+                for model, embedding in _ollama_models()
+            ))
+    except Exception as e:
+        logger.warning(f"Model preload failed (first query will load them): {e}")
+
+async def _warm_up():
+    if rag_chain is None:
+        startup.skip("warmup", "no index loaded")
+        return
+    if not settings.startup_warmup_query:
+        startup.skip("warmup", "disabled")
+        return
+    try:
+        with startup.step("warmup"):
+            await asyncio.to_thread(warm_up, rag_chain, settings.startup_warmup_query)
+    except Exception as e:
+        logger.warning(f"Warm-up query failed (serving anyway): {e}")
+
+async def initialize():
+    """
+    Background initialization: the structured router, the index and the Ollama models load
+    concurrently, then one warm-up query runs through the whole pipeline. Failures are
+    recorded on the step and logged; the app is ready once this finishes with an index
+    loaded (the index watcher can still load one that appears later).
+    """
+    global index_watch_task
+    await asyncio.gather(_init_query_router(), _init_index(), _preload_models())
+    await _warm_up()
+    startup.finish()
+    logger.info(f"Startup finished in {startup.snapshot()['elapsed_seconds']}s (ready: {_is_ready()})")
+    if settings.index_watch_interval > 0:
+        index_watch_task = asyncio.create_task(_watch_index())
+
+def _is_ready() -> bool:
+    return startup.finished and rag_chain is not None
+
+@app.on_event("startup")
+async def startup_event():
+    """Start serving immediately; the index and models load in the background (see /ready)"""
+    global init_task
+    health_prober.start()
+    init_task = asyncio.create_task(initialize())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close pooled Ollama connections"""
+    for task in (init_task, index_watch_task):
+        if task:
+            task.cancel()
+    await health_prober.stop()
+    await close_ollama_client()
 
 @app.get("/")
 async def root():
@@ -78,22 +406,29 @@ async def api_info():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
             "query": "/query",
+            "query_stream": "/query/stream",
+            "query_batch": "/query/batch",
             "stats": "/stats",
+            "metrics": "/metrics",
+            "reload_index": "/admin/reload-index",
             "docs": "/docs"
         }
     }
 
+@app.get("/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check():
+    """200 once initialization has finished and an index is loaded, 503 with step progress until then"""
+    ready = _is_ready()
+    body = ReadinessResponse(ready=ready, index_loaded=rag_chain is not None, **startup.snapshot())
+    return JSONResponse(body.model_dump(), status_code=200 if ready else 503)
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
-    try:
-        # Check if Ollama is running
-        import requests
-        ollama_response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        ollama_available = ollama_response.status_code == 200
-    except:
-        ollama_available = False
+    """Health check endpoint, answered from the background prober's last result"""
+    ollama = health_prober.status()
+    ollama_available = ollama["ollama_available"]
     
     # Check if FAISS index is loaded
     faiss_index_loaded = rag_chain is not None
@@ -107,46 +442,198 @@ async def health_check():
         except:
             pass
     
+    healthy = ollama_available and faiss_index_loaded and not ollama["missing_models"]
     return HealthResponse(
-        status="healthy" if (ollama_available and faiss_index_loaded) else "degraded",
+        status="healthy" if healthy else "degraded",
         ollama_available=ollama_available,
         faiss_index_loaded=faiss_index_loaded,
-        total_employees=total_employees
+        total_employees=total_employees,
+        missing_models=ollama["missing_models"],
+        ollama_error=ollama["error"],
+        ollama_checked_at=ollama["checked_at"],
     )
 
+def _semantic_lookup(message: str, filters: Optional[Dict[str, Any]] = None):
+    """
+    Semantic cache lookup for a question that missed the exact cache (runs on the pool).
+    Returns the cached result (or None, recording a miss) with the question's raw and
+    unit-normalized embeddings, so a miss can reuse the vector for retrieval.
+    """
+    vector = embedding = None
+    # Filtered answers are only reused for identical filters, so they skip the semantic lookup
+    if filters is None:
+        with stage("cache_lookup"):
+            if answer_cache.embed_fn is not None:
+                vector = answer_cache.embed_fn(message)
+                embedding = unit_vector(vector)
+            cached = answer_cache.get_similar(embedding)
+        if cached is not None:
+            return cached, vector, embedding
+    answer_cache.record_miss()
+    return None, vector, embedding
+
+def _invoke_with_cache(message: str, filters: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Semantic cache lookup followed by a full RAG invocation on a miss (runs on the pool).
+    The question is embedded once: the lookup's vector is reused for retrieval.
+    """
+    vector = embedding = None
+    if settings.enable_query_cache:
+        cached, vector, embedding = _semantic_lookup(message, filters)
+        if cached is not None:
+            return cached, True
+    result = answer_query(rag_chain, message, filters, vector)
+    if settings.enable_query_cache:
+        answer_cache.put(message, result, embedding, scope=filters_key(filters))
+    return result, False
+
+def _route(message: str, timings: StageTimings, filters: Optional[Dict[str, Any]] = None):
+    """Structured-route decision for a question, timed as the 'routing' stage"""
+    if not query_router or filters is not None:
+        return None
+    with activate(timings), stage("routing"):
+        return query_router.route(message)
+
+def _with_timings(response: QueryResponse, timings: StageTimings, started: float, include: bool) -> QueryResponse:
+    timings.add("total", time.perf_counter() - started)
+    if include:
+        response.timings = timings.to_ms()
+    return response
+
+def _structured_response(decision, include_sources: bool) -> QueryResponse:
+    return QueryResponse(
+        response=decision.answer,
+        sources=decision.records if include_sources else None,
+        confidence=1.0,
+        routing=decision.to_dict()
+    )
+
+def _rag_routing(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"route": "rag", "intent": None, "params": {"filters": filters} if filters else {}}
+
+def _rag_response(result: Dict[str, Any], cached: bool, include_sources: bool,
+                  filters: Optional[Dict[str, Any]] = None) -> QueryResponse:
+    """Shape a RAG chain result (fresh or cached) as a QueryResponse"""
+    answer = result.get("result", "No answer found")
+    sources = [
+        {"page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in result.get("source_documents", [])
+    ] if include_sources else None
+    
+    # Calculate confidence (simple heuristic based on source relevance)
+    confidence = None
+    if sources:
+        # Simple confidence based on number of relevant sources
+        confidence = min(1.0, len(sources) * 0.3)
+    
+    return QueryResponse(
+        response=answer,
+        sources=sources,
+        confidence=confidence,
+        cached=cached,
+        routing=_rag_routing(filters),
+        context=result.get("context")
+    )
+
+def _trusted_caller(http_request: Request, host: str) -> bool:
+    """Whether the caller may speak for its users: a configured host or the shared client secret"""
+    if host in settings.trusted_client_hosts:
+        return True
+    secret = http_request.headers.get("x-client-secret", "")
+    return bool(settings.client_id_secret) and hmac.compare_digest(secret, settings.client_id_secret)
+
+def _client_id(http_request: Request) -> str:
+    """
+    Caller identity for rate limiting and fair scheduling: the peer address, or X-Client-Id
+    (the Teams user id the bot forwards) when the request comes from a trusted caller
+    """
+    host = http_request.client.host if http_request.client else "anonymous"
+    client = http_request.headers.get("x-client-id", "").strip()
+    if client and _trusted_caller(http_request, host):
+        return client
+    return host
+
+def _priority(http_request: Request, default: str = "interactive") -> str:
+    """Callers may lower their own priority with X-Priority: bulk, but never raise it"""
+    return "bulk" if http_request.headers.get("x-priority", "").strip().lower() == "bulk" else default
+
+def _check_rate_limit(client: str, cost: int = 1):
+    """Spend ``cost`` queries of the client's quota or reject the request with 429"""
+    if not settings.enable_rate_limiting:
+        return
+    wait = rate_limiter.acquire(client, cost)
+    if wait > 0:
+        logger.warning(f"Rate limit exceeded for {client}")
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Rate limit exceeded", "retry_after": round(wait, 1)},
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+def _pool_error(error: Exception) -> Dict[str, Any]:
+    """Status and message for a failure of work submitted to the query pool"""
+    if isinstance(error, PoolSaturatedError):
+        return {"status": 429, "message": "Server busy, try again shortly", "queue_depth": error.queue_depth,
+                "priority": error.priority}
+    if isinstance(error, PoolTimeoutError):
+        return {"status": 503, "message": f"Query timed out after {error.timeout}s", "queue_depth": error.queue_depth}
+    return {"status": 500, "message": f"Failed to process query: {error}"}
+
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
+async def query_endpoint(request: QueryRequest, http_request: Request):
     """Main query endpoint with enhanced error handling"""
-    if not rag_chain:
-        raise HTTPException(status_code=503, detail="RAG chain not initialized")
-    
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Query message cannot be empty")
+    client = _client_id(http_request)
+    _check_rate_limit(client)
+    started = time.perf_counter()
+    timings = StageTimings()
+    filters = request.normalized_filters()
+    
+    # Structured lookups are answered straight from the employee table
+    decision = _route(request.message, timings, filters)
+    if decision is not None and decision.route == "structured":
+        logger.info(f"Answered structured query ({decision.intent}): {request.message}")
+        QUERIES_TOTAL.inc(endpoint="query", route="structured")
+        response = _structured_response(decision, request.include_sources)
+        return _with_timings(response, timings, started, request.include_timings)
+    
+    if not rag_chain:
+        raise HTTPException(status_code=503, detail="RAG chain not initialized")
     
     try:
         logger.info(f"Processing query: {request.message}")
         
-        # Process the query
-        result = rag_chain.invoke({"query": request.message})
+        # Serve repeated questions from the cache; anything else runs on the
+        # worker pool so the event loop stays responsive
+        scope = filters_key(filters)
+        result = answer_cache.get(request.message, scope) if settings.enable_query_cache else None
+        cached = result is not None
+        if not cached:
+            result, cached = await query_pool.run(
+                _invoke_with_cache, request.message, filters, timings=timings,
+                priority=_priority(http_request), client=client,
+            )
+        QUERIES_TOTAL.inc(endpoint="query", route="cache" if cached else "rag")
         
-        # Extract response and metadata
-        answer = result.get("result", "No answer found")
-        sources = result.get("source_documents", []) if request.include_sources else None
+        response = _rag_response(result, cached, request.include_sources, filters)
+        logger.info(f"Query processed successfully. Answer length: {len(response.response)}")
+        return _with_timings(response, timings, started, request.include_timings)
         
-        # Calculate confidence (simple heuristic based on source relevance)
-        confidence = None
-        if sources:
-            # Simple confidence based on number of relevant sources
-            confidence = min(1.0, len(sources) * 0.3)
-        
-        logger.info(f"Query processed successfully. Answer length: {len(answer)}")
-        
-        return QueryResponse(
-            response=answer,
-            sources=sources,
-            confidence=confidence
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejecting query: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Server busy, try again shortly", "queue_depth": e.queue_depth,
+                    "priority": e.priority},
+            headers={"Retry-After": "1"}
+        )
+    except PoolTimeoutError as e:
+        logger.warning(f"Query timed out: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail={"message": f"Query timed out after {e.timeout}s", "queue_depth": e.queue_depth}
         )
-        
     except Exception as e:
         logger.error(f"Error processing query: {e}")
         raise HTTPException(
@@ -154,6 +641,257 @@ async def query_endpoint(request: QueryRequest):
             detail=f"Failed to process query: {str(e)}"
         )
 
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch_endpoint(request: BatchQueryRequest, http_request: Request):
+    """
+    Answer many questions in one request. Structured and cached questions are answered
+    directly; the rest are embedded together and retrieved with one batched FAISS search,
+    then generated with bounded concurrency. Every item gets its own result or error.
+    Batches always run at bulk priority and count each query against the rate limit.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one query")
+    if len(request.queries) > settings.batch_max_queries:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {settings.batch_max_queries} queries")
+    client = _client_id(http_request)
+    _check_rate_limit(client, len(request.queries))
+    
+    results: Dict[int, BatchItemResult] = {}
+    started = time.perf_counter()
+    timings = [StageTimings() for _ in request.queries]
+    filters = [item.normalized_filters() for item in request.queries]
+    
+    def fail(index: int, error: Dict[str, Any]):
+        results[index] = BatchItemResult(index=index, ok=False, error=error)
+    
+    def succeed(index: int, response: QueryResponse, route: str):
+        QUERIES_TOTAL.inc(endpoint="query_batch", route=route)
+        results[index] = BatchItemResult(index=index, ok=True, result=_with_timings(
+            response, timings[index], started, request.queries[index].include_timings))
+    
+    pending = []
+    for i, item in enumerate(request.queries):
+        if not item.message.strip():
+            fail(i, {"status": 400, "message": "Query message cannot be empty"})
+            continue
+        decision = _route(item.message, timings[i], filters[i])
+        if decision is not None and decision.route == "structured":
+            succeed(i, _structured_response(decision, item.include_sources), "structured")
+            continue
+        cached = answer_cache.get(item.message, filters_key(filters[i])) if settings.enable_query_cache else None
+        if cached is not None:
+            succeed(i, _rag_response(cached, True, item.include_sources, filters[i]), "cache")
+            continue
+        pending.append(i)
+    
+    # The whole batch runs against one chain even if a reload swaps it meanwhile
+    chain = rag_chain
+    if pending and chain is None:
+        for i in pending:
+            fail(i, {"status": 503, "message": "RAG chain not initialized"})
+        pending = []
+    
+    if pending:
+        logger.info(f"Processing batch of {len(pending)} RAG queries")
+        messages = [request.queries[i].message for i in pending]
+        # Retrieval is shared by the whole batch, so every item reports the same retrieval spans
+        retrieval_timings = StageTimings()
+        try:
+            hits, vectors = await query_pool.run(
+                batch_retrieve, chain, messages, [filters[i] for i in pending],
+                timings=retrieval_timings, priority="bulk", client=client,
+            )
+            for i in pending:
+                timings[i].merge(retrieval_timings)
+        except Exception as e:
+            logger.error(f"Batch retrieval failed: {e}")
+            for i in pending:
+                fail(i, _pool_error(e))
+            pending = []
+    
+    semaphore = asyncio.Semaphore(max(1, settings.batch_concurrency))
+    
+    async def generate(i: int, docs, vector):
+        item = request.queries[i]
+        embedding = None
+        if settings.enable_query_cache:
+            if filters[i] is None:
+                embedding = unit_vector(vector) if answer_cache.embed_fn is not None else None
+                cached = answer_cache.get_similar(embedding)
+                if cached is not None:
+                    succeed(i, _rag_response(cached, True, item.include_sources), "cache")
+                    return
+            answer_cache.record_miss()
+        async with semaphore:
+            try:
+                result = await query_pool.run(
+                    answer_from_documents, chain, item.message, docs, timings=timings[i],
+                    priority="bulk", client=client,
+                )
+            except Exception as e:
+                logger.error(f"Batch item {i} failed: {e}")
+                fail(i, _pool_error(e))
+                return
+        if settings.enable_query_cache:
+            answer_cache.put(item.message, result, embedding, scope=filters_key(filters[i]))
+        succeed(i, _rag_response(result, False, item.include_sources, filters[i]), "rag")
+    
+    if pending:
+        await asyncio.gather(*(generate(i, docs, vector) for i, docs, vector in zip(pending, hits, vectors)))
+    
+    ordered = [results[i] for i in range(len(request.queries))]
+    succeeded = sum(1 for r in ordered if r.ok)
+    return BatchQueryResponse(results=ordered, succeeded=succeeded, failed=len(ordered) - succeeded)
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest, http_request: Request):
+    """
+    Stream the answer as Server-Sent Events: a 'route' event, one 'token' event
+    per generated chunk, then a 'sources' event and a final 'done' event.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Query message cannot be empty")
+    client = _client_id(http_request)
+    _check_rate_limit(client)
+    started = time.perf_counter()
+    timings = StageTimings()
+    filters = request.normalized_filters()
+    scope = filters_key(filters)
+    
+    def done_event() -> str:
+        timings.add("total", time.perf_counter() - started)
+        return _sse_event("done", {"timings": timings.to_ms()} if request.include_timings else {})
+    
+    decision = _route(request.message, timings, filters)
+    if decision is not None and decision.route == "structured":
+        QUERIES_TOTAL.inc(endpoint="query_stream", route="structured")
+        async def structured_stream():
+            yield _sse_event("route", decision.to_dict())
+            yield _sse_event("token", {"token": decision.answer})
+            sources = decision.records if request.include_sources else []
+            yield _sse_event("sources", {"sources": jsonable_encoder(sources)})
+            yield done_event()
+        return StreamingResponse(structured_stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    
+    if not rag_chain:
+        raise HTTPException(status_code=503, detail="RAG chain not initialized")
+    
+    logger.info(f"Streaming query: {request.message}")
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def produce():
+        # Runs on the worker pool; hands each token back to the event loop
+        # Same lookup as /query: exact match, then semantic match reusing the embedding on a miss
+        cached = vector = embedding = None
+        if settings.enable_query_cache:
+            cached = answer_cache.get(request.message, scope)
+            if cached is None:
+                cached, vector, embedding = _semantic_lookup(request.message, filters)
+        if cached is not None:
+            docs, tokens = cached.get("source_documents", []), iter([cached.get("result", "")])
+            context = cached.get("context")
+        else:
+            docs, tokens, context = stream_rag_answer(rag_chain, request.message, filters, vector)
+        QUERIES_TOTAL.inc(endpoint="query_stream", route="cache" if cached is not None else "rag")
+        answer = []
+        generation_start = time.perf_counter()
+        with stage("generation"):
+            for token in tokens:
+                if cancelled.is_set():
+                    return
+                if not answer:
+                    record_stage("time_to_first_token", time.perf_counter() - generation_start)
+                answer.append(token)
+                loop.call_soon_threadsafe(events.put_nowait, ("token", token))
+        if cached is None and settings.enable_query_cache:
+            answer_cache.put(request.message, {"result": "".join(answer), "source_documents": docs, "context": context},
+                             embedding, scope=scope)
+        sources = [
+            {"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs
+        ] if request.include_sources else []
+        loop.call_soon_threadsafe(events.put_nowait, ("sources", {"sources": sources, "context": context}))
+
+    # Admission and the wait for the first token are bounded like /query; once tokens
+    # flow, the stream runs until generation ends or the client disconnects
+    try:
+        job = query_pool.submit(produce, timings=timings, priority=_priority(http_request), client=client)
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejecting streamed query: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail={"message": "Server busy, try again shortly", "queue_depth": e.queue_depth,
+                    "priority": e.priority},
+            headers={"Retry-After": "1"}
+        )
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, ("end", None)))
+    try:
+        first = await asyncio.wait_for(events.get(), timeout=query_pool.timeout)
+    except asyncio.TimeoutError:
+        cancelled.set()
+        job.cancel()  # Drops the job if it is still queued
+        query_pool.record_timeout()
+        logger.warning(f"Streamed query produced no token within {query_pool.timeout}s")
+        raise HTTPException(
+            status_code=503,
+            detail={"message": f"Query timed out after {query_pool.timeout}s", "queue_depth": query_pool.queue_depth}
+        )
+    if first[0] == "end" and job.exception() is not None:
+        logger.error(f"Error streaming query: {job.exception()}")
+        raise HTTPException(status_code=500, detail=f"Failed to process query: {job.exception()}")
+
+    async def event_stream():
+        try:
+            yield _sse_event("route", _rag_routing(filters))
+            kind, payload = first
+            while kind != "end":
+                if kind == "token":
+                    yield _sse_event("token", {"token": payload})
+                else:
+                    yield _sse_event("sources", payload)
+                kind, payload = await events.get()
+            error = None if job.cancelled() else job.exception()
+            if error is not None:
+                logger.error(f"Error streaming query: {error}")
+                yield _sse_event("error", _pool_error(error))
+            yield done_event()
+        finally:
+            # Client disconnected or stream finished: stop generating tokens
+            cancelled.set()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/admin/reload-index")
+async def reload_index_endpoint(x_admin_token: Optional[str] = Header(default=None)):
+    """Load the index from disk, warm it and swap it in without dropping in-flight requests"""
+    # Admin endpoints are off until ADMIN_TOKEN is configured
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if index_reload_lock.locked():
+        raise HTTPException(status_code=409, detail="Index reload already in progress")
+    try:
+        return await reload_rag_chain("admin request")
+    except Exception as e:
+        logger.error(f"Failed to reload RAG chain: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to reload index: {str(e)}")
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text-format metrics: per-stage latency histograms, query/HTTP/pool/cache counters, pool and cache gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/stats")
 async def get_stats():
     """Get system statistics"""
@@ -164,8 +902,11 @@ async def get_stats():
         # Get basic stats
         stats = {
             "total_documents": len(rag_chain.retriever.vectorstore.index_to_docstore_id),
-            "embedding_model": "phi3",
-            "llm_model": "phi3"
+            "config": chain_config(),
+            "query_pool": query_pool.stats(),
+            "rate_limit": rate_limiter.stats() if settings.enable_rate_limiting else None,
+            "query_cache": answer_cache.stats(),
+            "last_index_reload": last_reload
         }
         
         return stats
@@ -0,0 +1,192 @@
+"""
+Per-stage latency spans and Prometheus text-format metrics for the RAG pipeline
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return int(self._series.get(key, [0.0])[-1])
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(count)}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {_number(series[-1])}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]!r}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics rendered at /metrics; collectors add gauges or counters read at scrape time"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Tuple[Callable[[], List[Tuple[str, str, float]]], str]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[Tuple[str, str, float]]],
+                           metric_type: str = "gauge"):
+        """
+        ``collector`` returns (name, help, value) samples of ``metric_type``; use "counter"
+        (with a ``_total`` name) for values that only ever increase
+        """
+        if metric_type not in ("gauge", "counter"):
+            raise ValueError(f"Unsupported collector metric type '{metric_type}'")
+        self._collectors.append((collector, metric_type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector, metric_type in self._collectors:
+            for name, documentation, value in collector():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}",
+                          f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_seconds", "Time spent in each RAG pipeline stage", ["stage"]))
+QUERIES_TOTAL = REGISTRY.register(Counter(
+    "rag_queries_total", "Answered queries by endpoint and route (structured, cache, rag)", ["endpoint", "route"]))
+HTTP_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by method, path and status", ["method", "path", "status"]))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and path", ["method", "path"]))
+
+
+class StageTimings:
+    """Stage durations for one request, added to from whichever worker thread runs the stage"""
+
+    def __init__(self):
+        self._stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def merge(self, other: "StageTimings"):
+        for stage, seconds in other.to_seconds().items():
+            self.add(stage, seconds)
+
+    def to_seconds(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stages)
+
+    def to_ms(self) -> Dict[str, float]:
+        """Breakdown in milliseconds, as returned to clients"""
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.to_seconds().items()}
+
+
+_current = threading.local()
+
+
+@contextmanager
+def activate(timings: Optional[StageTimings]) -> Iterator[None]:
+    """Route stage spans recorded on this thread into ``timings`` for the duration of the block"""
+    previous = getattr(_current, "timings", None)
+    _current.timings = timings
+    try:
+        yield
+    finally:
+        _current.timings = previous
+
+
+def record_stage(stage: str, seconds: float):
+    """Observe a stage duration in the histogram and the active request's timings"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = getattr(_current, "timings", None)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as pipeline stage ``name``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
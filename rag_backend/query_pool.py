@@ -0,0 +1,217 @@
+"""
+Bounded worker pool for running blocking RAG work off the event loop, with
+priority classes, per-client fair sharing and load shedding
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional
+
+from rag_backend.metrics import StageTimings, activate, record_stage
+
+# Scheduling classes, highest priority first
+PRIORITIES = ("interactive", "bulk")
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the admission queue is full (or bulk work is shed) and a request is rejected"""
+
+    def __init__(self, queue_depth: int, in_flight: int, priority: str = "interactive"):
+        self.queue_depth = queue_depth
+        self.in_flight = in_flight
+        self.priority = priority
+        super().__init__(f"Query pool saturated ({in_flight} in flight, {queue_depth} queued, {priority})")
+
+
+class PoolTimeoutError(Exception):
+    """Raised when a request does not finish within the configured timeout"""
+
+    def __init__(self, timeout: float, queue_depth: int):
+        self.timeout = timeout
+        self.queue_depth = queue_depth
+        super().__init__(f"Query timed out after {timeout}s ({queue_depth} queued)")
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "timings", "submitted", "future")
+
+    def __init__(self, fn: Callable, args, kwargs, timings: Optional[StageTimings]):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timings = timings
+        self.submitted = time.perf_counter()
+        self.future: Future = Future()
+
+
+class QueryPool:
+    """
+    Runs blocking callables (LangChain invocations, Ollama calls) on a fixed-size
+    thread pool. At most ``max_in_flight`` requests are admitted at once; anything
+    beyond ``max_in_flight`` is rejected immediately with PoolSaturatedError, and
+    bulk work is also rejected once ``bulk_max_queue_depth`` requests are waiting.
+
+    Waiting work is dispatched strictly by priority class ("interactive" before
+    "bulk") and round-robin across clients within a class, so one caller with many
+    queued requests cannot hold up everyone else's.
+    """
+
+    def __init__(self, max_workers: int, max_in_flight: int, timeout: float,
+                 bulk_max_queue_depth: Optional[int] = None):
+        self.max_workers = max(1, max_workers)
+        self.max_in_flight = max(self.max_workers, max_in_flight)
+        self.timeout = timeout
+        self.bulk_max_queue_depth = bulk_max_queue_depth
+        self._lock = threading.Lock()
+        self._work_ready = threading.Condition(self._lock)
+        # priority -> client -> queued jobs; clients rotate to the back after each dispatch
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Job]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._queued = 0
+        self._in_flight = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rejected_by_priority = {p: 0 for p in PRIORITIES}
+        self._timed_out = 0
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"rag-worker-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of admitted requests still waiting for a worker"""
+        with self._lock:
+            return self._queued
+
+    def _admit(self, priority: str):
+        with self._lock:
+            saturated = self._in_flight >= self.max_in_flight
+            shed = (priority != PRIORITIES[0] and self.bulk_max_queue_depth is not None
+                    and self._queued >= self.bulk_max_queue_depth)
+            if saturated or shed:
+                self._rejected += 1
+                self._rejected_by_priority[priority] += 1
+                raise PoolSaturatedError(queue_depth=self._queued, in_flight=self._in_flight, priority=priority)
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _enqueue(self, job: _Job, priority: str, client: str):
+        with self._work_ready:
+            self._queues[priority].setdefault(client, deque()).append(job)
+            self._queued += 1
+            self._work_ready.notify()
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pop the next job (called with the lock held): highest class first, then round-robin by client"""
+        for priority in PRIORITIES:
+            clients = self._queues[priority]
+            if clients:
+                client, jobs = clients.popitem(last=False)
+                job = jobs.popleft()
+                if jobs:
+                    clients[client] = jobs
+                self._queued -= 1
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._work_ready:
+                while not self._queued and not self._closed:
+                    self._work_ready.wait()
+                if self._closed:
+                    return
+                job = self._next_job()
+            # A caller that timed out while its job was still queued cancels it
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._running += 1
+            try:
+                # Spans recorded by fn on this worker thread go into the request's timings
+                with activate(job.timings):
+                    record_stage("queue_wait", time.perf_counter() - job.submitted)
+                    result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+    def submit(self, fn: Callable, *args, timings: Optional[StageTimings] = None,
+               priority: str = "interactive", client: str = "anonymous", **kwargs) -> Future:
+        """
+        Admit and queue ``fn`` without waiting for it (raises PoolSaturatedError if it cannot
+        be admitted). The slot is held until the returned future completes; cancelling the
+        future drops the job if no worker has picked it up yet.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'; expected one of {PRIORITIES}")
+        self._admit(priority)
+        job = _Job(fn, args, kwargs, timings)
+        # The slot is held until the worker actually finishes, even if the caller
+        # gives up, so a timed-out generation still counts against capacity.
+        job.future.add_done_callback(lambda _: self._release())
+        self._enqueue(job, priority, client)
+        return job.future
+
+    def record_timeout(self):
+        """Count a request that gave up waiting on work submitted with ``submit``"""
+        with self._lock:
+            self._timed_out += 1
+
+    async def run(self, fn: Callable, *args, timings: Optional[StageTimings] = None,
+                  priority: str = "interactive", client: str = "anonymous", **kwargs) -> Any:
+        """
+        Run ``fn`` on the pool and await its result, honoring admission and timeout limits.
+        ``priority`` is one of PRIORITIES and ``client`` identifies the caller for fair
+        sharing. Time spent queued and any stages ``fn`` records are added to ``timings``.
+        """
+        future = self.submit(fn, *args, timings=timings, priority=priority, client=client, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # Only succeeds if no worker has picked it up yet
+            self.record_timeout()
+            raise PoolTimeoutError(self.timeout, self.queue_depth)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool utilization"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "queued_by_priority": {p: sum(len(j) for j in q.values()) for p, q in self._queues.items()},
+                "queued_clients": len(set().union(*(q.keys() for q in self._queues.values()))),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "rejected_by_priority": dict(self._rejected_by_priority),
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self):
+        """Stop accepting work and release worker threads"""
+        with self._work_ready:
+            self._closed = True
+            for clients in self._queues.values():
+                for jobs in clients.values():
+                    for job in jobs:
+                        job.future.cancel()
+                clients.clear()
+            self._queued = 0
+            self._work_ready.notify_all()
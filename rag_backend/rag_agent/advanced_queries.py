@@ -1,154 +1,315 @@
 """
 Advanced query capabilities for employee data
 """
+import threading
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Any, Optional, Sequence, Set, Union
 import re
 from datetime import datetime
+from rag_backend.rag_agent.load_excel import normalize_columns, read_workbooks
+
+class SubstringIndex:
+    """
+    Case-insensitive substring index over one column. Distinct values are
+    indexed by character trigram, so a lookup only verifies the few values that
+    share every trigram of the query instead of scanning every row.
+    """
+    
+    def __init__(self, values: pd.Series):
+        lowered = values.fillna("").astype(str).str.lower().to_numpy()
+        codes, uniques = pd.factorize(lowered)
+        self.values = list(uniques)
+        order = np.argsort(codes, kind="stable")
+        boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+        self.rows_by_value = np.split(order, boundaries) if len(order) else []
+        self.value_ids = {value: value_id for value_id, value in enumerate(self.values)}
+        self.trigrams: Dict[str, Set[int]] = defaultdict(set)
+        for value_id, value in enumerate(self.values):
+            for i in range(len(value) - 2):
+                self.trigrams[value[i:i + 3]].add(value_id)
+    
+    def lookup(self, text: str) -> np.ndarray:
+        """Row positions whose value contains ``text`` (case-insensitive), in row order"""
+        text = text.lower()
+        if not text:
+            candidates = range(len(self.values))
+        elif len(text) >= 3:
+            postings = sorted(
+                (self.trigrams.get(text[i:i + 3], set()) for i in range(len(text) - 2)), key=len
+            )
+            candidates = set.intersection(*postings) if postings[0] else set()
+        else:
+            candidates = range(len(self.values))
+        matched = [self.rows_by_value[v] for v in candidates if self.values[v] and text in self.values[v]]
+        if not matched:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate(matched))
+    
+    def exact(self, text: str) -> np.ndarray:
+        """Row positions whose value equals ``text`` (case-insensitive), in row order"""
+        value_id = self.value_ids.get(text.lower())
+        if value_id is None:
+            return np.array([], dtype=np.int64)
+        return self.rows_by_value[value_id]
+
+TITLE_STOPWORDS = {"of", "and", "the", "for", "&"}
+
+def acronym(text: str) -> str:
+    """Initials of the significant words, e.g. 'Chief Technology Officer' -> 'cto'"""
+    words = re.findall(r"[a-z]+", text.lower())
+    return "".join(w[0] for w in words if w not in TITLE_STOPWORDS)
+
+SENIORITY_BINS = [-np.inf, 1, 3, 7, np.inf]
+SENIORITY_LABELS = ['New Hire (< 1 year)', 'Junior (1-3 years)', 'Mid-level (3-7 years)', 'Senior (7+ years)']
+
+@dataclass(frozen=True)
+class EmployeeSnapshot:
+    """
+    One loaded version of the employee table with everything derived from it. Snapshots
+    are built off to the side and published with a single assignment, so a reader holding
+    one never pairs a frame with another version's indexes. Only ``memo`` is filled in
+    after publishing (aggregates computed on first use).
+    """
+    df: pd.DataFrame
+    indexes: Dict[str, SubstringIndex] = field(default_factory=dict)
+    acronyms: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)  # column -> acronym -> lowercased values
+    email_index: Dict[str, int] = field(default_factory=dict)
+    derived_as_of: Optional[pd.Timestamp] = None
+    memo: Dict[str, Any] = field(default_factory=dict)
+
+def with_tenure(df: pd.DataFrame, today: pd.Timestamp) -> pd.DataFrame:
+    """Copy of ``df`` with ``years_of_service`` and ``seniority_level`` computed for ``today``"""
+    df = df.copy()
+    if 'start_date' in df.columns:
+        df['years_of_service'] = (today - df['start_date']).dt.days / 365.25
+        df['seniority_level'] = pd.cut(
+            df['years_of_service'], bins=SENIORITY_BINS, labels=SENIORITY_LABELS, right=False
+        )
+    return df
+
+def experience_mask(df: pd.DataFrame, min_years: float = None, max_years: float = None) -> pd.Series:
+    """Rows of a tenure-derived frame whose years of service fall within the inclusive bounds"""
+    years = df['years_of_service']
+    mask = years.notna()
+    if min_years is not None:
+        mask &= years >= min_years
+    if max_years is not None:
+        mask &= years <= max_years
+    return mask
 
 class EmployeeQueryEngine:
-    """Advanced query engine for employee data"""
+    """
+    Advanced query engine for employee data.
+    
+    The table, its derived columns (``years_of_service``, ``seniority_level``), search
+    indexes and memoized aggregates live in one immutable ``EmployeeSnapshot``.
+    Reloading builds a complete new snapshot before publishing it, and a calendar-date
+    rollover publishes a re-derived copy, so lookups running during either stay consistent.
+    """
+    
+    INDEXED_COLUMNS = ('name', 'department', 'title')
+    ACRONYM_COLUMNS = ('department', 'title')
     
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: Union[str, Sequence[str]], sheets: Optional[Sequence[str]] = None):
+        # One workbook path or several; rows of all requested sheets are merged
         self.excel_path = excel_path
-        self.df = None
+        self.sheets = sheets
+        self.snapshot = EmployeeSnapshot(pd.DataFrame())
+        self._publish_lock = threading.Lock()
         self.load_data()
     
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.snapshot.df
+    
+    @property
+    def indexes(self) -> Dict[str, SubstringIndex]:
+        return self.snapshot.indexes
+    
+    @property
+    def acronyms(self) -> Dict[str, Dict[str, List[str]]]:
+        return self.snapshot.acronyms
+    
+    @property
+    def email_index(self) -> Dict[str, int]:
+        return self.snapshot.email_index
+    
     def load_data(self):
-        """Load employee data from Excel"""
+        """Load employee data from Excel and publish it as a new snapshot"""
         try:
-            self.df = pd.read_excel(self.excel_path)
+            sources = [self.excel_path] if isinstance(self.excel_path, str) else list(self.excel_path)
+            df, _ = read_workbooks(sources, sheets=self.sheets)
             # Clean column names
-            self.df.columns = [col.strip().lower().replace(' ', '_') for col in self.df.columns]
+            normalize_columns(df)
         except Exception as e:
             print(f"Error loading Excel data: {e}")
-            self.df = pd.DataFrame()
+            df = pd.DataFrame()
+        if 'start_date' in df.columns:
+            df['start_date'] = pd.to_datetime(df['start_date'], errors='coerce')
+        today = pd.Timestamp(datetime.now().date())
+        snapshot = self.build_snapshot(with_tenure(df, today), today)
+        with self._publish_lock:
+            self.snapshot = snapshot
+    
+    def build_snapshot(self, df: pd.DataFrame, derived_as_of: Optional[pd.Timestamp] = None) -> EmployeeSnapshot:
+        """Build substring indexes for searchable columns, acronyms of their values and an exact index on email"""
+        indexes = {
+            col: SubstringIndex(df[col]) for col in self.INDEXED_COLUMNS if col in df.columns
+        }
+        acronyms = {}
+        for col in self.ACRONYM_COLUMNS:
+            if col in indexes:
+                by_acronym = defaultdict(list)
+                for value in indexes[col].values:
+                    if value:
+                        by_acronym[acronym(value)].append(value)
+                acronyms[col] = dict(by_acronym)
+        email_index = {}
+        if 'email' in df.columns:
+            emails = df['email'].fillna("").astype(str).str.strip().str.lower()
+            for position, email in enumerate(emails):
+                if email:
+                    email_index.setdefault(email, position)
+        return EmployeeSnapshot(df, indexes, acronyms, email_index, derived_as_of)
+    
+    def current(self) -> EmployeeSnapshot:
+        """The published snapshot, first re-derived (tenure columns, memoized results) if the date rolled over"""
+        snapshot = self.snapshot
+        today = pd.Timestamp(datetime.now().date())
+        if snapshot.derived_as_of == today:
+            return snapshot
+        # Row positions are unchanged, so the indexes carry over to the new frame
+        refreshed = replace(snapshot, df=with_tenure(snapshot.df, today), derived_as_of=today, memo={})
+        with self._publish_lock:
+            # A reload published meanwhile wins over re-deriving the snapshot it replaced
+            if self.snapshot is snapshot:
+                self.snapshot = refreshed
+        return refreshed
+    
+    @staticmethod
+    def _memoized(snapshot: EmployeeSnapshot, key: str, compute):
+        """Return a cached aggregate for ``snapshot``, computing it on first use"""
+        if key not in snapshot.memo:
+            snapshot.memo[key] = compute(snapshot.df)
+        return snapshot.memo[key]
+    
+    def search_ids(self, column: str, text: str) -> np.ndarray:
+        """Row positions whose ``column`` contains ``text`` (case-insensitive, literal match)"""
+        return self._search_ids(self.snapshot, column, text)
+    
+    def get_records(self, row_ids) -> List[Dict]:
+        """Materialize records for the given row positions"""
+        return self._get_records(self.snapshot, row_ids)
+    
+    @staticmethod
+    def _search_ids(snapshot: EmployeeSnapshot, column: str, text: str) -> np.ndarray:
+        if snapshot.df.empty or column not in snapshot.indexes:
+            return np.array([], dtype=np.int64)
+        return snapshot.indexes[column].lookup(text)
+    
+    @staticmethod
+    def _get_records(snapshot: EmployeeSnapshot, row_ids) -> List[Dict]:
+        if len(row_ids) == 0:
+            return []
+        return snapshot.df.iloc[row_ids].to_dict('records')
+    
+    def _search(self, column: str, text: str) -> List[Dict]:
+        snapshot = self.snapshot
+        return self._get_records(snapshot, self._search_ids(snapshot, column, text))
     
     def search_by_name(self, name: str) -> List[Dict]:
         """Search employees by name (partial match)"""
-        if self.df.empty:
-            return []
-        
-        # Case-insensitive partial match
-        mask = self.df['name'].str.contains(name, case=False, na=False)
-        results = self.df[mask].to_dict('records')
-        return results
+        return self._search('name', name)
     
     def search_by_department(self, department: str) -> List[Dict]:
         """Search employees by department"""
-        if self.df.empty:
-            return []
-        
-        mask = self.df['department'].str.contains(department, case=False, na=False)
-        results = self.df[mask].to_dict('records')
-        return results
+        return self._search('department', department)
     
     def search_by_role(self, role: str) -> List[Dict]:
         """Search employees by role/title"""
-        if self.df.empty:
-            return []
-        
-        mask = self.df['title'].str.contains(role, case=False, na=False)
-        results = self.df[mask].to_dict('records')
-        return results
+        return self._search('title', role)
+    
+    def get_employee_by_email(self, email: str) -> Optional[Dict]:
+        """Get employee by exact email address (case-insensitive)"""
+        snapshot = self.snapshot
+        position = snapshot.email_index.get(email.strip().lower())
+        if position is None:
+            return None
+        return snapshot.df.iloc[position].to_dict()
     
     def get_department_stats(self) -> Dict[str, Any]:
         """Get statistics by department"""
-        if self.df.empty:
+        snapshot = self.current()
+        if snapshot.df.empty:
             return {}
         
-        dept_stats = self.df.groupby('department').agg({
-            'name': 'count',
-            'title': lambda x: list(x.unique())
-        }).rename(columns={'name': 'employee_count', 'title': 'roles'})
+        def compute(df):
+            dept_stats = df.groupby('department').agg({
+                'name': 'count',
+                'title': lambda x: list(x.unique())
+            }).rename(columns={'name': 'employee_count', 'title': 'roles'})
+            return dept_stats.to_dict('index')
         
-        return dept_stats.to_dict('index')
+        return self._memoized(snapshot, 'department_stats', compute)
     
     def get_seniority_analysis(self) -> Dict[str, Any]:
         """Analyze employee seniority based on start dates"""
-        if self.df.empty or 'start_date' not in self.df.columns:
+        return self._seniority_analysis(self.current())
+    
+    def _seniority_analysis(self, snapshot: EmployeeSnapshot) -> Dict[str, Any]:
+        if snapshot.df.empty or 'start_date' not in snapshot.df.columns:
             return {}
         
-        try:
-            # Convert start dates to datetime
-            self.df['start_date'] = pd.to_datetime(self.df['start_date'], errors='coerce')
-            
-            # Calculate years of service
-            current_date = datetime.now()
-            self.df['years_of_service'] = (current_date - self.df['start_date']).dt.days / 365.25
-            
-            # Categorize by seniority
-            def categorize_seniority(years):
-                if years < 1:
-                    return 'New Hire (< 1 year)'
-                elif years < 3:
-                    return 'Junior (1-3 years)'
-                elif years < 7:
-                    return 'Mid-level (3-7 years)'
-                else:
-                    return 'Senior (7+ years)'
-            
-            self.df['seniority_level'] = self.df['years_of_service'].apply(categorize_seniority)
-            
-            seniority_stats = self.df.groupby('seniority_level').agg({
-                'name': 'count',
-                'years_of_service': ['mean', 'min', 'max']
-            }).round(2)
-            
-            return seniority_stats.to_dict()
-            
-        except Exception as e:
-            print(f"Error in seniority analysis: {e}")
-            return {}
+        def compute(df):
+            try:
+                seniority_stats = df.groupby('seniority_level', observed=True).agg({
+                    'name': 'count',
+                    'years_of_service': ['mean', 'min', 'max']
+                }).round(2)
+                return seniority_stats.to_dict()
+            except Exception as e:
+                print(f"Error in seniority analysis: {e}")
+                return {}
+        
+        return self._memoized(snapshot, 'seniority_analysis', compute)
     
     def search_by_experience(self, min_years: float = None, max_years: float = None) -> List[Dict]:
         """Search employees by experience level"""
-        if self.df.empty or 'start_date' not in self.df.columns:
+        df = self.current().df
+        if df.empty or 'start_date' not in df.columns:
             return []
         
-        try:
-            # Calculate years of service if not already done
-            if 'years_of_service' not in self.df.columns:
-                self.df['start_date'] = pd.to_datetime(self.df['start_date'], errors='coerce')
-                current_date = datetime.now()
-                self.df['years_of_service'] = (current_date - self.df['start_date']).dt.days / 365.25
-            
-            # Filter by experience
-            mask = True
-            if min_years is not None:
-                mask &= self.df['years_of_service'] >= min_years
-            if max_years is not None:
-                mask &= self.df['years_of_service'] <= max_years
-            
-            results = self.df[mask].to_dict('records')
-            return results
-            
-        except Exception as e:
-            print(f"Error in experience search: {e}")
-            return []
+        return df[experience_mask(df, min_years, max_years)].to_dict('records')
     
     def get_company_overview(self) -> Dict[str, Any]:
         """Get comprehensive company overview"""
-        if self.df.empty:
+        snapshot = self.current()
+        if snapshot.df.empty:
             return {}
         
-        overview = {
-            'total_employees': len(self.df),
-            'departments': self.df['department'].nunique() if 'department' in self.df.columns else 0,
-            'unique_titles': self.df['title'].nunique() if 'title' in self.df.columns else 0,
-        }
-        
-        # Add department breakdown
-        if 'department' in self.df.columns:
-            dept_breakdown = self.df['department'].value_counts().to_dict()
-            overview['department_breakdown'] = dept_breakdown
-        
-        # Add seniority analysis
-        seniority = self.get_seniority_analysis()
-        if seniority:
-            overview['seniority_breakdown'] = seniority
+        def compute(df):
+            overview = {
+                'total_employees': len(df),
+                'departments': df['department'].nunique() if 'department' in df.columns else 0,
+                'unique_titles': df['title'].nunique() if 'title' in df.columns else 0,
+            }
+            
+            # Add department breakdown
+            if 'department' in df.columns:
+                dept_breakdown = df['department'].value_counts().to_dict()
+                overview['department_breakdown'] = dept_breakdown
+            
+            # Add seniority analysis
+            seniority = self._seniority_analysis(snapshot)
+            if seniority:
+                overview['seniority_breakdown'] = seniority
+            
+            return overview
         
-        return overview
+        return self._memoized(snapshot, 'company_overview', compute)
     
     def parse_natural_language_query(self, query: str) -> Dict[str, Any]:
         """Parse natural language queries into structured search parameters"""
@@ -0,0 +1,166 @@
+"""
+Context compression for the RAG prompt: keep only the fields of each retrieved record
+that matter for the question, drop duplicates and fit the result into a token budget
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain.chains import RetrievalQA
+from langchain.chains.combine_documents.stuff import StuffDocumentsChain
+from langchain_core.callbacks import CallbackManagerForChainRun
+from langchain_core.documents import Document
+
+from rag_backend.metrics import stage
+
+# Question words that point at a field even when the field name itself is not mentioned
+FIELD_HINTS = {
+    "email": ("email", "mail", "contact", "reach"),
+    "phone": ("phone", "call", "number", "contact"),
+    "location": ("where", "location", "office", "based", "city", "country", "site", "remote"),
+    "start": ("start", "started", "joined", "hire", "hired", "tenure", "experience", "years", "long", "since", "when"),
+    "manager": ("manager", "manages", "reports", "boss", "lead", "supervisor"),
+    "title": ("title", "role", "position", "job", "does"),
+    "department": ("department", "team", "dept", "org", "group", "works"),
+    "skill": ("skill", "skills", "knows", "expert", "experience"),
+}
+VALUE_STOPWORDS = {
+    "the", "and", "for", "who", "what", "which", "with", "our", "are", "is", "does", "how", "many", "any",
+    "has", "have", "there", "their", "in", "of", "to", "a", "an", "on", "at", "me", "tell", "about",
+}
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting prompts"""
+    return math.ceil(len(text) / 4)
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def parse_record(text: str) -> List[Tuple[str, str]]:
+    """Split a pipe-delimited "field: value | field: value" row into (field, value) pairs"""
+    fields = []
+    for part in text.split(" | "):
+        name, sep, value = part.partition(": ")
+        fields.append((name, value) if sep else ("", part))
+    return fields
+
+
+def format_record(fields: Sequence[Tuple[str, str]]) -> str:
+    return " | ".join(f"{name}: {value}" if name else value for name, value in fields)
+
+
+class ContextBudget:
+    """
+    Trims retrieved records before they are stuffed into the prompt. ``core_fields``
+    (matched as substrings of normalized field names, e.g. "name" keeps "Full Name")
+    are always kept; other fields are kept only if the question mentions them, hints
+    at them or contains one of their values. Records are then de-duplicated and added
+    in rank order until ``max_tokens`` is reached.
+    """
+
+    def __init__(self, max_tokens: int = 1024, core_fields: Sequence[str] = ("name", "title", "department"),
+                 trim_fields: bool = True):
+        self.max_tokens = max_tokens
+        self.core_fields = [f.lower().replace(" ", "_") for f in core_fields]
+        self.trim_fields = trim_fields
+
+    def _field_wanted(self, name: str, value: str, query_words: set) -> bool:
+        key = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+        if not key or any(core in key for core in self.core_fields):
+            return True
+        if _words(key) & query_words:
+            return True
+        if any(hint in key and query_words.intersection(words) for hint, words in FIELD_HINTS.items()):
+            return True
+        return bool((_words(value) - VALUE_STOPWORDS) & query_words)
+
+    def apply(self, docs: List[Document], query: str) -> Tuple[List[Document], Dict[str, Any]]:
+        query_words = _words(query) - VALUE_STOPWORDS
+        kept: List[Document] = []
+        seen = set()
+        used = 0
+        fields_removed = duplicates = dropped = 0
+        truncated = False
+        for doc in docs:
+            fields = parse_record(doc.page_content)
+            if self.trim_fields:
+                selected = [(n, v) for n, v in fields if self._field_wanted(n, v, query_words)]
+                fields_removed += len(fields) - len(selected)
+                fields = selected or fields
+            text = format_record(fields)
+            key = doc.metadata.get("employee_key", text)
+            if key in seen or text in seen:
+                duplicates += 1
+                continue
+            seen.update((key, text))
+            cost = approx_tokens(text)
+            if used + cost > self.max_tokens:
+                if kept:
+                    dropped += 1
+                    truncated = True
+                    continue
+                # Always keep the best match, cut down to the budget
+                text = text[:self.max_tokens * 4]
+                cost = approx_tokens(text)
+                truncated = True
+            used += cost
+            kept.append(Document(page_content=text, metadata=doc.metadata))
+        return kept, {
+            "documents_retrieved": len(docs),
+            "documents_used": len(kept),
+            "duplicates_removed": duplicates,
+            "documents_dropped": dropped,
+            "fields_removed": fields_removed,
+            "context_tokens": used,
+            "budget_tokens": self.max_tokens,
+            "truncated": truncated,
+        }
+
+
+def estimate_prompt_tokens(combine_chain, docs: List[Document], question: str) -> int:
+    """Approximate size of the prompt the combine chain will send for these documents"""
+    if isinstance(combine_chain, StuffDocumentsChain):
+        inputs = combine_chain._get_inputs(docs, question=question)
+        return approx_tokens(combine_chain.llm_chain.prompt.format_prompt(**inputs).to_string())
+    # map_reduce/refine send one prompt per document; report the combined context size
+    return sum(approx_tokens(doc.page_content) for doc in docs)
+
+
+class BudgetedRetrievalQA(RetrievalQA):
+    """RetrievalQA that compresses retrieved context first and returns a 'context' report with the answer"""
+
+    budget: Optional[Any] = None
+    max_answer_tokens: Optional[int] = None
+
+    def compress(self, docs: List[Document], question: str) -> Tuple[List[Document], Dict[str, Any]]:
+        report: Dict[str, Any] = {"documents_retrieved": len(docs), "truncated": False}
+        if self.budget is not None:
+            docs, report = self.budget.apply(docs, question)
+        report["prompt_tokens"] = estimate_prompt_tokens(self.combine_documents_chain, docs, question)
+        report["max_answer_tokens"] = self.max_answer_tokens
+        return docs, report
+
+    def answer(self, question: str, docs: List[Document], callbacks=None) -> Dict[str, Any]:
+        """Compress already-retrieved documents and generate the answer from them"""
+        with stage("context"):
+            docs, report = self.compress(docs, question)
+        with stage("generation"):
+            answer = self.combine_documents_chain.run(input_documents=docs, question=question, callbacks=callbacks)
+        outputs = {self.output_key: answer, "context": report}
+        if self.return_source_documents:
+            outputs["source_documents"] = docs
+        return outputs
+
+    def _call(
+        self,
+        inputs: Dict[str, Any],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Dict[str, Any]:
+        _run_manager = run_manager or CallbackManagerForChainRun.get_noop_manager()
+        question = inputs[self.input_key]
+        with stage("retrieval"):
+            docs = self._get_docs(question, run_manager=_run_manager)
+        return self.answer(question, docs, callbacks=_run_manager.get_child())
@@ -0,0 +1,95 @@
+"""
+Dimensionality reduction applied to embeddings before indexing, persisted with the
+index so query vectors are always projected the same way as the documents
+"""
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag_backend.rag_agent.embedding_pipeline import embed_queries
+
+TRANSFORM_NAME = "transform.npz"
+REDUCTION_METHODS = ("pca", "truncate")
+
+
+class VectorTransform:
+    """
+    Affine projection ``(x - mean) @ components``, optionally followed by L2 normalization.
+    ``pca`` learns the components from the corpus; ``truncate`` keeps the leading
+    dimensions, which suits Matryoshka-trained embedding models.
+    """
+
+    def __init__(self, method: str, mean: np.ndarray, components: np.ndarray, normalize: bool):
+        self.method = method
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.normalize = normalize
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def output_dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dim: int, method: str = "pca") -> "VectorTransform":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, d = vectors.shape
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown reduction method '{method}'; expected one of {REDUCTION_METHODS}")
+        if method == "truncate":
+            dim = min(dim, d)
+            return cls(method, np.zeros(d, dtype=np.float32), np.eye(d, dim, dtype=np.float32), normalize=True)
+        # PCA can keep at most min(n, d) meaningful components
+        dim = max(1, min(dim, d, n))
+        mean = vectors.mean(axis=0)
+        _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+        return cls(method, mean, vt[:dim].T, normalize=False)
+
+    def apply(self, vectors: np.ndarray) -> np.ndarray:
+        projected = (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components
+        if self.normalize:
+            norms = np.linalg.norm(projected, axis=-1, keepdims=True)
+            projected = projected / np.where(norms == 0, 1, norms)
+        return projected.astype(np.float32)
+
+    def save(self, index_path: Union[str, Path]):
+        path = Path(index_path) / TRANSFORM_NAME
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(tmp, method=self.method, mean=self.mean, components=self.components, normalize=self.normalize)
+        os.replace(tmp, path)
+
+
+def load_transform(index_path: Union[str, Path]) -> Optional[VectorTransform]:
+    """The transform saved with an index, or None if the index stores raw embeddings"""
+    path = Path(index_path) / TRANSFORM_NAME
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        return VectorTransform(str(data["method"]), data["mean"], data["components"], bool(data["normalize"]))
+
+
+def remove_transform(index_path: Union[str, Path]):
+    (Path(index_path) / TRANSFORM_NAME).unlink(missing_ok=True)
+
+
+class ProjectedEmbeddings(Embeddings):
+    """Applies a VectorTransform to the output of another Embeddings implementation"""
+
+    def __init__(self, base: Embeddings, transform: VectorTransform):
+        self.base = base
+        self.transform = transform
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.transform.apply(np.asarray(self.base.embed_documents(texts))).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.transform.apply(np.asarray(self.base.embed_query(text))).tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.transform.apply(np.asarray(embed_queries(self.base, texts))).tolist()
@@ -0,0 +1,185 @@
+"""
+On-disk document store for the FAISS index: memory-mapped vectors plus SQLite-backed
+documents that are fetched only for search hits
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_backend.config import settings
+from rag_backend.rag_agent.index_factory import is_mmappable, mmappable_index
+
+INDEX_NAME = "index.faiss"
+DOCSTORE_NAME = "docstore.sqlite"
+LEGACY_DOCSTORE_NAME = "index.pkl"
+
+
+class _SQLiteReader:
+    """Single read-only connection shared by the docstore and position map"""
+
+    def __init__(self, path: Path):
+        # Connections keep reading the file they opened even if a rebuild
+        # replaces it, so a loaded index never mixes old vectors with new rows.
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        # Let SQLite mmap the file so worker processes share the OS page cache
+        self._conn.execute("PRAGMA mmap_size = 1073741824")
+        self._lock = threading.Lock()
+        self.count = self.fetchone("SELECT COUNT(*) FROM documents")[0]
+
+    def fetchone(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SQLiteDocstore(Docstore):
+    """Read-only docstore that loads a Document from SQLite on each lookup"""
+
+    def __init__(self, reader: _SQLiteReader):
+        self._reader = reader
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._reader.fetchone(
+            "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+        )
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+
+class SQLitePositionMap(Mapping):
+    """Lazy FAISS position -> docstore id mapping (stands in for index_to_docstore_id)"""
+
+    def __init__(self, reader: _SQLiteReader):
+        self._reader = reader
+
+    def __getitem__(self, position: int) -> str:
+        row = self._reader.fetchone("SELECT doc_id FROM documents WHERE position = ?", (int(position),))
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self) -> int:
+        return self._reader.count
+
+    def __iter__(self) -> Iterator[int]:
+        return (row[0] for row in self._reader.fetchall("SELECT position FROM documents ORDER BY position"))
+
+
+def iter_indexed_documents(vectorstore: FAISS) -> Iterator[Tuple[int, str, Document]]:
+    """(FAISS position, doc_id, Document) for every stored row, in position order"""
+    docstore = vectorstore.docstore
+    if isinstance(docstore, SQLiteDocstore):
+        rows = docstore._reader.fetchall(
+            "SELECT position, doc_id, page_content, metadata FROM documents ORDER BY position")
+        for position, doc_id, text, meta in rows:
+            yield position, doc_id, Document(page_content=text, metadata=json.loads(meta))
+        return
+    for position, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+        doc = docstore.search(doc_id)
+        if isinstance(doc, Document):
+            yield position, doc_id, doc
+
+
+def iter_documents(vectorstore: FAISS) -> Iterator[Tuple[str, Document]]:
+    """(doc_id, Document) for every stored row, in FAISS position order"""
+    for _, doc_id, doc in iter_indexed_documents(vectorstore):
+        yield doc_id, doc
+
+
+def load_artifact(vectorstore: FAISS, name: str) -> Optional[bytes]:
+    """An artifact saved with the docstore, or None (in-memory stores, older saves)"""
+    docstore = vectorstore.docstore
+    if not isinstance(docstore, SQLiteDocstore):
+        return None
+    try:
+        row = docstore._reader.fetchone("SELECT data FROM artifacts WHERE name = ?", (name,))
+    except sqlite3.OperationalError:
+        return None  # Saved before artifacts were stored
+    return bytes(row[0]) if row is not None else None
+
+
+def save_vectorstore(vectorstore: FAISS, index_path: Union[str, Path],
+                     artifacts: Optional[Dict[str, bytes]] = None):
+    """
+    Write the FAISS index and a SQLite docstore (position, id, text, metadata), plus
+    named ``artifacts`` derived from the same rows (e.g. the BM25 index) so they are
+    replaced together with the documents. Flat indexes are written in a memory-mappable
+    single-list IVF layout. Files are written under temporary names and renamed into place.
+    """
+    index_path = Path(index_path)
+    index_path.mkdir(parents=True, exist_ok=True)
+
+    tmp_db = index_path / (DOCSTORE_NAME + ".tmp")
+    tmp_db.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_db)
+    conn.execute(
+        "CREATE TABLE documents (position INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE,"
+        " page_content TEXT NOT NULL, metadata TEXT NOT NULL)"
+    )
+    rows = []
+    for position, doc_id in sorted(vectorstore.index_to_docstore_id.items()):
+        doc = vectorstore.docstore.search(doc_id)
+        rows.append((position, doc_id, doc.page_content, json.dumps(doc.metadata, default=str)))
+    conn.executemany("INSERT INTO documents VALUES (?, ?, ?, ?)", rows)
+    conn.execute("CREATE TABLE artifacts (name TEXT PRIMARY KEY, data BLOB NOT NULL)")
+    conn.executemany("INSERT INTO artifacts VALUES (?, ?)", (artifacts or {}).items())
+    conn.commit()
+    conn.close()
+
+    tmp_index = index_path / (INDEX_NAME + ".tmp")
+    faiss.write_index(mmappable_index(vectorstore.index), str(tmp_index))
+    os.replace(tmp_db, index_path / DOCSTORE_NAME)
+    os.replace(tmp_index, index_path / INDEX_NAME)
+    # The legacy pickle is superseded by the SQLite docstore
+    (index_path / LEGACY_DOCSTORE_NAME).unlink(missing_ok=True)
+
+
+def load_vectorstore(index_path: Union[str, Path], embeddings: Embeddings, writable: bool = False) -> FAISS:
+    """
+    Load a saved index. Serving loads are lazy: IVF indexes (including flat ones, which
+    are saved as single-list IVF) are memory-mapped and documents stay in SQLite until a search returns them.
+    ``writable=True`` loads everything into memory so rows can be added and deleted.
+    Indexes saved in the legacy pickle format are still readable.
+    """
+    index_path = Path(index_path)
+    db_path = index_path / DOCSTORE_NAME
+    if not db_path.exists():
+        return FAISS.load_local(
+            str(index_path), embeddings=embeddings,
+            allow_dangerous_deserialization=settings.faiss_allow_dangerous_deserialization,
+        )
+
+    reader = _SQLiteReader(db_path)
+    if writable:
+        index = faiss.read_index(str(index_path / INDEX_NAME))
+        rows = reader.fetchall("SELECT position, doc_id, page_content, metadata FROM documents")
+        reader.close()
+        docstore = InMemoryDocstore({
+            doc_id: Document(page_content=text, metadata=json.loads(meta)) for _, doc_id, text, meta in rows
+        })
+        return FAISS(embeddings, index, docstore, {position: doc_id for position, doc_id, _, _ in rows})
+
+    index = faiss.read_index(str(index_path / INDEX_NAME), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    if not is_mmappable(index):
+        print(f"Warning: {type(index).__name__} cannot be memory-mapped; "
+              f"each worker holds its own copy of the index in memory")
+    return FAISS(embeddings, index, SQLiteDocstore(reader), SQLitePositionMap(reader))
@@ -1,26 +1,195 @@
-from rag_agent.load_excel import load_excel_data
+from rag_backend.rag_agent.load_excel import iter_excel_documents
+from rag_backend.rag_agent.embedding_pipeline import (
+    BatchedEmbeddings, EmbeddingCache, create_embeddings, embedding_model_name,
+)
+from rag_backend.rag_agent.dim_reduction import VectorTransform, load_transform, remove_transform
+from rag_backend.rag_agent.docstore import iter_indexed_documents, load_vectorstore, save_vectorstore
+from rag_backend.rag_agent.hybrid_retriever import BM25_ARTIFACT, BM25Index
+from rag_backend.rag_agent.metadata_filters import METADATA_ARTIFACT, MetadataIndex
+from rag_backend.rag_agent.index_factory import (
+    build_faiss_index, flat_index_from, index_build_params, load_vectors, save_vectors,
+)
+from rag_backend.config import (
+    settings, get_excel_path, get_excel_sources, get_faiss_index_path, get_embedding_cache_path,
+)
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OllamaEmbeddings
+from langchain_core.documents import Document
 from pathlib import Path
+from typing import Dict, List, Tuple
+import argparse
+import hashlib
+import json
 
 # === Settings ===
-EXCEL_PATH = Path("../data/MasterEmployeeProfiles.xlsx") 
-INDEX_PATH = Path("faiss_index")          # output location
+EXCEL_PATH = Path(get_excel_path())
+INDEX_PATH = Path(get_faiss_index_path())          # output location
+MANIFEST_NAME = "manifest.json"          # per-row content hashes of what is in the index
 
-def embed_and_store():
-    print(f"Loading Excel: {EXCEL_PATH}")
-    documents = load_excel_data(str(EXCEL_PATH))
+def content_hash(text: str) -> str:
+    """Stable hash of a document's text, used to detect edited rows"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    print(f"Embedding {len(documents)} documents using Ollama (phi3)...")
-    embeddings = OllamaEmbeddings(model="phi3")
+def load_manifest(index_path: Path) -> Dict:
+    """Load the manifest written alongside the index, or an empty one"""
+    manifest_path = index_path / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
-    vectorstore = FAISS.from_documents(documents, embeddings)
+def save_manifest(index_path: Path, manifest: Dict):
+    with open(index_path / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
-    print(f"Saving FAISS index to: {INDEX_PATH}")
-    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    vectorstore.save_local(str(INDEX_PATH))
+def plan_chunk(documents: List[Document], entries: Dict[str, str]) -> Tuple[List[Document], List[str], List[str]]:
+    """
+    Compare a batch of documents against manifest entries ({employee_key: content_hash}).
+    Returns (documents to embed, keys whose content changed, unchanged keys).
+    """
+    to_embed, changed, unchanged = [], [], []
+    for doc in documents:
+        key = doc.metadata["employee_key"]
+        previous = entries.get(key)
+        if previous == content_hash(doc.page_content):
+            unchanged.append(key)
+            continue
+        to_embed.append(doc)
+        if previous is not None:
+            changed.append(key)
+    return to_embed, changed, unchanged
 
+def diff_documents(documents: List[Document], entries: Dict[str, str]) -> Tuple[List[Document], List[str], List[str]]:
+    """
+    Compare documents against manifest entries ({employee_key: content_hash}).
+    Returns (documents to embed, keys to delete from the index, unchanged keys).
+    """
+    to_embed, changed, unchanged = plan_chunk(documents, entries)
+    current = {doc.metadata["employee_key"] for doc in documents}
+    # Changed rows are removed and re-added; removed rows are just removed
+    removed = [key for key in entries if key not in current]
+    return to_embed, changed + removed, unchanged
+
+def lexical_artifacts(vectorstore: FAISS) -> Dict[str, bytes]:
+    """BM25 and metadata indexes over the stored rows, saved with the docstore so serving skips the scan"""
+    positions, ids, texts, metadatas = [], [], [], []
+    for position, doc_id, doc in iter_indexed_documents(vectorstore):
+        positions.append(position)
+        ids.append(doc_id)
+        texts.append(doc.page_content)
+        metadatas.append(doc.metadata)
+    return {
+        BM25_ARTIFACT: BM25Index(ids, texts).dumps(),
+        METADATA_ARTIFACT: MetadataIndex(positions, metadatas).dumps(),
+    }
+
+def embed_and_store(full_rebuild: bool = False):
+    sources = get_excel_sources() if settings.excel_data_paths else [str(EXCEL_PATH)]
+    print(f"Loading Excel: {', '.join(sources)}")
+    model = embedding_model_name()
+    reduction = ({"method": settings.embedding_reduction, "dim": settings.embedding_reduced_dim}
+                 if settings.embedding_reduced_dim else None)
+    cache = EmbeddingCache(get_embedding_cache_path())
+    embeddings = BatchedEmbeddings(
+        create_embeddings(),
+        model_name=model,
+        cache=cache,
+        batch_size=settings.embedding_batch_size,
+        concurrency=settings.embedding_concurrency,
+        max_retries=settings.embedding_max_retries,
+    )
+
+    manifest = load_manifest(INDEX_PATH)
+    index_exists = (INDEX_PATH / "index.faiss").exists()
+    incremental = not full_rebuild and index_exists and manifest.get("embedding_model") == model
+    entries = manifest.get("entries", {}) if incremental else {}
+    vectorstore = None
+    if incremental:
+        vectorstore = load_vectorstore(INDEX_PATH, embeddings, writable=True)
+        # Rows are added/deleted on an exact flat index; the configured type is rebuilt before saving
+        # A reduced index cannot give back the raw embeddings, so only vectors.npy will do
+        vectors = load_vectors(INDEX_PATH, None if load_transform(INDEX_PATH) else vectorstore.index)
+        if vectors is None:
+            print("Stored index has no full-precision vectors; rebuilding from scratch")
+            incremental, entries, vectorstore = False, {}, None
+        else:
+            vectorstore.index = flat_index_from(vectors)
+
+    # Stream the workbook chunk by chunk so only one chunk of Documents is alive at a time
+    new_entries: Dict[str, str] = {}
+    totals = {"embedded": 0, "cached": 0, "deleted": 0, "unchanged": 0, "seconds": 0.0}
+    for chunk in iter_excel_documents(sources, chunk_size=settings.ingest_chunk_size,
+                                      columns=settings.document_columns, sheets=settings.excel_sheets):
+        to_embed, changed, unchanged = plan_chunk(chunk, entries)
+        new_entries.update({doc.metadata["employee_key"]: content_hash(doc.page_content) for doc in chunk})
+        totals["unchanged"] += len(unchanged)
+        if changed:
+            vectorstore.delete(changed)
+            totals["deleted"] += len(changed)
+        if not to_embed:
+            continue
+        print(f"Embedding {len(to_embed)} documents using Ollama ({model})...")
+        ids = [doc.metadata["employee_key"] for doc in to_embed]
+        if vectorstore is None:
+            vectorstore = FAISS.from_documents(to_embed, embeddings, ids=ids)
+        else:
+            vectorstore.add_documents(to_embed, ids=ids)
+        for field in ("embedded", "cached", "seconds"):
+            totals[field] += embeddings.last_report.get(field, 0)
+
+    removed = [key for key in entries if key not in new_entries]
+    if removed:
+        vectorstore.delete(removed)
+        totals["deleted"] += len(removed)
+
+    print(f"Update summary: {totals['embedded'] + totals['cached']} embedded "
+          f"({totals['cached']} from cache), {totals['deleted']} deleted, {totals['unchanged']} unchanged")
+    if vectorstore is None:
+        print("No documents to index.")
+        cache.close()
+        return
+    index_params = index_build_params()
+    # Manifests written before index_params was recorded only name the index type
+    built_with = manifest.get("index_params", {"index_type": str(manifest.get("index_type")).lower()})
+    if incremental and totals["embedded"] + totals["cached"] == 0 and totals["deleted"] == 0:
+        if built_with == index_params and manifest.get("reduction") == reduction:
+            print("Index is up to date.")
+            cache.close()
+            return
+        print("Index or reduction settings changed; rebuilding the index from the stored vectors")
+
+    print(f"Saving {settings.faiss_index_type} FAISS index to: {INDEX_PATH}")
+    INDEX_PATH.mkdir(parents=True, exist_ok=True)
+    vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+    save_vectors(INDEX_PATH, vectors)
+    # vectors.npy keeps the raw embeddings; the index holds the reduced ones
+    transform = None
+    if reduction:
+        transform = VectorTransform.fit(vectors, reduction["dim"], reduction["method"])
+        print(f"Reducing {transform.input_dim}-dim vectors to {transform.output_dim} dims ({transform.method})")
+        transform.save(INDEX_PATH)
+        vectors = transform.apply(vectors)
+    vectorstore.index = build_faiss_index(vectors)
+    save_vectorstore(vectorstore, INDEX_PATH, lexical_artifacts(vectorstore))
+    if transform is None:
+        remove_transform(INDEX_PATH)
+    save_manifest(INDEX_PATH, {
+        "embedding_model": model,
+        "index_type": settings.faiss_index_type,
+        "index_params": index_params,
+        "dimension": int(vectors.shape[1]),
+        "reduction": reduction,
+        "entries": new_entries,
+    })
+
+    cache.close()
+    if totals["seconds"]:
+        rate = (totals["embedded"] + totals["cached"]) / totals["seconds"]
+        print(f"Embedding report: {totals['embedded']} embedded, {totals['cached']} cached, "
+              f"{totals['seconds']:.1f}s, {rate:.1f} docs/sec")
     print("Done. Vector index saved.")
 
 if __name__ == "__main__":
-    embed_and_store()
+    parser = argparse.ArgumentParser(description="Embed employee data into the FAISS index")
+    parser.add_argument("--full", action="store_true", help="Re-embed every row instead of only changed rows")
+    args = parser.parse_args()
+    embed_and_store(full_rebuild=args.full)
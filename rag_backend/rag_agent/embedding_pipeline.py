@@ -0,0 +1,235 @@
+"""
+Batched, concurrent embedding with retries and a persistent on-disk vector cache
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag_backend.config import settings
+from rag_backend.metrics import stage
+from rag_backend.rag_agent.ollama_models import build_embeddings
+
+
+class EmbeddingCache:
+    """SQLite-backed cache of vectors keyed on (model, sha256(text))"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for whichever of ``texts`` are present, keyed by text hash"""
+        hashes = list({self.text_hash(t) for t in texts})
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        rows = [
+            (model, self.text_hash(t), np.asarray(v, dtype=np.float32).tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps another Embeddings implementation (e.g. OllamaEmbeddings) so document
+    embedding runs in batches across a small thread pool, retries transient
+    failures and skips texts already present in the on-disk cache.
+    Query embedding is passed straight through.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        model_name: str,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = 32,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        verbose: bool = True,
+    ):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.verbose = verbose
+        self.last_report: Dict[str, float] = {}
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.base.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                print(f"Embedding batch failed ({e}); retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors_by_hash = self.cache.get_many(self.model_name, texts) if self.cache else {}
+        pending = []
+        seen = set()
+        for text in texts:
+            text_hash = EmbeddingCache.text_hash(text)
+            if text_hash not in vectors_by_hash and text_hash not in seen:
+                seen.add(text_hash)
+                pending.append(text)
+        cached_count = len(texts) - len(pending)
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._embed_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                vectors = future.result()
+                if self.cache:
+                    self.cache.put_many(self.model_name, batch, vectors)
+                for text, vector in zip(batch, vectors):
+                    vectors_by_hash[EmbeddingCache.text_hash(text)] = vector
+                done += len(batch)
+                if self.verbose:
+                    elapsed = time.perf_counter() - start
+                    print(f"  embedded {done}/{len(pending)} documents "
+                          f"({done / elapsed if elapsed else 0:.1f} docs/sec)")
+
+        elapsed = time.perf_counter() - start
+        self.last_report = {
+            "documents": len(texts),
+            "cached": cached_count,
+            "embedded": len(pending),
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(len(texts) / elapsed, 1) if elapsed else 0.0,
+        }
+        if self.verbose:
+            print(f"Embedding finished: {len(pending)} embedded, {cached_count} from cache, "
+                  f"{self.last_report['docs_per_sec']} docs/sec overall")
+        return [vectors_by_hash[EmbeddingCache.text_hash(t)] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline stand-in for a neural embedding model: signed feature hashing of word
+    unigrams and character trigrams into ``dim`` buckets, L2-normalized. Needs no
+    server or model download and embeds a query in microseconds, at the cost of
+    only capturing lexical overlap.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = text.lower().split()
+        grams = [f"#{w[i:i + 3]}" for w in (f" {w} " for w in words) for i in range(len(w) - 2)]
+        return words + grams
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str], concurrency: int = 4) -> List[List[float]]:
+    """
+    Embed several queries at once. Embedders with a native ``embed_queries`` use it;
+    others (e.g. Ollama, whose embeddings endpoint takes one prompt) get concurrent
+    ``embed_query`` calls, so query-side instructions are applied exactly as for single queries.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    if len(texts) <= 1:
+        return [embeddings.embed_query(t) for t in texts]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(texts)))) as executor:
+        return list(executor.map(embeddings.embed_query, texts))
+
+
+class TimedEmbeddings(Embeddings):
+    """Records query embedding time as the ``embed_query`` pipeline stage"""
+
+    def __init__(self, base: Embeddings):
+        self.base = base
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with stage("embed_query"):
+            return self.base.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        with stage("embed_query"):
+            return embed_queries(self.base, texts, settings.embedding_concurrency)
+
+
+def embedding_model_name() -> str:
+    """Identifier of the configured embedding model, recorded in the manifest and cache keys"""
+    if settings.embedding_provider.lower() == "hashing":
+        return f"hashing-{settings.hashing_embedding_dim}"
+    return settings.ollama_embedding_model
+
+
+def create_embeddings() -> Embeddings:
+    """Embedding model selected by ``settings.embedding_provider`` (ollama | hashing)"""
+    provider = settings.embedding_provider.lower()
+    if provider == "hashing":
+        return HashingEmbeddings(settings.hashing_embedding_dim)
+    if provider != "ollama":
+        raise ValueError(f"Unknown embedding provider '{settings.embedding_provider}'; expected ollama or hashing")
+    return build_embeddings()
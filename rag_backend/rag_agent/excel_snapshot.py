@@ -0,0 +1,170 @@
+"""
+Columnar snapshots of the employee workbook so openpyxl parsing happens once per file change
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+import pandas as pd
+
+from rag_backend.config import settings, get_snapshot_dir, get_excel_path
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def snapshot_paths(filepath: str, sheet_name: Union[int, str], cache_dir: str):
+    """Data and metadata file paths for a workbook sheet's snapshot"""
+    source = Path(filepath).resolve()
+    key = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:10]
+    stem = f"{source.stem}-{key}-{sheet_name}"
+    return Path(cache_dir) / f"{stem}.parquet", Path(cache_dir) / f"{stem}.pkl", Path(cache_dir) / f"{stem}.json"
+
+
+def _is_valid(meta_path: Path, filepath: str, stat: os.stat_result) -> bool:
+    """Check a snapshot against the workbook: mtime/size first, content hash if those moved"""
+    if not meta_path.exists():
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return True
+    # The file was touched or copied; reuse the snapshot if the bytes are identical
+    if meta.get("sha256") == _file_sha256(filepath):
+        meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return True
+    return False
+
+
+def has_fresh_snapshot(filepath: str, sheet_name: Union[int, str] = 0, cache_dir: Optional[str] = None) -> bool:
+    """Whether read_excel_cached would load this sheet from its snapshot instead of parsing the workbook"""
+    if not settings.enable_data_snapshot:
+        return False
+    _, _, meta_path = snapshot_paths(filepath, sheet_name, cache_dir or get_snapshot_dir())
+    return _is_valid(meta_path, filepath, os.stat(filepath))
+
+
+def read_excel_cached(filepath: str, sheet_name: Union[int, str] = 0, cache_dir: Optional[str] = None,
+                      use_snapshot: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Read a workbook sheet as pd.read_excel would, via a cached columnar copy.
+    The snapshot is written as Parquet when pyarrow is installed (pickle otherwise)
+    and is rebuilt whenever the workbook's size, mtime and content hash change.
+    ``use_snapshot`` overrides settings.enable_data_snapshot (e.g. in worker processes).
+    """
+    if use_snapshot is None:
+        use_snapshot = settings.enable_data_snapshot
+    if not use_snapshot:
+        return pd.read_excel(filepath, sheet_name=sheet_name, engine="openpyxl")
+
+    cache_dir = cache_dir or get_snapshot_dir()
+    parquet_path, pickle_path, meta_path = snapshot_paths(filepath, sheet_name, cache_dir)
+    stat = os.stat(filepath)
+
+    if _is_valid(meta_path, filepath, stat):
+        try:
+            if parquet_path.exists():
+                return pd.read_parquet(parquet_path)
+            if pickle_path.exists():
+                return pd.read_pickle(pickle_path)
+        except Exception as e:
+            print(f"Discarding unreadable snapshot for {filepath}: {e}")
+
+    df = pd.read_excel(filepath, sheet_name=sheet_name, engine="openpyxl")
+    write_snapshot(df, filepath, sheet_name, cache_dir, stat)
+    return df
+
+
+def _read_sheet_names(filepath: str) -> List[str]:
+    with pd.ExcelFile(filepath, engine="openpyxl") as book:
+        return list(book.sheet_names)
+
+
+def list_sheets(filepath: str, cache_dir: Optional[str] = None) -> List[str]:
+    """Sheet names of a workbook, cached alongside the sheet snapshots so unchanged files are not reopened"""
+    if not settings.enable_data_snapshot:
+        return _read_sheet_names(filepath)
+    cache_dir = cache_dir or get_snapshot_dir()
+    _, _, meta_path = snapshot_paths(filepath, "_sheet_list", cache_dir)
+    stat = os.stat(filepath)
+    if _is_valid(meta_path, filepath, stat):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)["sheet_names"]
+    names = _read_sheet_names(filepath)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({
+            "source": str(Path(filepath).resolve()),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _file_sha256(filepath),
+            "sheet_names": names,
+        }, f)
+    os.replace(tmp_meta, meta_path)
+    return names
+
+
+def write_snapshot(df: pd.DataFrame, filepath: str, sheet_name: Union[int, str], cache_dir: str,
+                   stat: Optional[os.stat_result] = None):
+    """Persist a parsed sheet next to its validation metadata"""
+    parquet_path, pickle_path, meta_path = snapshot_paths(filepath, sheet_name, cache_dir)
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    stat = stat or os.stat(filepath)
+    for stale in (parquet_path, pickle_path, meta_path):
+        stale.unlink(missing_ok=True)
+
+    # Write to temporary names and rename so concurrent readers never see partial files
+    fmt = None
+    if _parquet_available():
+        tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+        try:
+            df.to_parquet(tmp_path, index=True)
+            os.replace(tmp_path, parquet_path)
+            fmt = "parquet"
+        except Exception as e:
+            # Mixed-type object columns cannot always be expressed in Arrow
+            tmp_path.unlink(missing_ok=True)
+            print(f"Parquet snapshot failed ({e}); falling back to pickle")
+    if fmt is None:
+        tmp_path = pickle_path.with_name(pickle_path.name + ".tmp")
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, pickle_path)
+        fmt = "pickle"
+
+    tmp_meta = meta_path.with_name(meta_path.name + ".tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({
+            "source": str(Path(filepath).resolve()),
+            "sheet_name": sheet_name,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": _file_sha256(filepath),
+            "format": fmt,
+            "rows": int(df.shape[0]),
+        }, f)
+    os.replace(tmp_meta, meta_path)
+
+
+if __name__ == "__main__":
+    excel_path = get_excel_path()
+    print(f"Converting {excel_path} into a columnar snapshot...")
+    frame = read_excel_cached(excel_path)
+    print(f"Snapshot ready in {get_snapshot_dir()} ({frame.shape[0]} rows)")
@@ -0,0 +1,189 @@
+"""
+Hybrid lexical (BM25) + vector retrieval fused with reciprocal rank fusion
+"""
+import io
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag_backend.metrics import stage
+
+BM25_ARTIFACT = "bm25"  # Name of the serialized BM25Index stored with the docstore
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.@'_-][a-z0-9]+)*")
+QUERY_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "by", "do", "does", "for", "from", "how", "in", "is", "me",
+    "of", "on", "or", "our", "the", "to", "what", "whats", "which", "who", "whom", "whose", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; compound tokens (emails, hyphenated names) also yield their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[.@'_-]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of documents, with numpy posting lists per token"""
+
+    def __init__(self, doc_ids: List[str], texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.doc_ids = list(doc_ids)
+        self.k1 = k1
+        self.b = b
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        lengths = []
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                postings[token].append((position, tf))
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(lengths) else 0.0
+        n = len(self.doc_ids)
+        self.postings = {}
+        for token, entries in postings.items():
+            positions = np.fromiter((p for p, _ in entries), dtype=np.int64, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[token] = (positions, tfs, idf)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def dumps(self) -> bytes:
+        """Serialize the postings so a saved index loads without re-tokenizing every document"""
+        tokens = list(self.postings)
+        entries = [self.postings[token] for token in tokens]
+        sizes = np.fromiter((len(positions) for positions, _, _ in entries), dtype=np.int64, count=len(entries))
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            doc_ids=np.array(self.doc_ids, dtype=str),
+            tokens=np.array(tokens, dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(sizes)]),
+            positions=np.concatenate([e[0] for e in entries]) if entries else np.array([], dtype=np.int64),
+            tfs=np.concatenate([e[1] for e in entries]) if entries else np.array([], dtype=np.float32),
+            idfs=np.array([e[2] for e in entries], dtype=np.float64),
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b]),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "BM25Index":
+        """Inverse of ``dumps``"""
+        arrays = np.load(io.BytesIO(data))
+        index = cls.__new__(cls)
+        index.doc_ids = arrays["doc_ids"].tolist()
+        index.k1, index.b = (float(v) for v in arrays["params"])
+        index.doc_lengths = arrays["doc_lengths"]
+        index.avg_length = float(index.doc_lengths.mean()) if len(index.doc_lengths) else 0.0
+        offsets, positions, tfs = arrays["offsets"], arrays["positions"], arrays["tfs"]
+        index.postings = {
+            token: (positions[start:end], tfs[start:end], float(idf))
+            for token, start, end, idf in zip(arrays["tokens"].tolist(), offsets[:-1], offsets[1:], arrays["idfs"])
+        }
+        return index
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs for the query, among the documents set in ``mask`` if given"""
+        if not self.doc_ids:
+            return []
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        tokens = [t for t in tokenize(query) if t not in QUERY_STOPWORDS] or tokenize(query)
+        for token in set(tokens):
+            entry = self.postings.get(token)
+            if entry is None:
+                continue
+            positions, tfs, idf = entry
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[positions] / self.avg_length)
+            scores[positions] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(self.doc_ids[i], float(scores[i])) for i in top]
+
+
+def document_key(doc: Document) -> str:
+    """Identity used to merge the same record coming from both retrievers"""
+    return str(doc.metadata.get("employee_key", doc.page_content))
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], weights: List[float], k: int,
+                           rrf_k: int = 60) -> List[Document]:
+    """Fuse ranked lists: score(d) = sum_i w_i / (rrf_k + rank_i(d))"""
+    scores: Dict[str, float] = defaultdict(float)
+    docs: Dict[str, Document] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc in enumerate(ranking, start=1):
+            key = document_key(doc)
+            scores[key] += weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [docs[key] for key in ordered[:k]]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves ``fetch_k`` candidates from both the FAISS vector store and a BM25
+    index over the same documents, then returns the top ``k`` by weighted
+    reciprocal rank fusion. Exposes ``vectorstore`` like a VectorStoreRetriever.
+    """
+
+    vectorstore: Any
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    search_type: str = "similarity"
+    vector_weight: float = 0.5
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _vector_candidates(self, query: str) -> List[Document]:
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        with stage("vector_search"):
+            if self.search_type == "mmr":
+                return self.vectorstore.max_marginal_relevance_search_by_vector(
+                    embedding, k=self.fetch_k, fetch_k=self.fetch_k * 2)
+            return self.vectorstore.similarity_search_by_vector(embedding, k=self.fetch_k)
+
+    def _lexical_candidates(self, query: str, mask: Optional[np.ndarray] = None) -> List[Document]:
+        with stage("lexical_search"):
+            docs = []
+            for doc_id, _ in self.bm25.search(query, self.fetch_k, mask):
+                doc = self.vectorstore.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    docs.append(doc)
+            return docs
+
+    def fuse(self, query: str, vector_docs: List[Document], mask: Optional[np.ndarray] = None) -> List[Document]:
+        """
+        Combine already-retrieved vector candidates with BM25 hits for ``query``; ``mask``
+        (document positions, in BM25 order) limits the BM25 side to filtered documents
+        """
+        return reciprocal_rank_fusion(
+            [vector_docs, self._lexical_candidates(query, mask)],
+            weights=[self.vector_weight, 1 - self.vector_weight],
+            k=self.k,
+            rrf_k=self.rrf_k,
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None
+    ) -> List[Document]:
+        return self.fuse(query, self._vector_candidates(query))
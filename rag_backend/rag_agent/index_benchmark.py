@@ -0,0 +1,127 @@
+"""
+Recall and latency benchmark of the configurable FAISS index types against exact (flat) search
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from rag_backend.config import get_faiss_index_path
+from rag_backend.rag_agent.dim_reduction import load_transform
+from rag_backend.rag_agent.index_factory import INDEX_TYPES, apply_search_params, build_faiss_index, load_vectors
+
+
+def _index_bytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).size)
+
+
+def benchmark_index(index_type: str, vectors: np.ndarray, queries: np.ndarray, k: int,
+                    ground_truth: np.ndarray, nprobe: Optional[int] = None,
+                    ef_search: Optional[int] = None) -> Dict:
+    """Build one index type and measure recall@k and per-query latency against ground truth"""
+    start = time.perf_counter()
+    index = build_faiss_index(vectors, index_type)
+    build_seconds = time.perf_counter() - start
+    apply_search_params(index, nprobe=nprobe, ef_search=ef_search)
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, ground_truth):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found[0]) & set(expected))
+
+    latencies = np.array(latencies)
+    return {
+        "index_type": index_type,
+        "faiss_class": type(index).__name__,
+        "nprobe": nprobe,
+        "ef_search": ef_search,
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 4),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 4),
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": _index_bytes(index),
+    }
+
+
+def run_benchmark(vectors: np.ndarray, index_types: List[str], k: int = 4, num_queries: int = 200,
+                  nprobes: Optional[List[int]] = None, ef_searches: Optional[List[int]] = None,
+                  seed: int = 0) -> Dict:
+    """
+    Benchmark each index type on queries sampled from the corpus (with small noise so
+    they are not exact duplicates). Ground truth comes from an exact flat search.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    sample = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    scale = float(np.std(vectors)) * 0.05
+    queries = vectors[sample] + rng.normal(0, scale, size=(len(sample), vectors.shape[1])).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        if index_type in ("ivf_flat", "ivf_pq"):
+            variants = [{"nprobe": n} for n in (nprobes or [None])]
+        elif index_type == "hnsw":
+            variants = [{"ef_search": e} for e in (ef_searches or [None])]
+        else:
+            variants = [{}]
+        for params in variants:
+            results.append(benchmark_index(index_type, vectors, queries, k, ground_truth, **params))
+
+    return {
+        "corpus_size": int(vectors.shape[0]),
+        "dimension": int(vectors.shape[1]),
+        "k": k,
+        "queries": int(len(queries)),
+        "results": results,
+    }
+
+
+def _print_table(report: Dict):
+    print(f"{report['corpus_size']} vectors x {report['dimension']} dims, "
+          f"{report['queries']} queries, recall@{report['k']}")
+    print(f"{'index':<10} {'params':<14} {'recall':>7} {'p50 ms':>9} {'p95 ms':>9} {'build s':>8} {'MB':>8}")
+    for r in report["results"]:
+        params = f"nprobe={r['nprobe']}" if r["nprobe"] else f"ef={r['ef_search']}" if r["ef_search"] else "-"
+        print(f"{r['index_type']:<10} {params:<14} {r['recall_at_k']:>7.3f} {r['latency_ms_p50']:>9.3f} "
+              f"{r['latency_ms_p95']:>9.3f} {r['build_seconds']:>8.2f} {r['index_bytes'] / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index types against exact search")
+    parser.add_argument("--index-path", default=get_faiss_index_path())
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", type=int, nargs="+", help="HNSW efSearch values to sweep")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    stored = faiss.read_index(str(Path(args.index_path) / "index.faiss"))
+    corpus = load_vectors(Path(args.index_path), stored)
+    if corpus is None:
+        raise SystemExit("No full-precision vectors found; rebuild the index with embed_store first")
+    transform = load_transform(args.index_path)
+    if transform is not None:
+        # Benchmark the vectors the served index actually holds
+        corpus = transform.apply(corpus)
+
+    report = run_benchmark(corpus, args.types, k=args.k, num_queries=args.queries,
+                           nprobes=args.nprobe, ef_searches=args.ef_search)
+    _print_table(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
@@ -0,0 +1,137 @@
+"""
+Construction and tuning of the FAISS index types used for employee search
+"""
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+from rag_backend.config import settings
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+VECTORS_NAME = "vectors.npy"  # full-precision vectors, row-aligned with index_to_docstore_id
+
+
+def _ivf_nlist(requested: int, n: int) -> int:
+    # FAISS wants roughly 39+ training points per list; keep small corpora trainable
+    return max(1, min(requested, n // 39 or 1))
+
+
+def index_build_params(index_type: Optional[str] = None) -> Dict[str, Any]:
+    """Settings that shape an index of the given type when it is built; an index built with others is stale"""
+    index_type = (index_type or settings.faiss_index_type).lower()
+    params: Dict[str, Any] = {"index_type": index_type}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        params["nlist"] = settings.faiss_nlist
+    if index_type == "ivf_pq":
+        params.update(pq_m=settings.faiss_pq_m, pq_nbits=settings.faiss_pq_nbits)
+    if index_type == "hnsw":
+        params.update(hnsw_m=settings.faiss_hnsw_m, ef_construction=settings.faiss_ef_construction)
+    return params
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: Optional[str] = None) -> faiss.Index:
+    """
+    Build (and train, where needed) an L2 index of the given type over ``vectors``.
+    Falls back to a flat index when the corpus is too small to train the requested type.
+    """
+    index_type = (index_type or settings.faiss_index_type).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'; expected one of {INDEX_TYPES}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+
+    try:
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(d, settings.faiss_hnsw_m)
+            index.hnsw.efConstruction = settings.faiss_ef_construction
+        elif index_type == "ivf_flat":
+            quantizer = faiss.IndexFlatL2(d)
+            index = faiss.IndexIVFFlat(quantizer, d, _ivf_nlist(settings.faiss_nlist, n))
+            index.train(vectors)
+        elif index_type == "ivf_pq":
+            if d % settings.faiss_pq_m:
+                raise ValueError(f"dimension {d} is not divisible by faiss_pq_m={settings.faiss_pq_m}")
+            if n < 2 ** settings.faiss_pq_nbits:
+                raise ValueError(f"{n} vectors are too few to train {settings.faiss_pq_nbits}-bit PQ codes")
+            quantizer = faiss.IndexFlatL2(d)
+            index = faiss.IndexIVFPQ(quantizer, d, _ivf_nlist(settings.faiss_nlist, n),
+                                     settings.faiss_pq_m, settings.faiss_pq_nbits)
+            index.train(vectors)
+        else:
+            index = faiss.IndexFlatL2(d)
+    except (ValueError, RuntimeError) as e:
+        print(f"Cannot build '{index_type}' index ({e}); using a flat index instead")
+        index = faiss.IndexFlatL2(d)
+
+    if n:
+        index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Set query-time recall/speed knobs (nprobe for IVF, efSearch for HNSW). IVF indexes
+    also get a direct map so vectors can be reconstructed by position, which MMR search
+    needs to re-rank candidates.
+    """
+    nprobe = nprobe or settings.faiss_nprobe
+    ef_search = ef_search or settings.faiss_ef_search
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        ivf.make_direct_map()
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def save_vectors(index_path: Path, vectors: np.ndarray):
+    np.save(Path(index_path) / VECTORS_NAME, np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def load_vectors(index_path: Path, index: Optional[faiss.Index] = None) -> Optional[np.ndarray]:
+    """Full-precision vectors saved with the index, or reconstructed from a flat index"""
+    path = Path(index_path) / VECTORS_NAME
+    if path.exists():
+        return np.load(path)
+    if isinstance(index, (faiss.IndexFlatL2, faiss.IndexFlat)):
+        return index.reconstruct_n(0, index.ntotal)
+    if isinstance(index, faiss.IndexIVFFlat) and index.nlist == 1:
+        index.make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+    return None
+
+
+def flat_index_from(vectors: np.ndarray) -> faiss.Index:
+    """Exact index used while adding/deleting rows during (re)indexing"""
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def mmappable_index(index: faiss.Index) -> faiss.Index:
+    """
+    On-disk layout for ``index``: FAISS can only memory-map IVF inverted lists, so a flat
+    index is stored as an IVF index with a single list, which scans every vector and is
+    still exact. Other index types are returned unchanged.
+    """
+    if not isinstance(index, (faiss.IndexFlatL2, faiss.IndexFlat)):
+        return index
+    quantizer = faiss.IndexFlat(index.d, index.metric_type)
+    quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+    ivf = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+    if index.ntotal:
+        ivf.add(index.reconstruct_n(0, index.ntotal))
+    return ivf
+
+
+def is_mmappable(index: faiss.Index) -> bool:
+    try:
+        faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return False
+    return True
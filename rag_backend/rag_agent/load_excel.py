@@ -1,28 +1,223 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 from langchain_core.documents import Document
+from pathlib import Path
+import numpy as np
+import os
 import pandas as pd
-from typing import List
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+from rag_backend.config import settings, get_snapshot_dir
+from rag_backend.rag_agent.excel_snapshot import has_fresh_snapshot, list_sheets, read_excel_cached
 
-def load_excel_data(filepath: str) -> List[Document]:
+def _normalize(col) -> str:
+    """Column name as EmployeeQueryEngine sees it: stripped, lowercased, spaces as underscores"""
+    return str(col).strip().lower().replace(' ', '_')
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [_normalize(col) for col in df.columns]
+    return df
+
+def _read_sheet(task: Tuple[str, Union[int, str], bool, str]) -> pd.DataFrame:
+    """Parse one sheet in a spawned worker process, which does not see runtime settings changes"""
+    path, sheet, use_snapshot, snapshot_dir = task
+    return read_excel_cached(path, sheet_name=sheet, cache_dir=snapshot_dir, use_snapshot=use_snapshot)
+
+def _sheet_tasks(sources: Sequence[str], sheets: Optional[Sequence[str]]) -> List[Tuple[str, Union[int, str]]]:
+    """(workbook, sheet) pairs to parse: the first sheet by default, "*" for every sheet, else the named ones"""
+    tasks = []
+    for path in sources:
+        if not sheets:
+            tasks.append((path, 0))
+            continue
+        available = list_sheets(path)
+        wanted = available if "*" in sheets else [name for name in sheets if name in available]
+        if not wanted:
+            print(f"No matching sheets in {path} (has {available}); skipping")
+        tasks.extend((path, name) for name in wanted)
+    return tasks
+
+def _align_columns(frames: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """
+    Give columns that normalize to the same name (e.g. "Start Date" and "start date ")
+    the header first seen for them, so sheets line up when concatenated
+    """
+    labels = {}
+    aligned = []
+    for df in frames:
+        renamed = [labels.setdefault(_normalize(col), col) for col in df.columns]
+        df = df.set_axis(renamed, axis=1)
+        aligned.append(df.loc[:, ~df.columns.duplicated()])
+    return aligned
+
+def read_workbooks(sources: Sequence[str], sheets: Optional[Sequence[str]] = None,
+                   workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Parse every requested sheet of every workbook, across ``workers`` processes when
+    more than one sheet needs parsing (default: settings.ingest_workers, 0 = one per
+    CPU), and merge the rows. Returns the merged table and, on the same index, its
+    provenance (source_file, source_sheet, source_row). A single sheet keeps its
+    original row index; merged sheets are renumbered.
+    """
+    tasks = _sheet_tasks(sources, sheets)
+    # Sheets with a fresh snapshot load faster in-process than a worker process starts
+    cold = [task for task in tasks if not has_fresh_snapshot(*task)]
+    workers = workers if workers is not None else settings.ingest_workers
+    workers = min(len(cold), workers or os.cpu_count() or 1)
+    parsed = {}
+    if workers > 1:
+        jobs = [(path, sheet, settings.enable_data_snapshot, get_snapshot_dir()) for path, sheet in cold]
+        # spawn, not fork: this also runs from the server's worker threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parsed = dict(zip(cold, pool.map(_read_sheet, jobs)))
+    frames = [parsed[task] if task in parsed else read_excel_cached(task[0], sheet_name=task[1]) for task in tasks]
+
+    frames = _align_columns(frames)
+    provenance = [
+        pd.DataFrame({"source_file": Path(path).name, "source_sheet": sheet, "source_row": df.index}, index=df.index)
+        for (path, sheet), df in zip(tasks, frames)
+    ]
+    if len(frames) == 1:
+        return frames[0], provenance[0]
+    if not frames:
+        return pd.DataFrame(), pd.DataFrame(columns=["source_file", "source_sheet", "source_row"])
+    return pd.concat(frames, ignore_index=True, sort=False), pd.concat(provenance, ignore_index=True)
+
+def _key_column(df: pd.DataFrame):
+    """Column holding a stable per-employee identifier (email), if the sheet has one"""
+    for col in df.columns:
+        if _normalize(col) in ("email", "email_address", "work_email"):
+            return col
+    return None
+
+# Normalized header spellings for the structured fields attached to every document
+METADATA_COLUMNS = {
+    "department": ("department", "dept", "team", "division"),
+    "title": ("title", "job_title", "position", "role"),
+    "location": ("location", "office", "city", "site"),
+}
+START_DATE_COLUMNS = ("start_date", "hire_date", "date_hired", "joined", "start_year")
+
+def _find_column(df: pd.DataFrame, aliases: Sequence[str]):
+    by_name = {_normalize(col): col for col in df.columns}
+    return next((by_name[name] for name in aliases if name in by_name), None)
+
+def _text_or_none(value):
+    if pd.isna(value):
+        return None
+    return str(value).strip() or None
+
+def structured_metadata(df: pd.DataFrame) -> List[dict]:
     """
-    Load rows from the first sheet of an Excel file and convert each row into a LangChain Document.
-    Each row is converted into a pipe-delimited string with metadata for row index.
+    Per-row department, title, location and start_year for filtering, taken from the
+    first matching column of each kind; fields a row (or the sheet) lacks are omitted
     """
-    df = pd.read_excel(filepath, sheet_name=0, engine="openpyxl")  # Load only the first sheet
-    print(f"Loaded {df.shape[0]} rows from Excel (including blanks)")
+    fields = {}
+    for field, aliases in METADATA_COLUMNS.items():
+        col = _find_column(df, aliases)
+        if col is not None:
+            fields[field] = np.array([_text_or_none(v) for v in df[col]], dtype=object)
+    col = _find_column(df, START_DATE_COLUMNS)
+    if col is not None:
+        if _normalize(col) == "start_year":
+            years = pd.to_numeric(df[col], errors="coerce")
+        else:
+            years = pd.to_datetime(df[col], errors="coerce").dt.year
+        fields["start_year"] = np.array([None if pd.isna(y) else int(y) for y in years], dtype=object)
+    return [
+        {field: values[i] for field, values in fields.items() if values[i] is not None}
+        for i in range(len(df))
+    ]
+
+def select_columns(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> List:
+    """
+    Resolve the ordered list of sheet columns to serialize. Names are matched
+    case-insensitively (spaces and underscores are equivalent); unknown names are skipped.
+    """
+    if not columns:
+        return list(df.columns)
+    by_name = {_normalize(col): col for col in df.columns}
+    selected = []
+    for name in columns:
+        col = by_name.get(_normalize(name))
+        if col is None:
+            print(f"Column '{name}' not found in sheet; skipping")
+        elif col not in selected:
+            selected.append(col)
+    return selected
+
+def serialize_rows(df: pd.DataFrame, columns: Optional[Sequence] = None) -> np.ndarray:
+    """
+    Build the pipe-delimited "col: value" text for every row, one column at a time.
+    Missing values are skipped exactly as a per-row join over non-null cells would.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    texts = np.full(len(df), "", dtype=object)
+    for col in columns:
+        present = df[col].notna().to_numpy()
+        if not present.any():
+            continue
+        # astype(object) first so timestamps render as str(Timestamp), like the row-wise path
+        values = df[col].astype(object).astype(str).to_numpy(dtype=object)
+        part = np.where(present, f"{col}: " + values, "")
+        separator = np.where(present & (texts != ""), " | ", "")
+        texts = texts + separator + part
+    return texts
+
+def _employee_keys(df: pd.DataFrame) -> List[str]:
+    """Stable per-row keys: lowercased email when present, otherwise row-<index>, de-duplicated"""
+    keys = np.array([f"row-{index}" for index in df.index], dtype=object)
+    key_col = _key_column(df)
+    if key_col is not None:
+        emails = df[key_col].astype(object).where(df[key_col].notna(), "").astype(str).str.strip().str.lower()
+        has_email = (emails != "").to_numpy()
+        keys = np.where(has_email, emails.to_numpy(dtype=object), keys)
+    duplicated = pd.Series(keys).duplicated().to_numpy()
+    if duplicated.any():
+        keys = np.where(duplicated, keys + "#" + df.index.astype(str).to_numpy(dtype=object), keys)
+    return list(keys)
+
+def iter_excel_documents(filepath: Union[str, Sequence[str]], chunk_size: int = 1000,
+                         columns: Optional[Sequence[str]] = None,
+                         sheets: Optional[Sequence[str]] = None) -> Iterator[List[Document]]:
+    """
+    Yield LangChain Documents for the rows of one or more workbooks in chunks of ``chunk_size``
+    rows, so downstream stages (embedding) never need the whole corpus as Document objects.
+    ``sheets`` picks sheets by name ("*" for all; default: the first sheet of each workbook)
+    and ``columns`` selects and orders the fields included in each row's text.
+    """
+    sources = [filepath] if isinstance(filepath, (str, Path)) else list(filepath)
+    df, provenance = read_workbooks([str(path) for path in sources], sheets=sheets)
+    print(f"Loaded {df.shape[0]} rows from {len(sources)} workbook(s) (including blanks)")
     df = df.dropna(how="all")  # Drop rows where all values are NaN
+    provenance = provenance.loc[df.index]
     print(f"Rows after dropping completely blank: {df.shape[0]}")
 
-    documents = []
-    for index, row in df.iterrows():
-        row_text = " | ".join(
-            f"{col}: {str(val)}" for col, val in row.items() if pd.notna(val)
-        )
-        if row_text.strip():
-            documents.append(
-                Document(
-                    page_content=row_text,
-                    metadata={"row_index": index}
-                )
-            )
+    keys = _employee_keys(df)
+    selected = select_columns(df, columns)
+    for start in range(0, len(df), max(1, chunk_size)):
+        chunk = df.iloc[start:start + chunk_size]
+        origin = provenance.iloc[start:start + chunk_size].to_dict("records")
+        texts = serialize_rows(chunk, selected)
+        fields = structured_metadata(chunk)
+        documents = [
+            Document(page_content=text, metadata={"row_index": index, "employee_key": key, **source, **extra})
+            for text, index, key, source, extra in zip(texts, chunk.index, keys[start:start + chunk_size],
+                                                       origin, fields)
+            if text.strip()
+        ]
+        if documents:
+            yield documents
 
+def load_excel_data(filepath: Union[str, Sequence[str]], columns: Optional[Sequence[str]] = None,
+                    sheets: Optional[Sequence[str]] = None) -> List[Document]:
+    """
+    Load rows from one or more Excel workbooks (the first sheet of each by default) and convert
+    each row into a LangChain Document. Each row is converted into a pipe-delimited string with
+    metadata for row index, a stable employee key (the email address when present, otherwise
+    the row index), its source file, sheet and row, and the department, title, location and
+    start_year used for filtered retrieval.
+    """
+    documents = []
+    for chunk in iter_excel_documents(filepath, columns=columns, sheets=sheets):
+        documents.extend(chunk)
     return documents
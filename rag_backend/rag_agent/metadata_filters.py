@@ -0,0 +1,238 @@
+"""
+Structured metadata filters (department, title, location, start year) for retrieval,
+resolved to position masks over the FAISS index with optional per-department shards
+"""
+import io
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from rag_backend.config import settings
+from rag_backend.rag_agent.docstore import iter_indexed_documents, load_artifact
+from rag_backend.rag_agent.query_filters import FILTER_FIELDS, normalize_value
+
+METADATA_ARTIFACT = "metadata"  # Name of the serialized MetadataIndex stored with the docstore
+
+
+class MetadataIndex:
+    """
+    Column-wise copy of the filterable metadata of every indexed document, in FAISS
+    position order, so a filter resolves to a boolean row mask with a few numpy comparisons
+    """
+
+    def __init__(self, positions: Sequence[int], metadatas: Iterable[Mapping[str, Any]]):
+        metadatas = list(metadatas)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.values = {
+            field: np.array([normalize_value(meta.get(field)) for meta in metadatas], dtype=object)
+            for field in FILTER_FIELDS
+        }
+        # -1 marks rows without a start year; they never satisfy a year bound
+        self.start_years = np.array(
+            [meta.get("start_year") if meta.get("start_year") is not None else -1 for meta in metadatas],
+            dtype=np.int64)
+        self.has_metadata = any(meta.get(field) is not None
+                                for meta in metadatas for field in FILTER_FIELDS + ("start_year",))
+        self.shards: Optional[DepartmentShards] = None
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def dumps(self) -> bytes:
+        """Serialize the columns so a saved index loads without reading every document"""
+        buffer = io.BytesIO()
+        np.savez(buffer, positions=self.positions, start_years=self.start_years,
+                 has_metadata=np.array(self.has_metadata),
+                 **{f"values_{field}": self.values[field].astype(str) for field in FILTER_FIELDS})
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "MetadataIndex":
+        """Inverse of ``dumps`` (without department shards)"""
+        arrays = np.load(io.BytesIO(data))
+        metadata_index = cls.__new__(cls)
+        metadata_index.positions = arrays["positions"]
+        metadata_index.values = {field: arrays[f"values_{field}"].astype(object) for field in FILTER_FIELDS}
+        metadata_index.start_years = arrays["start_years"]
+        metadata_index.has_metadata = bool(arrays["has_metadata"])
+        metadata_index.shards = None
+        return metadata_index
+
+    def mask(self, filters: Mapping[str, Any]) -> np.ndarray:
+        """Rows matching a normalized filter spec"""
+        mask = np.ones(len(self.positions), dtype=bool)
+        for field in FILTER_FIELDS:
+            if field in filters:
+                mask &= np.isin(self.values[field], filters[field])
+        if "start_year_min" in filters:
+            mask &= self.start_years >= filters["start_year_min"]
+        if "start_year_max" in filters:
+            mask &= (self.start_years >= 0) & (self.start_years <= filters["start_year_max"])
+        return mask
+
+    def facets(self) -> Dict[str, int]:
+        """Distinct values per filter field"""
+        return {field: len(set(values) - {""}) for field, values in self.values.items()}
+
+
+def _index_vectors(index: faiss.Index) -> np.ndarray:
+    """Every vector stored in the index, by position (approximate for PQ codes)"""
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _search_params(index: faiss.Index, selector) -> faiss.SearchParameters:
+    """Search parameters restricting ``index`` to ``selector`` while keeping its nprobe/efSearch"""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    except RuntimeError:
+        pass
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+class DepartmentShards:
+    """
+    An exact (flat) sub-index per department holding a copy of that department's vectors,
+    so a department-filtered search scans only the selected departments' rows
+    """
+
+    def __init__(self, index: faiss.Index, metadata_index: MetadataIndex):
+        vectors = _index_vectors(index)
+        self.metric_type = index.metric_type
+        self.shards: Dict[str, Any] = {}  # department -> (flat index, MetadataIndex rows)
+        departments = metadata_index.values["department"]
+        for department in sorted(set(departments) - {""}):
+            rows = np.flatnonzero(departments == department)
+            shard = faiss.IndexFlat(index.d, index.metric_type)
+            shard.add(np.ascontiguousarray(vectors[metadata_index.positions[rows]], dtype=np.float32))
+            self.shards[department] = (shard, rows)
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def search(self, vectors: np.ndarray, k: int, departments: Sequence[str],
+               mask: np.ndarray) -> np.ndarray:
+        """MetadataIndex rows of the ``k`` nearest masked rows in the given departments (-1 padded)"""
+        distances, rows = [], []
+        for department in departments:
+            if department not in self.shards:
+                continue
+            shard, shard_rows = self.shards[department]
+            local = mask[shard_rows]
+            if not local.any():
+                continue
+            selector = None
+            params = None
+            if not local.all():
+                selector = faiss.IDSelectorBatch(np.flatnonzero(local).astype(np.int64))
+                params = faiss.SearchParameters(sel=selector)
+            found_d, found = shard.search(vectors, min(k, shard.ntotal), params=params)
+            distances.append(found_d)
+            rows.append(np.where(found >= 0, shard_rows[np.maximum(found, 0)], -1))
+        result = np.full((len(vectors), k), -1, dtype=np.int64)
+        if not rows:
+            return result
+        distances, rows = np.hstack(distances), np.hstack(rows)
+        # Merge shard results; missing hits sort last for either metric
+        if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+            distances = np.where(rows >= 0, -distances, np.inf)
+        else:
+            distances = np.where(rows >= 0, distances, np.inf)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        merged = np.take_along_axis(rows, order, axis=1)
+        result[:, :merged.shape[1]] = merged
+        return result
+
+
+def filtered_search(vectorstore, vectors: np.ndarray, k: int, filters: Mapping[str, Any],
+                    metadata_index: MetadataIndex) -> np.ndarray:
+    """
+    FAISS positions of the ``k`` nearest documents matching ``filters`` for each query
+    vector (-1 where fewer match). Department filters are answered from the department
+    shards when they were built; otherwise the main index is searched with an ID selector
+    over the matching rows, so non-matching documents are never scored.
+    """
+    mask = metadata_index.mask(filters)
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if not mask.any() or k <= 0:
+        return np.full((len(vectors), max(k, 0)), -1, dtype=np.int64)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+
+    shards = metadata_index.shards
+    if shards is not None and "department" in filters:
+        rows = shards.search(vectors, k, filters["department"], mask)
+        return np.where(rows >= 0, metadata_index.positions[np.maximum(rows, 0)], -1)
+
+    index = vectorstore.index
+    selector = faiss.IDSelectorBatch(metadata_index.positions[mask])
+    try:
+        _, positions = index.search(vectors, k, params=_search_params(index, selector))
+    except RuntimeError:
+        # Index types without selector support: rank everything and keep matching hits
+        _, ranked = index.search(vectors, index.ntotal)
+        allowed = np.isin(ranked, metadata_index.positions[mask])
+        positions = np.full((len(vectors), k), -1, dtype=np.int64)
+        for i, (row, keep) in enumerate(zip(ranked, allowed)):
+            hits = row[keep][:k]
+            positions[i, :len(hits)] = hits
+    return positions
+
+
+_indexes: "weakref.WeakKeyDictionary[Any, MetadataIndex]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def build_metadata_index(vectorstore, positions: Sequence[int], metadatas: List[Mapping[str, Any]],
+                         shards: Optional[bool] = None) -> MetadataIndex:
+    """
+    Build and register the MetadataIndex of a vector store from its documents' positions and
+    metadata, with department shards when ``shards`` (default: settings.rag_department_shards)
+    """
+    return register_metadata_index(vectorstore, MetadataIndex(positions, metadatas), shards)
+
+
+def register_metadata_index(vectorstore, metadata_index: MetadataIndex,
+                            shards: Optional[bool] = None) -> MetadataIndex:
+    """Attach a MetadataIndex to its vector store, building department shards as configured"""
+    if not metadata_index.has_metadata and len(metadata_index):
+        print("Warning: indexed documents carry no department/title/location/start_year metadata; "
+              "filtered queries will match nothing until the index is rebuilt with embed_store")
+    shards = settings.rag_department_shards if shards is None else shards
+    if shards and metadata_index.has_metadata:
+        try:
+            metadata_index.shards = DepartmentShards(vectorstore.index, metadata_index)
+            print(f"Built {len(metadata_index.shards)} department shards")
+        except RuntimeError as e:
+            print(f"Cannot build department shards ({e}); filtering the main index instead")
+    with _indexes_lock:
+        _indexes[vectorstore] = metadata_index
+    return metadata_index
+
+
+def metadata_index_for(vectorstore) -> MetadataIndex:
+    """
+    The registered MetadataIndex of a vector store; on first use it is loaded from the
+    copy saved with the docstore, or built from every stored document
+    """
+    with _indexes_lock:
+        metadata_index = _indexes.get(vectorstore)
+    if metadata_index is not None:
+        return metadata_index
+    saved = load_artifact(vectorstore, METADATA_ARTIFACT)
+    if saved is not None:
+        return register_metadata_index(vectorstore, MetadataIndex.loads(saved))
+    positions, metadatas = [], []
+    for position, _, doc in iter_indexed_documents(vectorstore):
+        positions.append(position)
+        metadatas.append(doc.metadata)
+    return build_metadata_index(vectorstore, positions, metadatas)
@@ -0,0 +1,128 @@
+"""
+Shared connection-pooled HTTP client for the Ollama API, used by embeddings,
+generation and the health prober so every call reuses keep-alive connections
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from rag_backend.config import settings
+
+
+class OllamaClient:
+    """
+    Process-wide Ollama connections. Blocking model calls run on worker threads and
+    share the pooled synchronous client; coroutines (the health prober) use an async client
+    with the same limits, created on the event loop that first asks for it.
+    """
+
+    def __init__(self, max_connections: int = 32, keepalive_expiry: float = 60.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.sync = httpx.Client(limits=self.limits, timeout=None)
+        self._async: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async is None or self._async_loop is not loop:
+            # An AsyncClient's connections belong to the loop that opened them
+            self._async = httpx.AsyncClient(limits=self.limits, timeout=None)
+            self._async_loop = loop
+        return self._async
+
+    def url(self, path: str) -> str:
+        """Absolute URLs pass through; API paths are resolved against OLLAMA_BASE_URL"""
+        if path.startswith("http"):
+            return path
+        return f"{settings.ollama_base_url.rstrip('/')}/{path.lstrip('/')}"
+
+    def post_json(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = self.sync.post(self.url(path), json=payload, timeout=timeout)
+        if response.status_code != 200:
+            raise ValueError(f"Ollama call failed with status code {response.status_code}: {response.text}")
+        return response.json()
+
+    def stream_lines(self, path: str, payload: Dict[str, Any], model: str,
+                     timeout: Optional[float] = None) -> Iterator[str]:
+        """NDJSON lines of a streamed response; the connection returns to the pool when the stream is closed"""
+        with self.sync.stream("POST", self.url(path), json=payload, timeout=timeout) as response:
+            if response.status_code != 200:
+                response.read()
+                if response.status_code == 404:
+                    # Imported here so loading the API module does not pull in LangChain
+                    from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+                    raise OllamaEndpointNotFoundError(
+                        "Ollama call failed with status code 404. Maybe your model is not found "
+                        f"and you should pull the model with `ollama pull {model}`."
+                    )
+                raise ValueError(f"Ollama call failed with status code {response.status_code}. "
+                                 f"Details: {_error_detail(response)}")
+            yield from response.iter_lines()
+
+    def preload(self, model: str, embedding: bool = False, keep_alive: Optional[str] = None,
+                timeout: Optional[float] = None):
+        """
+        Have Ollama load ``model`` into memory (and keep it there for ``keep_alive``) without
+        generating anything, so the first real request does not pay the model load
+        """
+        payload: Dict[str, Any] = {"model": model, "prompt": "warm up" if embedding else "", "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        self.post_json("/api/embeddings" if embedding else "/api/generate", payload, timeout=timeout)
+
+    def list_models(self, timeout: float = 5.0) -> List[str]:
+        response = self.sync.get(self.url("/api/tags"), timeout=timeout)
+        response.raise_for_status()
+        return [m.get("name", "") for m in response.json().get("models", [])]
+
+    async def alist_models(self, timeout: float = 5.0) -> List[str]:
+        response = await self.async_client().get(self.url("/api/tags"), timeout=timeout)
+        response.raise_for_status()
+        return [m.get("name", "") for m in response.json().get("models", [])]
+
+    async def aclose(self):
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+
+    def close(self):
+        self.sync.close()
+
+
+def _error_detail(response: httpx.Response) -> Optional[str]:
+    try:
+        return response.json().get("error")
+    except json.JSONDecodeError:
+        return response.text
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client() -> OllamaClient:
+    """The process-wide client, created on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(
+                max_connections=settings.ollama_max_connections,
+                keepalive_expiry=settings.ollama_keepalive_expiry,
+            )
+        return _client
+
+
+async def close_ollama_client():
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+        client.close()
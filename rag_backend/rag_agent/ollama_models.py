@@ -0,0 +1,92 @@
+"""
+Ollama LLM and embedding clients configured from Settings
+"""
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_community.embeddings import OllamaEmbeddings
+from langchain_community.llms import Ollama
+
+from rag_backend.config import settings
+from rag_backend.rag_agent.ollama_client import get_ollama_client
+
+
+class TunedOllama(Ollama):
+    """
+    Ollama LLM that also sends num_predict and keep_alive, which this client version
+    does not expose, and streams over the shared connection pool instead of opening a
+    new connection per call
+    """
+
+    num_predict: Optional[int] = None  # Max tokens generated per answer
+    keep_alive: Optional[str] = None  # How long Ollama keeps the model loaded, e.g. "30m" or "-1"
+
+    @property
+    def _default_params(self) -> Dict[str, Any]:
+        params = super()._default_params
+        if self.num_predict is not None:
+            params["options"]["num_predict"] = self.num_predict
+        if self.keep_alive is not None:
+            params["keep_alive"] = self.keep_alive
+        return params
+
+    def _create_stream(self, api_url: str, payload: Any, stop: Optional[List[str]] = None,
+                       **kwargs: Any) -> Iterator[str]:
+        # Same request body as Ollama._create_stream
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        stop = self.stop if self.stop is not None else (stop or [])
+        params = self._default_params
+        if "model" in kwargs:
+            params["model"] = kwargs["model"]
+        if "options" in kwargs:
+            params["options"] = kwargs["options"]
+        else:
+            params["options"] = {**params["options"], "stop": stop, **kwargs}
+        if payload.get("messages"):
+            request_payload = {"messages": payload.get("messages", []), **params}
+        else:
+            request_payload = {"prompt": payload.get("prompt"), "images": payload.get("images", []), **params}
+        return get_ollama_client().stream_lines(api_url, request_payload, self.model, timeout=self.timeout)
+
+
+class TunedOllamaEmbeddings(OllamaEmbeddings):
+    """OllamaEmbeddings that forwards keep_alive so the embedding model stays resident, over the shared pool"""
+
+    keep_alive: Optional[str] = None
+
+    @property
+    def _default_params(self) -> Dict[str, Any]:
+        params = super()._default_params
+        if self.keep_alive is not None:
+            params["keep_alive"] = self.keep_alive
+        return params
+
+    def _process_emb_response(self, input: str) -> List[float]:
+        payload = {"model": self.model, "prompt": input, **self._default_params}
+        return get_ollama_client().post_json(f"{self.base_url}/api/embeddings", payload)["embedding"]
+
+
+def answer_token_limit() -> Optional[int]:
+    """num_predict sent to Ollama: the tighter of OLLAMA_NUM_PREDICT and the context budget's answer cap"""
+    limits = [n for n in (settings.ollama_num_predict, settings.context_max_answer_tokens) if n]
+    return min(limits) if limits else None
+
+
+def build_llm() -> TunedOllama:
+    return TunedOllama(
+        model=settings.ollama_model,
+        base_url=settings.ollama_base_url,
+        num_ctx=settings.ollama_num_ctx,
+        num_predict=answer_token_limit(),
+        temperature=settings.ollama_temperature,
+        keep_alive=settings.ollama_keep_alive,
+        timeout=settings.request_timeout,
+    )
+
+
+def build_embeddings() -> TunedOllamaEmbeddings:
+    return TunedOllamaEmbeddings(
+        model=settings.ollama_embedding_model,
+        base_url=settings.ollama_base_url,
+        keep_alive=settings.ollama_keep_alive,
+    )
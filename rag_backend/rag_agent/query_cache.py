@@ -0,0 +1,165 @@
+"""
+Answer cache for the RAG chain with exact and semantic (embedding) lookups
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different phrasings share a cache key"""
+    query = query.lower().strip()
+    query = re.sub(r"[^\w\s@.-]", " ", query)
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" .")
+
+
+def unit_vector(vector) -> np.ndarray:
+    """L2-normalized float32 copy of an embedding, as stored for semantic lookups"""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def index_version(index_path: str) -> Optional[int]:
+    """Latest modification time of the persisted FAISS index files, used to detect rebuilds"""
+    versions = []
+    for name in ("index.faiss", "docstore.sqlite", "index.pkl", "transform.npz"):
+        try:
+            versions.append(os.stat(os.path.join(index_path, name)).st_mtime_ns)
+        except OSError:
+            if name == "index.faiss":
+                return None
+    return max(versions)
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of RAG results keyed on normalized query text.
+
+    Exact lookups are cheap and safe to run on the event loop. Semantic lookups
+    embed the query (a blocking Ollama call) and compare it against the
+    embeddings of cached queries, returning a hit above ``similarity_threshold``.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: float = 3600,
+        similarity_threshold: float = 0.95,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._entries: "OrderedDict[str, Tuple[float, Any, Optional[np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_version = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.monotonic() - created > self.ttl
+
+    @staticmethod
+    def _key(query: str, scope: str = "") -> str:
+        return f"{normalize_query(query)}\x00{scope}" if scope else normalize_query(query)
+
+    def get(self, query: str, scope: str = "") -> Optional[Any]:
+        """Exact lookup on normalized query text, within ``scope`` (e.g. the query's metadata filters)"""
+        key = self._key(query, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, result, _ = entry
+            if self._expired(created):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """Unit-normalized query embedding, or None when semantic lookup is disabled"""
+        if self.embed_fn is None:
+            return None
+        return unit_vector(self.embed_fn(query))
+
+    def get_similar(self, embedding: Optional[np.ndarray]) -> Optional[Any]:
+        """Return the cached result whose query embedding is most similar, if above threshold"""
+        if embedding is None:
+            return None
+        with self._lock:
+            keys = [k for k, (created, _, emb) in self._entries.items()
+                    if emb is not None and emb.shape == embedding.shape and not self._expired(created)]
+            if keys:
+                matrix = np.stack([self._entries[k][2] for k in keys])
+                scores = matrix @ embedding
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return self._entries[key][1]
+            return None
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query: str, result: Any, embedding: Optional[np.ndarray] = None, scope: str = ""):
+        """
+        Store a result, evicting the least recently used entries beyond max_size. Scoped
+        results should be stored without an embedding so semantic lookups never return them.
+        """
+        if self.max_size <= 0:
+            return
+        key = self._key(query, scope)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached answer (e.g. after the index is rebuilt)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def invalidate_if_changed(self, version: Optional[int]) -> bool:
+        """Invalidate when the index version differs from the one the cache was filled from"""
+        with self._lock:
+            if version == self._index_version:
+                return False
+            first_check = self._index_version is None and not self._entries
+            self._index_version = version
+        if not first_check:
+            self.invalidate()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,57 @@
+"""
+Metadata filter specs accepted by the query endpoints (department, title, location, start year).
+Kept free of FAISS and LangChain imports so the API module loads quickly.
+"""
+import json
+from typing import Any, Dict, Mapping, Optional
+
+FILTER_FIELDS = ("department", "title", "location")
+YEAR_BOUNDS = ("start_year_min", "start_year_max")
+
+
+def normalize_value(value) -> str:
+    """Metadata or filter value as compared: stripped and lowercased ("" when missing)"""
+    return str(value).strip().lower() if value is not None else ""
+
+
+def normalize_filters(filters: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Canonical form of a filter spec: department/title/location become sorted lists of
+    lowercased values (a single string is one value, a list matches any of them) and
+    start_year_min/max become ints. Unset fields are dropped; None when nothing is filtered.
+    """
+    if not filters:
+        return None
+    unknown = set(filters) - set(FILTER_FIELDS) - set(YEAR_BOUNDS)
+    if unknown:
+        raise ValueError(f"Unknown filter field(s) {sorted(unknown)}; expected {FILTER_FIELDS + YEAR_BOUNDS}")
+    normalized: Dict[str, Any] = {}
+    for field in FILTER_FIELDS:
+        value = filters.get(field)
+        if value is None:
+            continue
+        values = sorted({normalize_value(v) for v in ([value] if isinstance(value, str) else value)} - {""})
+        if values:
+            normalized[field] = values
+    for bound in YEAR_BOUNDS:
+        if filters.get(bound) is not None:
+            normalized[bound] = int(filters[bound])
+    return normalized or None
+
+
+def filters_key(filters: Optional[Mapping[str, Any]]) -> str:
+    """Stable string for a normalized filter spec (used in cache keys); empty when unfiltered"""
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+
+def matches(metadata: Mapping[str, Any], filters: Mapping[str, Any]) -> bool:
+    """Whether one document's metadata satisfies a normalized filter spec"""
+    for field in FILTER_FIELDS:
+        if field in filters and normalize_value(metadata.get(field)) not in filters[field]:
+            return False
+    year = metadata.get("start_year")
+    if "start_year_min" in filters and (year is None or year < filters["start_year_min"]):
+        return False
+    if "start_year_max" in filters and (year is None or year > filters["start_year_max"]):
+        return False
+    return True
@@ -0,0 +1,196 @@
+"""
+Fast-path router that answers structured lookups from EmployeeQueryEngine without the LLM
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine, EmployeeSnapshot, experience_mask
+
+MAX_LISTED = 25
+
+EMPLOYEE_NOUNS = "employees|people|staff|members|folks|persons"
+EMPLOYEE_WORDS = rf"(?:{EMPLOYEE_NOUNS})"
+DEPT_SUFFIX = r"(?:\s+(?:department|dept|team|group|org))?"
+
+PATTERNS = [
+    ("count_total", re.compile(
+        rf"^how many {EMPLOYEE_WORDS}(?: (?:are there|do we have|work here|are employed|in total|total|overall))?$")),
+    ("count_department", re.compile(
+        rf"^how many(?: {EMPLOYEE_WORDS})?(?: (?:are|work|are there))? (?:in|at|on) (?:the )?(?P<department>.+?){DEPT_SUFFIX}$")),
+    ("list_department", re.compile(
+        rf"^(?:who works|who is|who are|(?:list|show)(?: me)?(?: all)?(?: the)? {EMPLOYEE_WORDS}|{EMPLOYEE_WORDS}) "
+        rf"(?:in|at|on|from) (?:the )?(?P<department>.+?){DEPT_SUFFIX}$")),
+    ("experience", re.compile(
+        rf"^(?:(?:which|what|list|show)(?: me)?(?: all)?(?: the)? {EMPLOYEE_WORDS}|{EMPLOYEE_WORDS}|who)"
+        r"(?: (?:have|has|with))?(?: (?:worked|been)(?: here)?(?: for)?)? "
+        r"(?:(?P<min_op>more than|over|at least) (?P<min>\d+(?:\.\d+)?)|(?P<max_op>less than|under|fewer than|at most) "
+        r"(?P<max>\d+(?:\.\d+)?)|between (?P<low>\d+(?:\.\d+)?) and (?P<high>\d+(?:\.\d+)?)) years?"
+        r"(?: of (?:experience|service|tenure)| (?:experience|service|tenure))?(?: here| at the company)?$")),
+    ("who_is", re.compile(r"^(?:who is|who's|whos|find|look up|lookup) (?:the )?(?P<target>[\w .'@-]+)$")),
+]
+
+
+@dataclass
+class RouteDecision:
+    """Outcome of routing a query: answered from the table ('structured') or sent to RAG"""
+    route: str
+    intent: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    answer: Optional[str] = None
+    records: List[Dict] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"route": self.route, "intent": self.intent, "params": self.params}
+
+
+def _clean(query: str) -> str:
+    query = query.lower().strip()
+    query = re.sub(r"[?!]+$", "", query).strip()
+    return re.sub(r"\s+", " ", query)
+
+
+def _records(frame: pd.DataFrame) -> List[Dict]:
+    """DataFrame rows as JSON-friendly dicts (NaN becomes None)"""
+    return frame.astype(object).where(pd.notna(frame), None).to_dict("records")
+
+
+def _describe(record: Dict) -> str:
+    """One-line description of an employee record"""
+    name = record.get("name", "Unknown")
+    details = [str(record[k]) for k in ("title", "department") if pd.notna(record.get(k))]
+    text = f"{name} ({', '.join(details)})" if details else str(name)
+    if pd.notna(record.get("email")):
+        text += f" - {record['email']}"
+    return text
+
+
+class QueryRouter:
+    """
+    Recognizes high-confidence structured questions (department listings and
+    counts, "who is X", experience ranges) and answers them directly from the
+    pandas-backed EmployeeQueryEngine. Anything ambiguous or open-ended is
+    routed to the RAG chain. Each question is answered from a single engine
+    snapshot, so a concurrent reload never mixes two versions of the table.
+    """
+
+    def __init__(self, engine: EmployeeQueryEngine):
+        self.engine = engine
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.engine.df
+
+    @staticmethod
+    def _resolve_department(snapshot: EmployeeSnapshot, text: str) -> Optional[Tuple[str, np.ndarray]]:
+        """Map user text onto exactly one known department: its name and row positions, or None"""
+        index = snapshot.indexes.get("department")
+        if index is None:
+            return None
+        text = text.strip().lower()
+        if text not in index.value_ids:
+            word = re.compile(rf"\b{re.escape(text)}\b")
+            partial = {v for v in index.values if v and word.search(v)}
+            partial.update(snapshot.acronyms["department"].get(text, []))
+            if len(partial) != 1:
+                return None
+            text = partial.pop()
+        rows = index.exact(text)
+        return str(snapshot.df["department"].iat[rows[0]]), rows
+
+    @staticmethod
+    def _match_title(snapshot: EmployeeSnapshot, text: str) -> List[Dict]:
+        index = snapshot.indexes.get("title")
+        if index is None:
+            return []
+        values = {text, *snapshot.acronyms["title"].get(text.replace(".", ""), [])}
+        rows = np.sort(np.concatenate([index.exact(v) for v in values]))
+        return _records(snapshot.df.iloc[rows])
+
+    @staticmethod
+    def _match_name(snapshot: EmployeeSnapshot, text: str) -> List[Dict]:
+        index = snapshot.indexes.get("name")
+        if index is None or len(text) < 3:
+            return []
+        return _records(snapshot.df.iloc[index.lookup(text)])
+
+    def route(self, query: str) -> RouteDecision:
+        snapshot = self.engine.current()
+        if snapshot.df.empty:
+            return RouteDecision(route="rag")
+        cleaned = _clean(query)
+
+        for intent, pattern in PATTERNS:
+            match = pattern.match(cleaned)
+            if not match:
+                continue
+            decision = getattr(self, f"_answer_{intent}")(snapshot, match)
+            if decision is not None:
+                return decision
+        return RouteDecision(route="rag")
+
+    def _answer_count_total(self, snapshot: EmployeeSnapshot, match) -> RouteDecision:
+        total = len(snapshot.df)
+        return RouteDecision(route="structured", intent="count_total",
+                             answer=f"There are {total} employees in total.")
+
+    def _answer_count_department(self, snapshot: EmployeeSnapshot, match) -> Optional[RouteDecision]:
+        resolved = self._resolve_department(snapshot, match.group("department"))
+        if resolved is None:
+            return None
+        department, rows = resolved
+        return RouteDecision(route="structured", intent="count_department",
+                             params={"department": department},
+                             answer=f"There are {len(rows)} employees in {department}.")
+
+    def _answer_list_department(self, snapshot: EmployeeSnapshot, match) -> Optional[RouteDecision]:
+        resolved = self._resolve_department(snapshot, match.group("department"))
+        if resolved is None:
+            return None
+        department, rows = resolved
+        records = _records(snapshot.df.iloc[rows])
+        lines = [f"- {_describe(r)}" for r in records[:MAX_LISTED]]
+        if len(records) > MAX_LISTED:
+            lines.append(f"...and {len(records) - MAX_LISTED} more")
+        answer = f"{len(records)} employees work in {department}:\n" + "\n".join(lines)
+        return RouteDecision(route="structured", intent="list_department",
+                             params={"department": department}, answer=answer, records=records)
+
+    def _answer_experience(self, snapshot: EmployeeSnapshot, match) -> Optional[RouteDecision]:
+        if "start_date" not in snapshot.df.columns:
+            return None
+        min_years = match.group("min") or match.group("low")
+        max_years = match.group("max") or match.group("high")
+        min_years = float(min_years) if min_years else None
+        max_years = float(max_years) if max_years else None
+        records = _records(snapshot.df[experience_mask(snapshot.df, min_years, max_years)])
+        lines = [f"- {_describe(r)}" for r in records[:MAX_LISTED]]
+        if len(records) > MAX_LISTED:
+            lines.append(f"...and {len(records) - MAX_LISTED} more")
+        if match.group("low"):
+            bounds = f"between {min_years:g} and {max_years:g} years"
+        elif min_years is not None:
+            bounds = f"{match.group('min_op')} {min_years:g} years"
+        else:
+            bounds = f"{match.group('max_op')} {max_years:g} years"
+        answer = f"{len(records)} employees have {bounds} of service:\n" + "\n".join(lines)
+        return RouteDecision(route="structured", intent="experience",
+                             params={"min_years": min_years, "max_years": max_years},
+                             answer=answer, records=records)
+
+    def _answer_who_is(self, snapshot: EmployeeSnapshot, match) -> Optional[RouteDecision]:
+        target = match.group("target").strip(" .")
+        records = self._match_title(snapshot, target)
+        intent = "who_is_title"
+        if not records:
+            records = self._match_name(snapshot, target)
+            intent = "who_is_name"
+        # Only answer when the match is unambiguous enough to list
+        if not records or len(records) > 3:
+            return None
+        answer = "\n".join(_describe(r) for r in records)
+        return RouteDecision(route="structured", intent=intent, params={"target": target},
+                             answer=answer, records=records)
@@ -1,25 +1,273 @@
 # src/ragagent/rag_chain.py
 
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import Ollama
-from langchain.chains import RetrievalQA
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.chains.combine_documents.stuff import StuffDocumentsChain
+from langchain_core.documents import Document
+from rag_backend.rag_agent.index_factory import apply_search_params
+from rag_backend.config import settings, get_faiss_index_path
+from rag_backend.metrics import stage
+from rag_backend.rag_agent.docstore import iter_indexed_documents, load_artifact, load_vectorstore
+from rag_backend.rag_agent.embed_store import load_manifest
+from rag_backend.rag_agent.hybrid_retriever import BM25_ARTIFACT, BM25Index, HybridRetriever
+from rag_backend.rag_agent.metadata_filters import build_metadata_index, filtered_search, metadata_index_for
+from rag_backend.rag_agent.query_filters import matches, normalize_filters
+from rag_backend.rag_agent.context_budget import BudgetedRetrievalQA, ContextBudget
+from rag_backend.rag_agent.dim_reduction import ProjectedEmbeddings, load_transform
+from rag_backend.rag_agent.embedding_pipeline import (
+    TimedEmbeddings, create_embeddings, embed_queries, embedding_model_name,
+)
+from rag_backend.rag_agent.ollama_models import build_llm
+
+def build_retriever(vectorstore):
+    """
+    Vector-only retriever, or (the default) BM25 + vector fused by reciprocal rank.
+    The BM25 and metadata indexes are loaded from the copies embed_store saves with the
+    docstore; indexes saved without them are scanned once, building both from the stored
+    documents so they always cover the same rows as the vectors.
+    """
+    if settings.rag_retriever.lower() != "hybrid":
+        if settings.rag_department_shards:
+            metadata_index_for(vectorstore)  # Build the shards now rather than on the first filtered query
+        return vectorstore.as_retriever(search_type=settings.rag_search_type,
+                                        search_kwargs={"k": settings.rag_k})
+    saved = load_artifact(vectorstore, BM25_ARTIFACT)
+    if saved is not None:
+        bm25 = BM25Index.loads(saved)
+        metadata_index_for(vectorstore)
+    else:
+        print("Index was saved without a BM25 index; reading every document to build it "
+              "(re-run embed_store to persist it)")
+        positions, ids, texts, metadatas = [], [], [], []
+        for position, doc_id, doc in iter_indexed_documents(vectorstore):
+            positions.append(position)
+            ids.append(doc_id)
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+        build_metadata_index(vectorstore, positions, metadatas)
+        bm25 = BM25Index(ids, texts)
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        bm25=bm25,
+        k=settings.rag_k,
+        fetch_k=max(settings.hybrid_fetch_k, settings.rag_k),
+        search_type=settings.rag_search_type,
+        vector_weight=settings.hybrid_vector_weight,
+        rrf_k=settings.hybrid_rrf_k,
+    )
 
 def build_rag_chain():
+    index_path = get_faiss_index_path()
+    indexed_with = load_manifest(Path(index_path)).get("embedding_model")
+    if indexed_with and indexed_with != embedding_model_name():
+        print(f"Warning: index was built with '{indexed_with}' but the configured embedding model is "
+              f"'{embedding_model_name()}'; rebuild the index with embed_store")
+
+    # Queries go through the same dimensionality reduction the index was built with
+    embeddings = create_embeddings()
+    transform = load_transform(index_path)
+    if transform is not None:
+        embeddings = ProjectedEmbeddings(embeddings, transform)
+    embeddings = TimedEmbeddings(embeddings)
+
     # Load vectorstore
-    vectorstore = FAISS.load_local("rag_backend/faiss_index", embeddings=OllamaEmbeddings(model="phi3"), allow_dangerous_deserialization=True)
+    # Vectors are memory-mapped and documents are read from SQLite only for search hits
+    vectorstore = load_vectorstore(index_path, embeddings=embeddings)
+    if transform is not None and transform.output_dim != vectorstore.index.d:
+        raise ValueError(f"Index has {vectorstore.index.d} dims but its transform outputs {transform.output_dim}")
+    apply_search_params(vectorstore.index)
 
     # Initialize retriever
-    retriever = vectorstore.as_retriever()
+    retriever = build_retriever(vectorstore)
 
-    # Local LLM (phi3 via Ollama)
-    llm = Ollama(model="phi3")
+    # Local LLM via Ollama
+    llm = build_llm()
+
+    # Retrieved records are trimmed to relevant fields and a token budget before prompting
+    budget = None
+    if settings.enable_context_compression:
+        budget = ContextBudget(settings.context_max_tokens, settings.context_core_fields)
 
     # Create RAG chain
-    rag_chain = RetrievalQA.from_chain_type(
+    rag_chain = BudgetedRetrievalQA.from_chain_type(
         llm=llm,
+        chain_type=settings.rag_chain_type,
         retriever=retriever,
-        return_source_documents=True
+        return_source_documents=True,
+        budget=budget,
+        max_answer_tokens=llm.num_predict,
     )
 
     return rag_chain
+
+def chain_config() -> dict:
+    """Effective model and retrieval settings the chain is built with (reported on /stats)"""
+    return {
+        "llm_model": settings.ollama_model,
+        "embedding_provider": settings.embedding_provider,
+        "embedding_model": embedding_model_name(),
+        "embedding_reduced_dim": settings.embedding_reduced_dim,
+        "embedding_reduction": settings.embedding_reduction if settings.embedding_reduced_dim else None,
+        "ollama_base_url": settings.ollama_base_url,
+        "ollama_options": {
+            "num_ctx": settings.ollama_num_ctx,
+            "num_predict": settings.ollama_num_predict,
+            "temperature": settings.ollama_temperature,
+            "keep_alive": settings.ollama_keep_alive,
+        },
+        "index_path": get_faiss_index_path(),
+        "faiss_index_type": settings.faiss_index_type,
+        "chain_type": settings.rag_chain_type,
+        "retriever": settings.rag_retriever,
+        "search_type": settings.rag_search_type,
+        "k": settings.rag_k,
+        "department_shards": settings.rag_department_shards,
+        "context_compression": settings.enable_context_compression,
+        "context_max_tokens": settings.context_max_tokens,
+    }
+
+def retrieve(rag_chain, query: str, filters: Optional[Dict[str, Any]] = None,
+             query_vector: Optional[List[float]] = None) -> List[Document]:
+    """
+    Documents the chain's retriever finds for ``query``, restricted to those matching
+    ``filters`` (department, title, location, start_year_min/max) when given. A
+    ``query_vector`` already computed for the query is searched instead of re-embedding it.
+    """
+    filters = normalize_filters(filters)
+    if filters is None and query_vector is None:
+        with stage("retrieval"):
+            return rag_chain.retriever.get_relevant_documents(query)
+    hits, _ = batch_retrieve(rag_chain, [query], [filters], None if query_vector is None else [query_vector])
+    return hits[0][:_top_k(rag_chain.retriever)]
+
+def answer_query(rag_chain, query: str, filters: Optional[Dict[str, Any]] = None,
+                 query_vector: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Full RAG answer for ``query`` in the shape of ``rag_chain.invoke``, retrieving only
+    filtered documents and reusing ``query_vector`` when given
+    """
+    if normalize_filters(filters) is None and query_vector is None:
+        return rag_chain.invoke({"query": query})
+    return answer_from_documents(rag_chain, query, retrieve(rag_chain, query, filters, query_vector))
+
+def stream_rag_answer(rag_chain, query: str, filters: Optional[Dict[str, Any]] = None, query_vector=None
+                      ) -> Tuple[List[Document], Iterator[str], Optional[Dict[str, Any]]]:
+    """
+    Retrieve context for a query and return it together with an iterator over
+    answer tokens streamed from the LLM as they are generated, and the context
+    compression report (None for chains without a budget).
+    Chains that are not 'stuff' chains cannot stream a single prompt, so the
+    full answer is produced up front and yielded as one chunk.
+    ``query_vector`` is an already computed embedding of ``query`` to retrieve with.
+    """
+    combine_chain = rag_chain.combine_documents_chain
+    if not isinstance(combine_chain, StuffDocumentsChain):
+        result = answer_query(rag_chain, query, filters, query_vector)
+        return result.get("source_documents", []), iter([result.get("result", "")]), result.get("context")
+
+    docs = retrieve(rag_chain, query, filters, query_vector)
+    with stage("context"):
+        report = None
+        if isinstance(rag_chain, BudgetedRetrievalQA):
+            docs, report = rag_chain.compress(docs, query)
+        inputs = combine_chain._get_inputs(docs, question=query)
+        prompt = combine_chain.llm_chain.prompt.format_prompt(**inputs).to_string()
+    return docs, combine_chain.llm_chain.llm.stream(prompt), report
+
+def batch_retrieve(rag_chain, queries: List[str], filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+                   vectors: Optional[List[List[float]]] = None) -> Tuple[List[List[Document]], np.ndarray]:
+    """
+    Retrieve documents for many queries at once: all queries are embedded together and
+    the vector side of the unfiltered queries runs as a single FAISS search over the whole
+    batch (MMR still needs one search per query). Queries with ``filters`` (one spec or
+    None per query) search only matching documents, by similarity. Hybrid retrievers then
+    fuse each row with its BM25 hits. ``vectors`` (one per query) skip the embedding step
+    when the caller already has them. Returns the per-query documents and the query embeddings.
+    """
+    with stage("retrieval"):
+        return _batch_retrieve(rag_chain, queries, filters, vectors)
+
+def _top_k(retriever) -> int:
+    return retriever.k if isinstance(retriever, HybridRetriever) else retriever.search_kwargs.get("k", settings.rag_k)
+
+def _mmr_kwargs(retriever, fetch: int) -> Dict[str, Any]:
+    """MMR settings matching what the retriever itself would search with"""
+    if isinstance(retriever, HybridRetriever):
+        return {"k": fetch, "fetch_k": fetch * 2}
+    search_kwargs = retriever.search_kwargs
+    return {"k": fetch, "fetch_k": search_kwargs.get("fetch_k", 20),
+            "lambda_mult": search_kwargs.get("lambda_mult", 0.5)}
+
+def _documents_at(vectorstore, positions) -> List[Document]:
+    docs = (vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(p)]) for p in positions if p != -1)
+    return [doc for doc in docs if isinstance(doc, Document)]
+
+def _batch_retrieve(rag_chain, queries: List[str], filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+                    vectors: Optional[List[List[float]]] = None) -> Tuple[List[List[Document]], np.ndarray]:
+    retriever = rag_chain.retriever
+    vectorstore = retriever.vectorstore
+    hybrid = isinstance(retriever, HybridRetriever)
+    fetch = retriever.fetch_k if hybrid else _top_k(retriever)
+    filters = [normalize_filters(f) for f in filters] if filters else [None] * len(queries)
+    if vectors is None:
+        vectors = embed_queries(vectorstore.embeddings, queries, settings.embedding_concurrency)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    metadata_index = metadata_index_for(vectorstore) if any(filters) else None
+    unfiltered = [i for i, spec in enumerate(filters) if spec is None]
+    hits: List[List[Document]] = [[] for _ in queries]
+
+    with stage("vector_search"):
+        if retriever.search_type == "mmr":
+            for i in unfiltered:
+                hits[i] = vectorstore.max_marginal_relevance_search_by_vector(
+                    vectors[i].tolist(), **_mmr_kwargs(retriever, fetch))
+        elif unfiltered:
+            search_vectors = vectors[unfiltered].copy()
+            if vectorstore._normalize_L2:
+                faiss.normalize_L2(search_vectors)
+            _, positions = vectorstore.index.search(search_vectors, fetch)
+            for i, row in zip(unfiltered, positions):
+                hits[i] = _documents_at(vectorstore, row)
+        for i, spec in enumerate(filters):
+            if spec is not None:
+                row = filtered_search(vectorstore, vectors[i], fetch, spec, metadata_index)[0]
+                hits[i] = _documents_at(vectorstore, row)
+
+    if hybrid:
+        fused = []
+        for query, docs, spec in zip(queries, hits, filters):
+            if spec is None:
+                fused.append(retriever.fuse(query, docs))
+            elif len(metadata_index) == len(retriever.bm25):
+                fused.append(retriever.fuse(query, docs, metadata_index.mask(spec)))
+            else:
+                # BM25 was built over different rows than the metadata; drop lexical hits outside the filter
+                fused.append([doc for doc in retriever.fuse(query, docs) if matches(doc.metadata, spec)])
+        hits = fused
+    return hits, vectors
+
+def answer_from_documents(rag_chain, query: str, docs: List[Document]) -> Dict[str, Any]:
+    """Generate an answer from already-retrieved documents, in the same shape as ``rag_chain.invoke``"""
+    if isinstance(rag_chain, BudgetedRetrievalQA):
+        return rag_chain.answer(query, docs)
+    with stage("generation"):
+        answer = rag_chain.combine_documents_chain.run(input_documents=docs, question=query)
+    return {"result": answer, "source_documents": docs}
+
+def warm_up(rag_chain, query: str) -> int:
+    """
+    Run ``query`` through retrieval and prompt construction and have the LLM generate a
+    single token, so the embedding model, FAISS/BM25 pages and the LLM's prompt path are
+    all hot before the first real question. Returns the number of documents retrieved.
+    """
+    docs = retrieve(rag_chain, query)
+    combine_chain = rag_chain.combine_documents_chain
+    if isinstance(combine_chain, StuffDocumentsChain):
+        with stage("generation"):
+            inputs = combine_chain._get_inputs(docs, question=query)
+            prompt = combine_chain.llm_chain.prompt.format_prompt(**inputs).to_string()
+            combine_chain.llm_chain.llm.invoke(prompt, num_predict=1)
+    return len(docs)
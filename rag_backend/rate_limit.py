@@ -0,0 +1,56 @@
+"""
+Per-client token-bucket rate limiting
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+
+class TokenBucketLimiter:
+    """
+    Each client gets a bucket of ``capacity`` tokens refilled at ``refill_rate`` tokens
+    per second; a request spends ``cost`` tokens or is refused. Buckets of the least
+    recently seen clients are dropped beyond ``max_clients`` (a dropped client simply
+    starts again with a full bucket).
+    """
+
+    def __init__(self, capacity: float, refill_rate: float, max_clients: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # client -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, client: str, cost: float = 1.0) -> float:
+        """Spend ``cost`` tokens for ``client``; returns 0 if allowed, else seconds until it would be"""
+        cost = min(cost, self.capacity)  # A batch larger than the bucket needs a full bucket
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (cost - tokens) / self.refill_rate if self.refill_rate > 0 else float("inf")
+                self.limited += 1
+            self._buckets[client] = [tokens, now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "clients": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "capacity": self.capacity,
+                "refill_per_second": self.refill_rate,
+            }
@@ -0,0 +1,65 @@
+"""
+Progress of the background initialization that runs after the API starts accepting connections
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+# Initialization steps in the order they are reported
+STARTUP_STEPS = ("query_router", "index", "models", "warmup")
+
+
+class StartupProgress:
+    """
+    Status of each initialization step (pending, running, done, failed or skipped) with
+    its duration and error. Steps may run concurrently on worker threads; readers get a
+    consistent snapshot.
+    """
+
+    def __init__(self, steps: Sequence[str] = STARTUP_STEPS):
+        self._steps: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "seconds": None, "error": None} for name in steps
+        }
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self.finished_at: Optional[float] = None  # Unix time initialization ended
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self._steps[name].update(fields)
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Mark ``name`` running for the duration of the block, then done or failed (re-raising)"""
+        start = time.perf_counter()
+        self._update(name, status="running")
+        try:
+            yield
+        except Exception as e:
+            self._update(name, status="failed", seconds=round(time.perf_counter() - start, 3),
+                         error=str(e) or type(e).__name__)
+            raise
+        self._update(name, status="done", seconds=round(time.perf_counter() - start, 3))
+
+    def skip(self, name: str, reason: str):
+        self._update(name, status="skipped", error=reason)
+
+    def finish(self):
+        self._elapsed = time.perf_counter() - self._started
+        self.finished_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+        return {
+            "finished": self.finished,
+            "elapsed_seconds": round(self._elapsed if self._elapsed is not None
+                                     else time.perf_counter() - self._started, 3),
+            "steps": steps,
+        }
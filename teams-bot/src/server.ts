@@ -43,9 +43,15 @@ async function onTurn(context: TurnContext) {
         
         try {
             // Call your Python backend
+            // Identify the Teams user so rate limits and fair scheduling apply per person;
+            // the backend only honours the id from trusted callers (host or shared secret)
+            const headers: Record<string, string> = { 'X-Client-Id': context.activity.from?.id ?? 'teams' };
+            if (process.env.RAG_CLIENT_SECRET) {
+                headers['X-Client-Secret'] = process.env.RAG_CLIENT_SECRET;
+            }
             const response = await axios.post<PythonResponse>('http://localhost:8000/query', {
                 message: userMessage
-            });
+            }, { headers });
             
             const botResponse = response.data.response;
             await context.sendActivity(botResponse);
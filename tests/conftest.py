@@ -0,0 +1,10 @@
+"""
+Shared test fixtures
+"""
+import pytest
+from rag_backend.config import settings
+
+@pytest.fixture(autouse=True)
+def isolated_snapshot_dir(tmp_path, monkeypatch):
+    """Keep workbook snapshots written during tests out of the source tree"""
+    monkeypatch.setattr(settings, "data_snapshot_dir", str(tmp_path / "data_cache"))
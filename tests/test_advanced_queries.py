@@ -12,4 +12,65 @@ class TestAdvancedQueries:
             engine = EmployeeQueryEngine(get_excel_path())
             assert engine is not None
         except Exception as e:
-            pytest.skip(f"EmployeeQueryEngine test skipped: {e}") 
\ No newline at end of file
+            pytest.skip(f"EmployeeQueryEngine test skipped: {e}") 
+
+    def test_indexed_search(self, tmp_path):
+        import pandas as pd
+        from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({
+            "Name": ["Ada Lovelace", "Grace Hopper", "Ada Yonath", None],
+            "Title": ["CTO", "Engineer", "Chemist", "Engineer"],
+            "Department": ["Engineering", "Engineering", "Research", "Ops"],
+            "Email": ["Ada@corp.com", "grace@corp.com", "yonath@corp.com", None],
+        }).to_excel(path, index=False)
+        engine = EmployeeQueryEngine(str(path))
+
+        assert [r["name"] for r in engine.search_by_name("ada")] == ["Ada Lovelace", "Ada Yonath"]
+        assert [r["name"] for r in engine.search_by_name("love")] == ["Ada Lovelace"]
+        assert engine.search_by_name("a.a") == []
+        assert len(engine.search_by_department("engineer")) == 2
+        assert len(engine.search_by_role("engineer")) == 2
+        assert list(engine.search_ids("department", "research")) == [2]
+        assert engine.get_employee_by_email("ADA@corp.com ")["name"] == "Ada Lovelace"
+        assert engine.get_employee_by_email("nobody@corp.com") is None
+        assert list(engine.indexes["title"].exact("ENGINEER")) == [1, 3]
+        assert engine.acronyms["department"]["e"] == ["engineering"]
+
+    def test_seniority_is_precomputed_and_memoized(self, tmp_path):
+        import pandas as pd
+        from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+
+        path = tmp_path / "employees.xlsx"
+        today = pd.Timestamp.now().normalize()
+        pd.DataFrame({
+            "Name": ["Ada", "Grace", "Alan"],
+            "Title": ["CTO", "Engineer", "Analyst"],
+            "Department": ["Engineering", "Engineering", "Finance"],
+            "Start Date": [today - pd.DateOffset(years=10), today - pd.DateOffset(years=2), None],
+        }).to_excel(path, index=False)
+        engine = EmployeeQueryEngine(str(path))
+
+        assert list(engine.df["seniority_level"].astype(str)) == ["Senior (7+ years)", "Junior (1-3 years)", "nan"]
+        overview = engine.get_company_overview()
+        assert engine.get_company_overview() is overview
+        assert overview["seniority_breakdown"][("name", "count")]["Senior (7+ years)"] == 1
+        assert [r["name"] for r in engine.search_by_experience(min_years=5)] == ["Ada"]
+
+    def test_reload_publishes_a_complete_snapshot(self, tmp_path):
+        import pandas as pd
+        from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({"Name": ["Ada", "Grace"], "Email": ["ada@corp.com", "grace@corp.com"]}).to_excel(path, index=False)
+        engine = EmployeeQueryEngine(str(path))
+        before = engine.current()
+
+        pd.DataFrame({"Name": ["Alan"], "Email": ["alan@corp.com"]}).to_excel(path, index=False)
+        engine.load_data()
+        # Readers holding the old snapshot keep a frame that matches its indexes
+        assert before.email_index == {"ada@corp.com": 0, "grace@corp.com": 1} and len(before.df) == 2
+        assert engine.snapshot is not before
+        assert engine.get_employee_by_email("alan@corp.com")["name"] == "Alan"
+        assert engine.search_by_name("ada") == []
@@ -55,4 +55,117 @@ class TestRAGBackend:
         if response.status_code == 200:
             data = response.json()
             assert "response" in data
-            assert "sources" in data 
\ No newline at end of file
+            assert "sources" in data 
+
+    def test_query_stream_empty_message(self):
+        response = client.post("/query/stream", json={"message": ""})
+        assert response.status_code in [400, 503]
+
+    def test_query_stream_events(self, monkeypatch):
+        from langchain_core.documents import Document
+        import rag_backend.main as main
+
+        def fake_stream(chain, query, filters=None, query_vector=None):
+            docs = [Document(page_content="Name: Ada", metadata={"row_index": 0})]
+            return docs, iter(["Ada ", "is CTO"]), {"prompt_tokens": 42, "truncated": False}
+
+        monkeypatch.setattr(main, "rag_chain", object())
+        monkeypatch.setattr(main, "stream_rag_answer", fake_stream)
+        response = client.post("/query/stream", json={"message": "Who is the CTO?", "include_sources": True})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.text
+        assert body.index("event: token") < body.index("event: sources") < body.index("event: done")
+        assert '"Ada "' in body and "Name: Ada" in body
+        assert '"prompt_tokens": 42' in body
+
+    def test_query_stream_uses_semantic_cache(self, monkeypatch):
+        import numpy as np
+        import rag_backend.main as main
+        from rag_backend.rag_agent.query_cache import QueryCache
+
+        vectors = {"Who is the CTO?": [1.0, 0.0], "Who's the CTO?": [0.99, 0.01], "Who is the CFO?": [0.0, 1.0]}
+        streamed = []
+
+        def fake_stream(chain, query, filters=None, query_vector=None):
+            streamed.append((query, query_vector))
+            return [], iter(["Ada"]), {}
+
+        cache = QueryCache(similarity_threshold=0.95, embed_fn=lambda q: np.array(vectors[q]))
+        monkeypatch.setattr(main, "rag_chain", object())
+        monkeypatch.setattr(main, "answer_cache", cache)
+        monkeypatch.setattr(main.settings, "enable_query_cache", True)
+        monkeypatch.setattr(main, "stream_rag_answer", fake_stream)
+        for message in ["Who is the CTO?", "Who's the CTO?", "Who is the CFO?"]:
+            assert '"Ada"' in client.post("/query/stream", json={"message": message}).text
+        # The paraphrase is served from the cache; misses retrieve with the lookup's vector
+        assert [query for query, _ in streamed] == ["Who is the CTO?", "Who is the CFO?"]
+        assert list(streamed[0][1]) == [1.0, 0.0]
+        assert cache.stats()["misses"] == 2 and cache.semantic_hits == 1
+
+    def test_query_stream_outlives_request_timeout(self, monkeypatch):
+        import time
+        import rag_backend.main as main
+        from rag_backend.query_pool import QueryPool
+
+        def slow_tokens():
+            for token in ["one ", "two ", "three"]:
+                time.sleep(0.2)
+                yield token
+
+        monkeypatch.setattr(main, "rag_chain", object())
+        monkeypatch.setattr(main, "query_pool", QueryPool(max_workers=1, max_in_flight=1, timeout=0.3))
+        monkeypatch.setattr(main, "stream_rag_answer", lambda chain, query, filters=None, query_vector=None: ([], slow_tokens(), {}))
+        monkeypatch.setattr(main.settings, "enable_query_cache", False)
+        response = client.post("/query/stream", json={"message": "Count slowly"})
+        assert response.status_code == 200
+        assert '"three"' in response.text and "event: error" not in response.text
+
+    def test_query_stream_rejections_are_http_errors(self, monkeypatch):
+        import threading
+        import time
+        import rag_backend.main as main
+        from rag_backend.query_pool import QueryPool
+
+        release = threading.Event()
+        pool = QueryPool(max_workers=1, max_in_flight=1, timeout=0.1)
+        monkeypatch.setattr(main, "rag_chain", object())
+        monkeypatch.setattr(main, "query_pool", pool)
+        monkeypatch.setattr(main.settings, "enable_query_cache", False)
+        monkeypatch.setattr(main, "stream_rag_answer",
+                            lambda chain, query, filters=None, query_vector=None: (release.wait(), ([], iter(["late"]), {}))[1])
+        # No token before the timeout: 503 instead of a 200 carrying an error event
+        assert client.post("/query/stream", json={"message": "Slow start"}).status_code == 503
+        # The timed-out job still holds the only slot: rejected before any response starts
+        response = client.post("/query/stream", json={"message": "Busy"})
+        assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+        release.set()
+        time.sleep(0.05)
+
+    def test_reload_index_swaps_chain(self, monkeypatch):
+        from types import SimpleNamespace
+        import rag_backend.main as main
+
+        vectorstore = SimpleNamespace(
+            index_to_docstore_id={0: "a", 1: "b"},
+            embeddings=SimpleNamespace(embed_query=lambda q: [1.0]),
+        )
+        new_chain = SimpleNamespace(
+            retriever=SimpleNamespace(vectorstore=vectorstore, get_relevant_documents=lambda q: []),
+        )
+        monkeypatch.setattr(main, "rag_chain", None)
+        monkeypatch.setattr(main, "loaded_index_version", None)
+        monkeypatch.setattr(main.answer_cache, "embed_fn", None)
+        monkeypatch.setattr(main, "build_rag_chain", lambda: new_chain)
+        main.answer_cache.put("Who is the CTO?", {"result": "stale"})
+
+        # Disabled until ADMIN_TOKEN is set, then the token is required
+        monkeypatch.setattr(main.settings, "admin_token", None)
+        assert client.post("/admin/reload-index").status_code == 404
+        monkeypatch.setattr(main.settings, "admin_token", "t0ken")
+        assert client.post("/admin/reload-index").status_code == 403
+        response = client.post("/admin/reload-index", headers={"X-Admin-Token": "t0ken"})
+        assert response.status_code == 200
+        assert response.json()["total_documents"] == 2
+        assert main.rag_chain is new_chain
+        assert main.answer_cache.get("Who is the CTO?") is None
@@ -0,0 +1,129 @@
+"""
+Test batched retrieval and the /query/batch endpoint
+"""
+from langchain_community.llms.fake import FakeListLLM
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from fastapi.testclient import TestClient
+import rag_backend.main as main
+from rag_backend.rag_agent.context_budget import BudgetedRetrievalQA, ContextBudget
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+from rag_backend.rag_agent.hybrid_retriever import BM25Index, HybridRetriever
+from rag_backend.rag_agent.rag_chain import batch_retrieve
+
+client = TestClient(main.app)
+
+def _vectorstore(embeddings=None):
+    docs = [
+        Document(page_content=f"Name: Person {i} | Email: person{i}@company.com | Department: {dept}",
+                 metadata={"row_index": i, "employee_key": f"person{i}@company.com"})
+        for i, dept in enumerate(["Engineering", "Sales", "Finance", "Marketing"] * 3)
+    ]
+    return FAISS.from_documents(docs, embeddings or HashingEmbeddings(dim=64), ids=[d.metadata["employee_key"] for d in docs])
+
+def _chain(retriever, responses):
+    return BudgetedRetrievalQA.from_chain_type(
+        llm=FakeListLLM(responses=responses), retriever=retriever,
+        return_source_documents=True, budget=ContextBudget(),
+    )
+
+def _keys(docs):
+    return [d.metadata["employee_key"] for d in docs]
+
+class TestBatchRetrieve:
+    def test_matches_single_query_retrieval(self):
+        store = _vectorstore()
+        chain = _chain(store.as_retriever(search_kwargs={"k": 3}), ["x"])
+        queries = ["person3@company.com", "Who is in Finance?"]
+        hits, vectors = batch_retrieve(chain, queries)
+        assert vectors.shape == (2, 64)
+        for query, docs in zip(queries, hits):
+            assert _keys(docs) == _keys(chain.retriever.get_relevant_documents(query))
+
+    def test_mmr_uses_retriever_settings(self):
+        store = _vectorstore()
+        retriever = store.as_retriever(search_type="mmr", search_kwargs={"k": 3, "fetch_k": 5, "lambda_mult": 0.2})
+        chain = _chain(retriever, ["x"])
+        queries = ["Who is in Sales?", "Person 4"]
+        hits, _ = batch_retrieve(chain, queries)
+        for query, docs in zip(queries, hits):
+            assert _keys(docs) == _keys(retriever.get_relevant_documents(query))
+
+    def test_hybrid_fusion(self):
+        store = _vectorstore()
+        ids, texts = zip(*[(k, store.docstore.search(k).page_content) for k in store.index_to_docstore_id.values()])
+        retriever = HybridRetriever(vectorstore=store, bm25=BM25Index(ids, texts), k=2, fetch_k=6)
+        hits, _ = batch_retrieve(_chain(retriever, ["x"]), ["person5@company.com", "Person 7"])
+        assert hits[0][0].metadata["employee_key"] == "person5@company.com"
+        assert all(len(docs) == 2 for docs in hits)
+        assert _keys(hits[1]) == _keys(retriever.get_relevant_documents("Person 7"))
+
+class TestBatchEndpoint:
+    def test_per_item_results_and_errors(self, monkeypatch):
+        chain = _chain(_vectorstore().as_retriever(search_kwargs={"k": 2}), ["Answer"] * 10)
+        monkeypatch.setattr(main, "rag_chain", chain)
+        monkeypatch.setattr(main, "query_router", None)
+        main.answer_cache.invalidate()
+        response = client.post("/query/batch", json={"queries": [
+            {"message": "Who is person1@company.com?", "include_sources": True},
+            {"message": "  "},
+            {"message": "Who is in Sales?", "include_timings": True},
+        ]})
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["succeeded"], data["failed"]) == (2, 1)
+        first, empty, third = data["results"]
+        assert first["ok"] and first["result"]["response"] == "Answer"
+        assert len(first["result"]["sources"]) == 2
+        assert first["result"]["context"]["documents_used"] == 2
+        assert empty["error"]["status"] == 400
+        assert third["ok"] and third["result"]["sources"] is None
+        assert {"retrieval", "vector_search", "generation", "total"} <= set(third["result"]["timings"])
+        assert first["result"]["timings"] is None
+
+        # Repeating a question in a later batch is answered from the cache
+        again = client.post("/query/batch", json={"queries": [{"message": "Who is in Sales?"}]}).json()
+        assert again["results"][0]["result"]["cached"] is True
+
+    def test_without_chain(self, monkeypatch):
+        monkeypatch.setattr(main, "rag_chain", None)
+        monkeypatch.setattr(main, "query_router", None)
+        main.answer_cache.invalidate()
+        data = client.post("/query/batch", json={"queries": [{"message": "Who is the CTO?"}]}).json()
+        assert data["results"][0]["error"]["status"] == 503
+
+    def test_batch_limits(self, monkeypatch):
+        assert client.post("/query/batch", json={"queries": []}).status_code == 400
+        monkeypatch.setattr(main.settings, "batch_max_queries", 1)
+        too_many = {"queries": [{"message": "a"}, {"message": "b"}]}
+        assert client.post("/query/batch", json=too_many).status_code == 400
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.embedded = 0
+
+    def embed_query(self, text):
+        self.embedded += 1
+        return super().embed_query(text)
+
+    def embed_queries(self, texts):
+        self.embedded += len(texts)
+        return super().embed_queries(texts)
+
+class TestSingleQueryEmbedding:
+    def test_cache_miss_embeds_once(self, monkeypatch):
+        embeddings = CountingEmbeddings(dim=64)
+        store = _vectorstore(embeddings)
+        embeddings.embedded = 0
+        chain = _chain(store.as_retriever(search_kwargs={"k": 2}), ["Answer"] * 2)
+        monkeypatch.setattr(main, "rag_chain", chain)
+        monkeypatch.setattr(main, "query_router", None)
+        monkeypatch.setattr(main.settings, "enable_query_cache", True)
+        monkeypatch.setattr(main.answer_cache, "embed_fn", embeddings.embed_query)
+        main.answer_cache.invalidate()
+        data = client.post("/query", json={"message": "Who is person2@company.com?", "include_sources": True}).json()
+        assert data["cached"] is False and embeddings.embedded == 1
+        # Retrieval from the reused vector matches the retriever's own search
+        expected = chain.retriever.get_relevant_documents("Who is person2@company.com?")
+        assert [s["metadata"]["employee_key"] for s in data["sources"]] == _keys(expected)
@@ -11,4 +11,23 @@ class TestConfiguration:
     def test_settings_loaded(self):
         assert settings.api_title == "Employee Teams RAG API"
         assert settings.api_version == "1.0.0"
-        assert settings.ollama_model == "phi3" 
\ No newline at end of file
+        assert settings.ollama_model == "phi3" 
+
+    def test_ollama_clients_follow_settings(self, monkeypatch):
+        from rag_backend.rag_agent.ollama_models import build_embeddings, build_llm
+        monkeypatch.setattr(settings, "ollama_model", "llama3.2:1b")
+        monkeypatch.setattr(settings, "ollama_embedding_model", "nomic-embed-text")
+        monkeypatch.setattr(settings, "ollama_num_predict", 256)
+        monkeypatch.setattr(settings, "ollama_keep_alive", "30m")
+        params = build_llm()._default_params
+        assert params["model"] == "llama3.2:1b"
+        assert params["options"]["num_predict"] == 256
+        assert params["keep_alive"] == "30m"
+        assert build_embeddings().model == "nomic-embed-text"
+
+    def test_unset_options_are_not_sent(self, monkeypatch):
+        from rag_backend.rag_agent.ollama_models import build_llm
+        monkeypatch.setattr(settings, "context_max_answer_tokens", None)
+        params = build_llm()._default_params
+        assert "num_predict" not in params["options"]
+        assert "keep_alive" not in params
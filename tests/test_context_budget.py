@@ -0,0 +1,85 @@
+"""
+Test context compression of retrieved records before prompting
+"""
+from typing import List
+
+from langchain_community.llms.fake import FakeListLLM
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from rag_backend.rag_agent.context_budget import (
+    BudgetedRetrievalQA, ContextBudget, approx_tokens, parse_record,
+)
+from rag_backend.rag_agent.rag_chain import stream_rag_answer
+
+def _record(i, dept="Engineering"):
+    return Document(
+        page_content=(f"Name: Person {i} | Title: Engineer | Department: {dept} | Email: p{i}@company.com"
+                      f" | Location: Austin | Start Date: 2020-01-0{i % 9 + 1} | Phone: 555-010{i}"),
+        metadata={"row_index": i, "employee_key": f"p{i}@company.com"},
+    )
+
+class FixedRetriever(BaseRetriever):
+    docs: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.docs
+
+class TestContextBudget:
+    def test_parse_record(self):
+        assert parse_record("Name: Ada | Note: a: b") == [("Name", "Ada"), ("Note", "a: b")]
+
+    def test_keeps_core_and_relevant_fields(self):
+        docs, report = ContextBudget().apply([_record(1)], "Where is Person 1 based?")
+        text = docs[0].page_content
+        assert "Name: Person 1" in text and "Department: Engineering" in text
+        assert "Location: Austin" in text
+        assert "Phone" not in text and "Email" not in text
+        assert report["fields_removed"] == 3
+
+    def test_value_match_keeps_field(self):
+        docs, _ = ContextBudget().apply([_record(2)], "Who sits in Austin?")
+        assert "Location: Austin" in docs[0].page_content
+
+    def test_duplicates_removed(self):
+        docs, report = ContextBudget().apply([_record(1), _record(1), _record(2)], "Who is Person 1?")
+        assert len(docs) == 2
+        assert report["duplicates_removed"] == 1
+
+    def test_token_budget(self):
+        budget = ContextBudget(max_tokens=30, trim_fields=False)
+        docs, report = budget.apply([_record(i) for i in range(5)], "engineers")
+        assert len(docs) == 1
+        assert report["context_tokens"] <= 30
+        assert report["truncated"] is True
+        assert report["documents_retrieved"] == 5
+
+    def test_approx_tokens(self):
+        assert approx_tokens("abcdefgh") == 2
+
+class TestBudgetedChain:
+    def test_invoke_reports_context(self):
+        chain = BudgetedRetrievalQA.from_chain_type(
+            llm=FakeListLLM(responses=["Person 1 is in Austin"]),
+            retriever=FixedRetriever(docs=[_record(1), _record(1)]),
+            return_source_documents=True,
+            budget=ContextBudget(),
+            max_answer_tokens=128,
+        )
+        result = chain.invoke({"query": "Where is Person 1?"})
+        assert result["result"] == "Person 1 is in Austin"
+        assert len(result["source_documents"]) == 1
+        assert "Phone" not in result["source_documents"][0].page_content
+        assert result["context"]["prompt_tokens"] > result["context"]["context_tokens"] > 0
+        assert result["context"]["max_answer_tokens"] == 128
+
+    def test_stream_uses_compressed_context(self):
+        chain = BudgetedRetrievalQA.from_chain_type(
+            llm=FakeListLLM(responses=["Austin"]),
+            retriever=FixedRetriever(docs=[_record(3)]),
+            return_source_documents=True,
+            budget=ContextBudget(),
+        )
+        docs, tokens, report = stream_rag_answer(chain, "Where is Person 3?")
+        assert "".join(tokens) == "Austin"
+        assert "Phone" not in docs[0].page_content
+        assert report["documents_used"] == 1
@@ -0,0 +1,90 @@
+"""
+Test the hashing embedder and dimensionality reduction stored with the index
+"""
+import numpy as np
+import pandas as pd
+from rag_backend.config import settings
+from rag_backend.rag_agent import embed_store
+from rag_backend.rag_agent.dim_reduction import ProjectedEmbeddings, VectorTransform, load_transform
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+from rag_backend.rag_agent.rag_chain import build_rag_chain
+
+class TestHashingEmbeddings:
+    def test_deterministic_and_normalized(self):
+        embeddings = HashingEmbeddings(dim=64)
+        a = np.array(embeddings.embed_query("Name: Alice Nguyen | Title: Engineer"))
+        assert a.shape == (64,)
+        assert np.isclose(np.linalg.norm(a), 1.0)
+        assert np.allclose(a, HashingEmbeddings(dim=64).embed_query("Name: Alice Nguyen | Title: Engineer"))
+
+    def test_overlapping_text_is_closer(self):
+        embeddings = HashingEmbeddings(dim=256)
+        query, near, far = (np.array(v) for v in embeddings.embed_documents(
+            ["Alice Nguyen", "Name: Alice Nguyen | Title: Engineer", "Name: Bob Okafor | Title: Controller"]))
+        assert query @ near > query @ far
+
+class TestVectorTransform:
+    def test_pca_round_trip(self, tmp_path):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(50, 32)).astype(np.float32)
+        transform = VectorTransform.fit(vectors, 8)
+        assert transform.apply(vectors).shape == (50, 8)
+        transform.save(tmp_path)
+        loaded = load_transform(tmp_path)
+        assert loaded.method == "pca"
+        assert np.allclose(loaded.apply(vectors), transform.apply(vectors))
+
+    def test_pca_dim_is_capped_by_corpus_size(self):
+        transform = VectorTransform.fit(np.eye(5, 32, dtype=np.float32), 16)
+        assert transform.output_dim == 5
+
+    def test_truncate_keeps_leading_dims_normalized(self):
+        transform = VectorTransform.fit(np.ones((3, 10), dtype=np.float32), 4, method="truncate")
+        out = transform.apply(np.arange(10, dtype=np.float32))
+        assert np.allclose(out, np.array([0, 1, 2, 3]) / np.linalg.norm([0, 1, 2, 3]))
+
+    def test_missing_transform(self, tmp_path):
+        assert load_transform(tmp_path) is None
+
+    def test_projected_embeddings(self):
+        base = HashingEmbeddings(dim=32)
+        transform = VectorTransform.fit(np.array(base.embed_documents([f"person {i}" for i in range(20)])), 6)
+        assert len(ProjectedEmbeddings(base, transform).embed_query("person 3")) == 6
+
+class TestReducedIndex:
+    def test_index_and_queries_share_the_transform(self, tmp_path, monkeypatch):
+        workbook = tmp_path / "employees.xlsx"
+        pd.DataFrame({
+            "Name": [f"Person {i}" for i in range(30)],
+            "Email": [f"person{i}@company.com" for i in range(30)],
+            "Department": ["Engineering", "Sales", "Finance"] * 10,
+        }).to_excel(workbook, index=False)
+        index_path = tmp_path / "faiss_index"
+        monkeypatch.setattr(embed_store, "EXCEL_PATH", workbook)
+        monkeypatch.setattr(embed_store, "INDEX_PATH", index_path)
+        monkeypatch.setattr(settings, "faiss_index_path", str(index_path))
+        monkeypatch.setattr(settings, "embedding_cache_path", str(tmp_path / "cache.sqlite"))
+        monkeypatch.setattr(settings, "embedding_provider", "hashing")
+        monkeypatch.setattr(settings, "hashing_embedding_dim", 128)
+        monkeypatch.setattr(settings, "embedding_reduced_dim", 16)
+
+        embed_store.embed_and_store()
+        assert load_transform(index_path).output_dim == 16
+        assert np.load(index_path / "vectors.npy").shape == (30, 128)
+
+        chain = build_rag_chain()
+        assert chain.retriever.vectorstore.index.d == 16
+        docs = chain.retriever.get_relevant_documents("person7@company.com")
+        assert docs[0].metadata["employee_key"] == "person7@company.com"
+
+        # Turning reduction off rebuilds the index from the raw vectors without re-embedding
+        monkeypatch.setattr(settings, "embedding_reduced_dim", None)
+        embed_store.embed_and_store()
+        assert load_transform(index_path) is None
+        assert build_rag_chain().retriever.vectorstore.index.d == 128
+
+        # So does changing the index type with no rows changed
+        monkeypatch.setattr(settings, "faiss_index_type", "hnsw")
+        embed_store.embed_and_store()
+        assert type(build_rag_chain().retriever.vectorstore.index).__name__ == "IndexHNSWFlat"
+        assert embed_store.load_manifest(index_path)["index_params"]["index_type"] == "hnsw"
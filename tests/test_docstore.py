@@ -0,0 +1,52 @@
+"""
+Test the SQLite-backed, lazily loaded docstore
+"""
+import faiss
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from rag_backend.rag_agent.docstore import SQLiteDocstore, load_vectorstore, save_vectorstore
+from rag_backend.rag_agent.index_factory import apply_search_params
+
+def _documents():
+    return [Document(page_content=f"Name: Person {i}", metadata={"row_index": i, "employee_key": f"p{i}"})
+            for i in range(5)]
+
+class TestDocstore:
+    def test_round_trip_without_pickle(self, tmp_path):
+        embeddings = DeterministicFakeEmbedding(size=16)
+        docs = _documents()
+        store = FAISS.from_documents(docs, embeddings, ids=[d.metadata["employee_key"] for d in docs])
+        save_vectorstore(store, tmp_path)
+        assert not (tmp_path / "index.pkl").exists()
+
+        served = load_vectorstore(tmp_path, embeddings)
+        assert isinstance(served.docstore, SQLiteDocstore)
+        assert len(served.index_to_docstore_id) == 5
+        hit = served.similarity_search("Name: Person 3", k=1)[0]
+        assert hit.page_content == "Name: Person 3"
+        assert hit.metadata == {"row_index": 3, "employee_key": "p3"}
+
+    def test_writable_load_supports_updates(self, tmp_path):
+        embeddings = DeterministicFakeEmbedding(size=16)
+        docs = _documents()
+        store = FAISS.from_documents(docs, embeddings, ids=[d.metadata["employee_key"] for d in docs])
+        save_vectorstore(store, tmp_path)
+
+        editable = load_vectorstore(tmp_path, embeddings, writable=True)
+        editable.delete(["p1"])
+        save_vectorstore(editable, tmp_path)
+        assert len(load_vectorstore(tmp_path, embeddings).index_to_docstore_id) == 4
+
+    def test_flat_index_is_served_memory_mapped(self, tmp_path):
+        embeddings = DeterministicFakeEmbedding(size=16)
+        docs = _documents()
+        store = FAISS.from_documents(docs, embeddings, ids=[d.metadata["employee_key"] for d in docs])
+        save_vectorstore(store, tmp_path)
+
+        served = load_vectorstore(tmp_path, embeddings)
+        apply_search_params(served.index)
+        assert isinstance(served.index, faiss.IndexIVFFlat) and served.index.nlist == 1
+        query = embeddings.embed_query("Name: Person 2")
+        assert ([d.page_content for d, _ in served.similarity_search_with_score_by_vector(query, k=5)]
+                == [d.page_content for d, _ in store.similarity_search_with_score_by_vector(query, k=5)])
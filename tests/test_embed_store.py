@@ -0,0 +1,33 @@
+"""
+Test incremental index maintenance
+"""
+import pandas as pd
+from langchain_core.documents import Document
+from rag_backend.rag_agent.embed_store import content_hash, diff_documents
+from rag_backend.rag_agent.load_excel import load_excel_data
+
+class TestIncrementalIndexing:
+    def test_employee_key_from_email(self, tmp_path):
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({
+            "Name": ["Ada", "Bob", None],
+            "Email": ["Ada@corp.com", None, None],
+        }).to_excel(path, index=False)
+        docs = load_excel_data(str(path))
+        assert [d.metadata["employee_key"] for d in docs] == ["ada@corp.com", "row-1"]
+
+    def test_diff_documents(self):
+        entries = {
+            "a": content_hash("Name: Ada"),
+            "b": content_hash("Name: Bob"),
+            "c": content_hash("Name: Cy"),
+        }
+        docs = [
+            Document(page_content="Name: Ada", metadata={"employee_key": "a"}),
+            Document(page_content="Name: Bobby", metadata={"employee_key": "b"}),
+            Document(page_content="Name: Di", metadata={"employee_key": "d"}),
+        ]
+        to_embed, to_delete, unchanged = diff_documents(docs, entries)
+        assert [d.metadata["employee_key"] for d in to_embed] == ["b", "d"]
+        assert sorted(to_delete) == ["b", "c"]
+        assert unchanged == ["a"]
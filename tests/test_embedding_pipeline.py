@@ -0,0 +1,40 @@
+"""
+Test the batched embedding pipeline and its on-disk cache
+"""
+from langchain_core.embeddings import Embeddings
+from rag_backend.rag_agent.embedding_pipeline import BatchedEmbeddings, EmbeddingCache
+
+class FlakyEmbeddings(Embeddings):
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("ollama hiccup")
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+class TestEmbeddingPipeline:
+    def test_batches_and_caches(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+        base = FlakyEmbeddings()
+        embedder = BatchedEmbeddings(base, "test", cache=cache, batch_size=2, concurrency=2, verbose=False)
+        texts = ["a", "bb", "ccc", "bb", "dddd"]
+        assert embedder.embed_documents(texts) == [[float(len(t)), 1.0] for t in texts]
+        assert sorted(base.embedded) == ["a", "bb", "ccc", "dddd"]
+
+        rerun = FlakyEmbeddings()
+        embedder = BatchedEmbeddings(rerun, "test", cache=cache, verbose=False)
+        embedder.embed_documents(texts + ["eeeee"])
+        assert rerun.embedded == ["eeeee"]
+        assert embedder.last_report["cached"] == 5
+
+    def test_retries_transient_failures(self):
+        base = FlakyEmbeddings(failures=2)
+        embedder = BatchedEmbeddings(base, "test", max_retries=2, retry_backoff=0, verbose=False)
+        assert embedder.embed_documents(["x"]) == [[1.0, 1.0]]
@@ -0,0 +1,35 @@
+"""
+Test columnar workbook snapshots
+"""
+import os
+import pandas as pd
+from rag_backend.rag_agent import excel_snapshot
+from rag_backend.rag_agent.excel_snapshot import read_excel_cached
+
+class TestExcelSnapshot:
+    def test_snapshot_reused_until_workbook_changes(self, tmp_path, monkeypatch):
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({"Name": ["Ada", "Grace"], "Start Date": pd.to_datetime(["2010-01-01", "2020-05-01"])}).to_excel(path, index=False)
+        first = read_excel_cached(str(path))
+
+        def fail(*args, **kwargs):
+            raise AssertionError("workbook should not be re-parsed")
+
+        with monkeypatch.context() as m:
+            m.setattr(excel_snapshot.pd, "read_excel", fail)
+            pd.testing.assert_frame_equal(read_excel_cached(str(path)), first)
+            # Touching the file without changing its bytes keeps the snapshot
+            os.utime(path, ns=(0, 0))
+            pd.testing.assert_frame_equal(read_excel_cached(str(path)), first)
+
+        pd.DataFrame({"Name": ["Ada"], "Start Date": pd.to_datetime(["2010-01-01"])}).to_excel(path, index=False)
+        assert read_excel_cached(str(path)).shape[0] == 1
+
+    def test_use_snapshot_overrides_settings(self, tmp_path, monkeypatch):
+        from rag_backend.config import settings
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({"Name": ["Ada"]}).to_excel(path, index=False)
+        monkeypatch.setattr(settings, "enable_data_snapshot", True)
+        read_excel_cached(str(path), cache_dir=str(tmp_path / "snapshots"), use_snapshot=False)
+        assert not (tmp_path / "snapshots").exists()
+        assert settings.enable_data_snapshot
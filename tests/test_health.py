@@ -0,0 +1,78 @@
+"""
+Test the shared Ollama client and the background health prober
+"""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+import rag_backend.main as main
+from rag_backend.benchmark import StubOllamaServer
+from rag_backend.config import settings
+from rag_backend.health import HealthProber
+from rag_backend.rag_agent.ollama_client import OllamaClient, get_ollama_client
+from rag_backend.rag_agent.ollama_models import build_embeddings, build_llm
+
+client = TestClient(main.app)
+
+class TestOllamaClient:
+    def test_models_share_the_pooled_client(self, monkeypatch):
+        with StubOllamaServer(dim=8, answer_tokens=2) as stub:
+            monkeypatch.setattr(settings, "ollama_base_url", stub.url)
+            assert build_llm().invoke("Who works in Sales?") == "token0 token1 "
+            assert len(build_embeddings().embed_query("Sales")) == 8
+            assert get_ollama_client().list_models() == ["phi3"]
+            assert stub.requests == {"/api/generate": 1, "/api/embeddings": 1, "/api/tags": 1}
+
+    def test_url_resolution(self, monkeypatch):
+        monkeypatch.setattr(settings, "ollama_base_url", "http://ollama:11434/")
+        ollama = OllamaClient()
+        assert ollama.url("/api/tags") == "http://ollama:11434/api/tags"
+        assert ollama.url("http://other/api/embeddings") == "http://other/api/embeddings"
+        ollama.close()
+
+class TestHealthProber:
+    def test_probe_reports_missing_models(self, monkeypatch):
+        with StubOllamaServer() as stub:
+            monkeypatch.setattr(settings, "ollama_base_url", stub.url)
+            prober = HealthProber(OllamaClient(), required_models=["phi3", "nomic-embed-text"])
+            status = asyncio.run(prober.probe())
+        assert status["ollama_available"] is True
+        assert status["missing_models"] == ["nomic-embed-text"]
+        assert status["checked_at"] is not None and status["error"] is None
+
+    def test_unreachable_ollama(self, monkeypatch):
+        with StubOllamaServer() as stub:
+            url = stub.url
+        monkeypatch.setattr(settings, "ollama_base_url", url)
+        prober = HealthProber(OllamaClient(), timeout=1.0)
+        status = asyncio.run(prober.probe())
+        assert status["ollama_available"] is False
+        assert status["error"]
+
+    def test_background_loop(self, monkeypatch):
+        with StubOllamaServer() as stub:
+            monkeypatch.setattr(settings, "ollama_base_url", stub.url)
+            prober = HealthProber(OllamaClient(), interval=0.01)
+
+            async def run():
+                prober.start()
+                await asyncio.sleep(0.1)
+                await prober.stop()
+
+            asyncio.run(run())
+            assert stub.requests["/api/tags"] >= 2
+        assert prober.status()["ollama_available"] is True
+
+class TestHealthEndpoint:
+    def test_answers_from_cached_status(self, monkeypatch):
+        # Unroutable address: a live check here would hang until its timeout
+        monkeypatch.setattr(settings, "ollama_base_url", "http://10.255.255.1:11434")
+        monkeypatch.setattr(main.health_prober, "_status", {
+            "ollama_available": True, "missing_models": [], "latency_ms": 3.0, "error": None, "checked_at": 1.0,
+        })
+        monkeypatch.setattr(main, "rag_chain", None)
+        start = time.perf_counter()
+        data = client.get("/health").json()
+        assert time.perf_counter() - start < 1.0
+        assert data["ollama_available"] is True and data["ollama_checked_at"] == 1.0
+        assert data["status"] == "degraded"  # no index loaded
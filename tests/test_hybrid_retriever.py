@@ -0,0 +1,99 @@
+"""
+Test BM25 + vector retrieval with reciprocal rank fusion
+"""
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from rag_backend.rag_agent.docstore import iter_documents, load_vectorstore, save_vectorstore
+from rag_backend.rag_agent.hybrid_retriever import (
+    BM25Index, HybridRetriever, reciprocal_rank_fusion, tokenize,
+)
+
+PEOPLE = [
+    ("Alice Nguyen", "alice.nguyen@company.com", "Engineering", "Software Engineer"),
+    ("Bob Okafor", "bob.okafor@company.com", "Sales", "Account Executive"),
+    ("Carla Diaz", "carla.diaz@company.com", "Engineering", "Engineering Manager"),
+    ("Dmitri Petrov", "dmitri.petrov@company.com", "Finance", "Controller"),
+    ("Erin Walsh", "erin.walsh@company.com", "Marketing", "Content Strategist"),
+]
+
+def _documents():
+    return [
+        Document(
+            page_content=f"Name: {name} | Email: {email} | Department: {dept} | Title: {title}",
+            metadata={"row_index": i, "employee_key": email},
+        )
+        for i, (name, email, dept, title) in enumerate(PEOPLE)
+    ]
+
+def _retriever(tmp_path, **kwargs):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    docs = _documents()
+    store = FAISS.from_documents(docs, embeddings, ids=[d.metadata["employee_key"] for d in docs])
+    save_vectorstore(store, tmp_path)
+    served = load_vectorstore(tmp_path, embeddings)
+    ids, texts = zip(*[(doc_id, doc.page_content) for doc_id, doc in iter_documents(served)])
+    return HybridRetriever(vectorstore=served, bm25=BM25Index(ids, texts), **kwargs)
+
+class TestBM25:
+    def test_tokenize_keeps_email_and_parts(self):
+        tokens = tokenize("Email: Bob.Okafor@company.com")
+        assert "bob.okafor@company.com" in tokens
+        assert {"bob", "okafor", "company", "com"} <= set(tokens)
+
+    def test_rare_term_ranks_first(self):
+        docs = _documents()
+        index = BM25Index([d.metadata["employee_key"] for d in docs], [d.page_content for d in docs])
+        hits = index.search("Who is Dmitri Petrov?", k=3)
+        assert hits[0][0] == "dmitri.petrov@company.com"
+        assert index.search("zebra", k=3) == []
+
+class TestFusion:
+    def test_documents_in_both_lists_win(self):
+        a, b, c = (Document(page_content=x, metadata={"employee_key": x}) for x in "abc")
+        fused = reciprocal_rank_fusion([[a, b], [c, b]], weights=[0.5, 0.5], k=3)
+        assert fused[0] is b
+        assert len(fused) == 3
+
+    def test_weights_break_ties(self):
+        a, c = (Document(page_content=x, metadata={"employee_key": x}) for x in "ac")
+        assert reciprocal_rank_fusion([[a], [c]], weights=[0.2, 0.8], k=1) == [c]
+
+class TestHybridRetriever:
+    def test_exact_name_and_email_queries(self, tmp_path):
+        # Fake embeddings carry no meaning, so lean on the lexical ranking here
+        retriever = _retriever(tmp_path, k=2, fetch_k=5, vector_weight=0.3)
+        docs = retriever.get_relevant_documents("What department is Erin Walsh in?")
+        assert docs[0].metadata["employee_key"] == "erin.walsh@company.com"
+        assert len(docs) == 2
+        docs = retriever.get_relevant_documents("carla.diaz@company.com")
+        assert docs[0].metadata["employee_key"] == "carla.diaz@company.com"
+
+    def test_results_are_unique(self, tmp_path):
+        docs = _retriever(tmp_path, k=5, fetch_k=5).get_relevant_documents("Engineering")
+        keys = [d.metadata["employee_key"] for d in docs]
+        assert len(keys) == len(set(keys)) == 5
+
+class TestSavedLexicalIndex:
+    def test_loads_without_reading_documents(self, tmp_path, monkeypatch):
+        import rag_backend.rag_agent.metadata_filters as metadata_filters
+        import rag_backend.rag_agent.rag_chain as rag_chain
+        from rag_backend.rag_agent.embed_store import lexical_artifacts
+
+        embeddings = DeterministicFakeEmbedding(size=16)
+        docs = _documents()
+        store = FAISS.from_documents(docs, embeddings, ids=[d.metadata["employee_key"] for d in docs])
+        save_vectorstore(store, tmp_path, lexical_artifacts(store))
+        served = load_vectorstore(tmp_path, embeddings)
+
+        def no_scan(vectorstore):
+            raise AssertionError("read every document")
+
+        monkeypatch.setattr(rag_chain, "iter_indexed_documents", no_scan)
+        monkeypatch.setattr(metadata_filters, "iter_indexed_documents", no_scan)
+        monkeypatch.setattr(rag_chain.settings, "rag_retriever", "hybrid")
+        retriever = rag_chain.build_retriever(served)
+        scanned = BM25Index([d.metadata["employee_key"] for d in docs], [d.page_content for d in docs])
+        for query in ("Dmitri Petrov", "bob.okafor@company.com", "Engineering Manager"):
+            assert retriever.bm25.search(query, k=3) == scanned.search(query, k=3)
+        assert len(metadata_filters.metadata_index_for(served)) == len(docs)
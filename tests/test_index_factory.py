@@ -0,0 +1,42 @@
+"""
+Test configurable FAISS index construction and the recall benchmark
+"""
+import numpy as np
+from rag_backend.config import settings
+from rag_backend.rag_agent.index_benchmark import run_benchmark
+from rag_backend.rag_agent.index_factory import build_faiss_index
+
+class TestIndexFactory:
+    def test_builds_each_type(self, monkeypatch):
+        monkeypatch.setattr(settings, "faiss_pq_m", 8)
+        vectors = np.random.default_rng(0).normal(size=(400, 32)).astype(np.float32)
+        for index_type, cls in [("flat", "IndexFlatL2"), ("ivf_flat", "IndexIVFFlat"),
+                                ("hnsw", "IndexHNSWFlat"), ("ivf_pq", "IndexIVFPQ")]:
+            index = build_faiss_index(vectors, index_type)
+            assert type(index).__name__ == cls
+            assert index.ntotal == 400
+
+    def test_ivf_supports_mmr(self, monkeypatch):
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+
+        embeddings = HashingEmbeddings(dim=32)
+        texts = [f"Employee {i} works in team {i % 7}" for i in range(200)]
+        index = build_faiss_index(np.array(embeddings.embed_documents(texts), dtype=np.float32), "ivf_flat")
+        ids = [str(i) for i in range(len(texts))]
+        store = FAISS(embeddings, index, InMemoryDocstore({i: Document(page_content=t) for i, t in zip(ids, texts)}),
+                      dict(enumerate(ids)))
+        # MMR reconstructs candidate vectors by position
+        assert len(store.max_marginal_relevance_search("team 3", k=4, fetch_k=12)) == 4
+
+    def test_small_corpus_falls_back_to_flat(self):
+        vectors = np.random.default_rng(0).normal(size=(10, 32)).astype(np.float32)
+        assert type(build_faiss_index(vectors, "ivf_pq")).__name__ == "IndexFlatL2"
+
+    def test_benchmark_reports_recall(self):
+        vectors = np.random.default_rng(1).normal(size=(300, 16)).astype(np.float32)
+        report = run_benchmark(vectors, ["flat", "hnsw"], k=4, num_queries=20, ef_searches=[16, 64])
+        assert [r["index_type"] for r in report["results"]] == ["flat", "hnsw", "hnsw"]
+        assert report["results"][0]["recall_at_k"] == 1.0
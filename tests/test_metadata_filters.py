@@ -0,0 +1,118 @@
+"""
+Test structured metadata at ingest, filtered (and department-sharded) retrieval and /query filters
+"""
+import pandas as pd
+from langchain_community.llms.fake import FakeListLLM
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from fastapi.testclient import TestClient
+import rag_backend.main as main
+from rag_backend.rag_agent.context_budget import BudgetedRetrievalQA, ContextBudget
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+from rag_backend.rag_agent.hybrid_retriever import BM25Index, HybridRetriever
+from rag_backend.rag_agent.load_excel import load_excel_data
+from rag_backend.rag_agent.metadata_filters import build_metadata_index, filtered_search, metadata_index_for
+from rag_backend.rag_agent.query_filters import matches, normalize_filters
+from rag_backend.rag_agent.rag_chain import batch_retrieve, retrieve
+
+client = TestClient(main.app)
+
+DEPARTMENTS = ["Engineering", "Sales", "Finance", "Marketing"]
+
+def _vectorstore():
+    docs = [
+        Document(page_content=f"Name: Person {i} | Email: person{i}@company.com | Department: {dept}",
+                 metadata={"row_index": i, "employee_key": f"person{i}@company.com", "department": dept,
+                           "location": "Austin" if i % 2 else "Denver", "start_year": 2010 + i})
+        for i, dept in enumerate(DEPARTMENTS * 5)
+    ]
+    return FAISS.from_documents(docs, HashingEmbeddings(dim=64), ids=[d.metadata["employee_key"] for d in docs])
+
+def _chain(retriever, responses=("Answer",)):
+    return BudgetedRetrievalQA.from_chain_type(
+        llm=FakeListLLM(responses=list(responses) * 5), retriever=retriever,
+        return_source_documents=True, budget=ContextBudget(),
+    )
+
+def _hybrid(store, k=3):
+    ids, texts = zip(*[(key, store.docstore.search(key).page_content) for key in store.index_to_docstore_id.values()])
+    return HybridRetriever(vectorstore=store, bm25=BM25Index(ids, texts), k=k, fetch_k=8)
+
+class TestIngestMetadata:
+    def test_structured_fields(self, tmp_path):
+        path = tmp_path / "employees.xlsx"
+        pd.DataFrame({
+            "Name": ["Ada", "Grace"],
+            "Job Title": [" CTO ", None],
+            "Dept": ["Engineering", "Research"],
+            "Office": ["Austin", "Denver"],
+            "Start Date": pd.to_datetime(["2015-03-01", None]),
+        }).to_excel(path, index=False)
+        docs = load_excel_data(str(path))
+        assert docs[0].metadata["department"] == "Engineering"
+        assert docs[0].metadata["title"] == "CTO"
+        assert docs[0].metadata["location"] == "Austin"
+        assert docs[0].metadata["start_year"] == 2015
+        assert "title" not in docs[1].metadata and "start_year" not in docs[1].metadata
+
+class TestFilters:
+    def test_normalize_and_match(self):
+        filters = normalize_filters({"department": ["Sales ", "finance"], "location": "AUSTIN", "start_year_min": 2012})
+        assert filters == {"department": ["finance", "sales"], "location": ["austin"], "start_year_min": 2012}
+        assert matches({"department": "Sales", "location": "Austin", "start_year": 2013}, filters)
+        assert not matches({"department": "Sales", "location": "Austin"}, filters)
+        assert normalize_filters({"department": []}) is None
+
+    def test_mask_and_search_only_return_matches(self):
+        store = _vectorstore()
+        metadata_index = metadata_index_for(store)
+        filters = normalize_filters({"department": "sales", "start_year_max": 2020})
+        assert metadata_index.mask(filters).sum() == 3
+        vector = store.embeddings.embed_query("Person 4 Engineering")
+        positions = filtered_search(store, vector, 5, filters, metadata_index)[0]
+        assert sorted(p for p in positions if p != -1) == [1, 5, 9]
+
+    def test_shards_match_selector_search(self):
+        store = _vectorstore()
+        positions = sorted(store.index_to_docstore_id)
+        metadatas = [store.docstore.search(store.index_to_docstore_id[p]).metadata for p in positions]
+        plain = build_metadata_index(store, positions, metadatas, shards=False)
+        sharded = build_metadata_index(store, positions, metadatas, shards=True)
+        assert len(sharded.shards) == 4
+        vectors = [store.embeddings.embed_query(q) for q in ("Who is in Finance?", "person6@company.com")]
+        for spec in ({"department": "finance"}, {"department": ["sales", "marketing"], "location": "austin"}):
+            filters = normalize_filters(spec)
+            assert (filtered_search(store, vectors, 4, filters, sharded).tolist()
+                    == filtered_search(store, vectors, 4, filters, plain).tolist())
+
+class TestFilteredRetrieval:
+    def test_vector_retriever(self):
+        chain = _chain(_vectorstore().as_retriever(search_kwargs={"k": 3}))
+        docs = retrieve(chain, "person0@company.com", {"department": "Finance"})
+        assert len(docs) == 3
+        assert all(doc.metadata["department"] == "Finance" for doc in docs)
+
+    def test_hybrid_retriever_filters_both_sides(self):
+        chain = _chain(_hybrid(_vectorstore()))
+        hits, _ = batch_retrieve(chain, ["person0@company.com", "person0@company.com"],
+                                 [None, {"location": "Austin"}])
+        assert hits[0][0].metadata["employee_key"] == "person0@company.com"
+        assert hits[1] and all(doc.metadata["location"] == "Austin" for doc in hits[1])
+
+class TestQueryEndpointFilters:
+    def test_filters_reach_retrieval_and_cache(self, monkeypatch):
+        chain = _chain(_vectorstore().as_retriever(search_kwargs={"k": 2}), ["Filtered answer"])
+        monkeypatch.setattr(main, "rag_chain", chain)
+        monkeypatch.setattr(main, "query_router", None)
+        main.answer_cache.invalidate()
+        body = {"message": "Who works here?", "include_sources": True, "filters": {"department": "Marketing"}}
+        data = client.post("/query", json=body).json()
+        assert data["routing"]["params"] == {"filters": {"department": ["marketing"]}}
+        assert all(s["metadata"]["department"] == "Marketing" for s in data["sources"])
+        assert client.post("/query", json=body).json()["cached"] is True
+        # The same question without filters must not be served the filtered answer
+        assert main.answer_cache.get("Who works here?") is None
+
+    def test_unknown_filter_field_is_rejected(self):
+        response = client.post("/query", json={"message": "Who?", "filters": {"team": "Sales"}})
+        assert response.status_code == 422
@@ -0,0 +1,100 @@
+"""
+Test stage timing spans, the metrics registry and the /metrics endpoint
+"""
+import threading
+
+from langchain_community.llms.fake import FakeListLLM
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from fastapi.testclient import TestClient
+import rag_backend.main as main
+from rag_backend.metrics import Counter, Histogram, MetricsRegistry, StageTimings, activate, stage
+from rag_backend.rag_agent.context_budget import BudgetedRetrievalQA, ContextBudget
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings, TimedEmbeddings
+
+client = TestClient(main.app)
+
+def _chain():
+    docs = [Document(page_content=f"Name: Person {i} | Department: Sales", metadata={"employee_key": f"p{i}"})
+            for i in range(4)]
+    store = FAISS.from_documents(docs, TimedEmbeddings(HashingEmbeddings(dim=32)))
+    return BudgetedRetrievalQA.from_chain_type(
+        llm=FakeListLLM(responses=["Answer"] * 5), retriever=store.as_retriever(search_kwargs={"k": 2}),
+        return_source_documents=True, budget=ContextBudget(),
+    )
+
+class TestMetricTypes:
+    def test_counter_render(self):
+        counter = Counter("jobs_total", "Jobs run", ["kind"])
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        assert counter.value(kind="a") == 3
+        assert 'jobs_total{kind="a"} 3' in counter.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        lines = histogram.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{le="1"} 2' in lines
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+        assert "latency_seconds_count 3" in lines
+
+    def test_registry_includes_collector_gauges(self):
+        registry = MetricsRegistry()
+        registry.register(Counter("a_total", "A"))
+        registry.register_collector(lambda: [("queue_depth", "Queued", 4)])
+        registry.register_collector(lambda: [("rejected_total", "Rejected", 7)], "counter")
+        text = registry.render()
+        assert "# TYPE a_total counter" in text
+        assert "# TYPE queue_depth gauge\nqueue_depth 4" in text
+        assert "# TYPE rejected_total counter\nrejected_total 7" in text
+
+class TestStageTimings:
+    def test_spans_go_to_the_active_timings_only(self):
+        timings = StageTimings()
+        with activate(timings):
+            with stage("retrieval"):
+                pass
+            with stage("retrieval"):
+                pass
+        with stage("generation"):
+            pass
+        assert set(timings.to_ms()) == {"retrieval"}
+
+    def test_activation_is_per_thread(self):
+        timings = StageTimings()
+        with activate(timings):
+            thread = threading.Thread(target=lambda: stage("other").__enter__())
+            thread.start()
+            thread.join()
+        assert timings.to_seconds() == {}
+
+class TestTimingEndpoints:
+    def test_query_timing_breakdown(self, monkeypatch):
+        monkeypatch.setattr(main, "rag_chain", _chain())
+        monkeypatch.setattr(main, "query_router", None)
+        main.answer_cache.invalidate()
+        data = client.post("/query", json={"message": "Who is in Sales?", "include_timings": True}).json()
+        assert {"queue_wait", "retrieval", "embed_query", "context", "generation", "total"} <= set(data["timings"])
+        assert data["timings"]["total"] >= data["timings"]["generation"]
+
+        untimed = client.post("/query", json={"message": "Who is Person 2?"}).json()
+        assert untimed["timings"] is None
+
+    def test_metrics_endpoint(self, monkeypatch):
+        monkeypatch.setattr(main, "rag_chain", _chain())
+        monkeypatch.setattr(main, "query_router", None)
+        main.answer_cache.invalidate()
+        before = main.QUERIES_TOTAL.value(endpoint="query", route="rag")
+        client.post("/query", json={"message": "Who is Person 3?"})
+        assert main.QUERIES_TOTAL.value(endpoint="query", route="rag") == before + 1
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert 'rag_stage_seconds_count{stage="generation"}' in text
+        assert 'http_requests_total{method="POST",path="/query",status="200"}' in text
+        assert "rag_index_documents 4" in text
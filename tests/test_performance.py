@@ -1,17 +1,69 @@
 """
-Performance and load testing
+Performance benchmark harness: stub Ollama server, synthetic workbook and report comparison
 """
-import time
-from fastapi.testclient import TestClient
-from rag_backend.main import app
-
-client = TestClient(app)
-
-class TestPerformance:
-    def test_response_time(self):
-        start_time = time.time()
-        response = client.get("/health")
-        end_time = time.time()
-        response_time = end_time - start_time
-        assert response_time < 5.0
-        assert response.status_code == 200 
\ No newline at end of file
+import json
+
+import pytest
+import requests
+
+from rag_backend.benchmark import (
+    StubOllamaServer, compare_reports, latency_summary, run_benchmark, write_synthetic_workbook,
+)
+from rag_backend.config import settings
+from rag_backend.rag_agent.load_excel import load_excel_data
+
+@pytest.fixture(scope="module")
+def report():
+    before = settings.model_dump()
+    result = run_benchmark(rows=80, requests=12, concurrency=3, engine_repeats=5)
+    assert settings.model_dump() == before
+    return result
+
+class TestStubOllama:
+    def test_embeddings_are_deterministic(self):
+        with StubOllamaServer(dim=16) as stub:
+            first = requests.post(f"{stub.url}/api/embeddings", json={"prompt": "Sales"}).json()["embedding"]
+            second = requests.post(f"{stub.url}/api/embeddings", json={"prompt": "Sales"}).json()["embedding"]
+            assert first == second and len(first) == 16
+            assert requests.get(f"{stub.url}/api/tags").status_code == 200
+            assert stub.requests["/api/embeddings"] == 2
+
+    def test_streamed_generation(self):
+        with StubOllamaServer(answer_tokens=3) as stub:
+            response = requests.post(f"{stub.url}/api/generate/", json={"prompt": "hi"}, stream=True)
+            lines = [json.loads(line) for line in response.iter_lines() if line]
+            assert "".join(line["response"] for line in lines) == "token0 token1 token2 "
+            assert lines[-1]["done"] is True
+
+class TestSyntheticWorkbook:
+    def test_rows_become_documents(self, tmp_path):
+        path = write_synthetic_workbook(tmp_path / "employees.xlsx", 25)
+        docs = load_excel_data(str(path))
+        assert len(docs) == 25
+        assert len({d.metadata["employee_key"] for d in docs}) == 25
+        assert "Department: " in docs[0].page_content
+
+class TestBenchmark:
+    def test_report(self, report):
+        query = report["query"]
+        assert query["errors"] == 0 and query["qps"] > 0
+        latency = query["latency"]
+        assert latency["count"] == 12
+        assert latency["p50_ms"] <= latency["p95_ms"] <= latency["p99_ms"]
+        assert {"retrieval", "generation", "total"} <= set(query["stages_mean_ms"])
+        assert report["ingestion"]["embed_and_store_ms"] > 0
+        assert set(report["engine"]["operations"]) >= {"search_by_name", "search_by_department"}
+        assert report["stub_requests"]["/api/generate"] == 12
+
+    def test_compare_reports(self, report):
+        assert compare_reports(report, report) == []
+        slower = json.loads(json.dumps(report))
+        slower["query"]["latency"]["p95_ms"] *= 2
+        slower["query"]["qps"] /= 2
+        flagged = {r["metric"] for r in compare_reports(slower, report)}
+        assert flagged == {"query_p95_ms", "query_qps"}
+
+    def test_latency_summary(self):
+        summary = latency_summary(range(1, 101))
+        assert (summary["p50_ms"], summary["max_ms"]) == (50.5, 100)
+        assert latency_summary([]) == {"count": 0}
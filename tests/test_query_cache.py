@@ -0,0 +1,39 @@
+"""
+Test the RAG answer cache
+"""
+import time
+from rag_backend.rag_agent.query_cache import QueryCache, normalize_query
+
+class TestQueryCache:
+    def test_normalized_exact_hit(self):
+        cache = QueryCache(max_size=4, ttl=60)
+        cache.put("Who is the CTO?", {"result": "Ada"})
+        assert cache.get("  who is the cto ") == {"result": "Ada"}
+        assert normalize_query("Who  is the CTO?") == "who is the cto"
+
+    def test_lru_eviction_and_ttl(self):
+        cache = QueryCache(max_size=2, ttl=0.05)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        time.sleep(0.06)
+        assert cache.get("a") is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_semantic_hit(self):
+        vectors = {"who is the cto": [1.0, 0.0], "who s our cto": [0.99, 0.05], "finance staff": [0.0, 1.0]}
+        cache = QueryCache(similarity_threshold=0.95, embed_fn=lambda q: vectors[normalize_query(q)])
+        cache.put("Who is the CTO", "Ada", cache.embed("Who is the CTO"))
+        assert cache.get_similar(cache.embed("Who's our CTO")) == "Ada"
+        assert cache.get_similar(cache.embed("Finance staff")) is None
+
+    def test_invalidate_on_index_change(self):
+        cache = QueryCache()
+        cache.invalidate_if_changed(1)
+        cache.put("q", "a")
+        assert not cache.invalidate_if_changed(1)
+        assert cache.invalidate_if_changed(2)
+        assert cache.get("q") is None
@@ -0,0 +1,103 @@
+"""
+Test the bounded query worker pool
+"""
+import asyncio
+import threading
+import time
+import pytest
+from rag_backend.query_pool import QueryPool, PoolSaturatedError, PoolTimeoutError
+
+class TestQueryPool:
+    def test_runs_blocking_call(self):
+        pool = QueryPool(max_workers=1, max_in_flight=2, timeout=5)
+        assert asyncio.run(pool.run(lambda x: x * 2, 21)) == 42
+        assert pool.stats()["completed"] == 1
+
+    def test_rejects_when_saturated(self):
+        pool = QueryPool(max_workers=1, max_in_flight=1, timeout=5)
+
+        async def scenario():
+            slow = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+            await asyncio.sleep(0.05)
+            with pytest.raises(PoolSaturatedError):
+                await pool.run(lambda: None)
+            await slow
+
+        asyncio.run(scenario())
+        assert pool.stats()["rejected"] == 1
+
+    def test_timeout(self):
+        pool = QueryPool(max_workers=1, max_in_flight=1, timeout=0.05)
+        with pytest.raises(PoolTimeoutError):
+            asyncio.run(pool.run(time.sleep, 0.2))
+
+def _dispatch_order(pool, submissions):
+    """Hold the only worker busy, queue ``submissions`` as (label, priority, client), then record run order"""
+    order = []
+    gate = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(pool.run(gate.wait))
+        await asyncio.sleep(0.05)
+        queued = [asyncio.ensure_future(pool.run(order.append, label, priority=priority, client=client))
+                  for label, priority, client in submissions]
+        await asyncio.sleep(0.05)
+        gate.set()
+        await asyncio.gather(blocker, *queued)
+
+    asyncio.run(scenario())
+    return order
+
+class TestScheduling:
+    def test_interactive_before_bulk(self):
+        pool = QueryPool(max_workers=1, max_in_flight=10, timeout=5)
+        order = _dispatch_order(pool, [("b1", "bulk", "script"), ("i1", "interactive", "teams"),
+                                       ("b2", "bulk", "script"), ("i2", "interactive", "teams")])
+        assert order == ["i1", "i2", "b1", "b2"]
+
+    def test_round_robin_across_clients(self):
+        pool = QueryPool(max_workers=1, max_in_flight=10, timeout=5)
+        order = _dispatch_order(pool, [("a1", "bulk", "a"), ("a2", "bulk", "a"), ("a3", "bulk", "a"),
+                                       ("b1", "bulk", "b")])
+        assert order == ["a1", "b1", "a2", "a3"]
+
+    def test_bulk_is_shed_before_interactive(self):
+        pool = QueryPool(max_workers=1, max_in_flight=10, timeout=5, bulk_max_queue_depth=1)
+        gate = threading.Event()
+
+        async def scenario():
+            blocker = asyncio.ensure_future(pool.run(gate.wait))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(pool.run(lambda: None, priority="bulk"))
+            await asyncio.sleep(0.01)
+            with pytest.raises(PoolSaturatedError) as shed:
+                await pool.run(lambda: None, priority="bulk")
+            interactive = asyncio.ensure_future(pool.run(lambda: "ok"))
+            gate.set()
+            await asyncio.gather(blocker, queued)
+            return shed.value, await interactive
+
+        shed, answer = asyncio.run(scenario())
+        assert shed.priority == "bulk" and answer == "ok"
+        assert pool.stats()["rejected_by_priority"] == {"interactive": 0, "bulk": 1}
+
+    def test_timed_out_queued_work_is_skipped(self):
+        pool = QueryPool(max_workers=1, max_in_flight=5, timeout=0.1)
+        ran = []
+
+        async def scenario():
+            blocker = asyncio.ensure_future(pool.run(time.sleep, 0.3))
+            await asyncio.sleep(0.02)
+            with pytest.raises(PoolTimeoutError):
+                await pool.run(ran.append, "late")
+            with pytest.raises(PoolTimeoutError):
+                await blocker
+
+        asyncio.run(scenario())
+        time.sleep(0.3)
+        assert ran == [] and pool.stats()["in_flight"] == 0
+
+    def test_unknown_priority(self):
+        pool = QueryPool(max_workers=1, max_in_flight=1, timeout=5)
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(lambda: None, priority="urgent"))
@@ -0,0 +1,63 @@
+"""
+Test the structured query router
+"""
+import pandas as pd
+import pytest
+from rag_backend.rag_agent.advanced_queries import EmployeeQueryEngine
+from rag_backend.rag_agent.query_router import QueryRouter
+
+@pytest.fixture
+def router(tmp_path):
+    path = tmp_path / "employees.xlsx"
+    pd.DataFrame({
+        "Name": ["Ada Lovelace", "Grace Hopper", "Alan Turing", "Joan Clarke"],
+        "Title": ["Chief Technology Officer", "Engineer", "Analyst", "Analyst"],
+        "Department": ["Engineering", "Engineering", "Finance", "Finance"],
+        "Email": ["ada@corp.com", "grace@corp.com", "alan@corp.com", "joan@corp.com"],
+        "Start Date": ["2010-01-01", "2015-06-01", "2023-01-01", None],
+    }).to_excel(path, index=False)
+    return QueryRouter(EmployeeQueryEngine(str(path)))
+
+class TestQueryRouter:
+    def test_who_is_title_acronym(self, router):
+        decision = router.route("Who is the CTO?")
+        assert decision.route == "structured"
+        assert decision.intent == "who_is_title"
+        assert "Ada Lovelace" in decision.answer
+
+    def test_department_listing_and_count(self, router):
+        listing = router.route("Who works in Finance?")
+        assert listing.intent == "list_department"
+        assert len(listing.records) == 2
+        count = router.route("How many people are in the engineering department?")
+        assert count.intent == "count_department"
+        assert "2 employees" in count.answer
+        assert router.route("How many employees are there?").intent == "count_total"
+        assert router.route("How many people are in FINANCE?").params == {"department": "Finance"}
+
+    def test_experience_range(self, router):
+        decision = router.route("Which employees have more than 5 years of experience?")
+        assert decision.intent == "experience"
+        assert {r["name"] for r in decision.records} == {"Ada Lovelace", "Grace Hopper"}
+        assert decision.answer.startswith("2 employees have more than 5 years of service")
+
+    def test_experience_with_other_conditions_goes_to_rag(self, router):
+        # Extra conditions would be silently dropped by the experience lookup
+        assert router.route("Which employees in Finance have more than 5 years of experience?").route == "rag"
+        assert router.route("Who has at least 3 years of experience and a PhD?").route == "rag"
+        assert router.route("How many years of experience does Ada have?").route == "rag"
+
+    def test_open_ended_falls_back_to_rag(self, router):
+        assert router.route("Summarize the skills of our analysts").route == "rag"
+        assert router.route("Who works in Marketing?").route == "rag"
+
+    def test_query_endpoint_uses_fast_path(self, router, monkeypatch):
+        from fastapi.testclient import TestClient
+        import rag_backend.main as main
+
+        monkeypatch.setattr(main, "query_router", router)
+        response = TestClient(main.app).post("/query", json={"message": "Who works in Finance?", "include_sources": True})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["routing"]["route"] == "structured"
+        assert len(data["sources"]) == 2
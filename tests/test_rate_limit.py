@@ -0,0 +1,85 @@
+"""
+Test the per-client token-bucket rate limiter and its enforcement on query endpoints
+"""
+from fastapi.testclient import TestClient
+import rag_backend.main as main
+from rag_backend.rate_limit import TokenBucketLimiter
+
+client = TestClient(main.app)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBucket:
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        limiter = TokenBucketLimiter(capacity=2, refill_rate=1.0, clock=clock)
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("a") == 1.0
+        clock.now = 1.0
+        assert limiter.acquire("a") == 0
+        assert limiter.stats()["limited"] == 1
+
+    def test_clients_are_independent(self):
+        limiter = TokenBucketLimiter(capacity=1, refill_rate=0.1, clock=FakeClock())
+        assert limiter.acquire("a") == 0
+        assert limiter.acquire("b") == 0
+        assert limiter.acquire("a") > 0
+
+    def test_cost_is_capped_at_capacity(self):
+        limiter = TokenBucketLimiter(capacity=3, refill_rate=1.0, clock=FakeClock())
+        assert limiter.acquire("a", cost=10) == 0
+        assert limiter.acquire("a") == 1.0
+
+    def test_idle_clients_are_evicted(self):
+        limiter = TokenBucketLimiter(capacity=1, refill_rate=1.0, max_clients=2, clock=FakeClock())
+        for name in ("a", "b", "c"):
+            limiter.acquire(name)
+        assert limiter.stats()["clients"] == 2
+
+class TestEnforcement:
+    def _limit(self, monkeypatch, capacity):
+        monkeypatch.setattr(main.settings, "enable_rate_limiting", True)
+        monkeypatch.setattr(main, "rate_limiter", TokenBucketLimiter(capacity=capacity, refill_rate=0.001))
+        monkeypatch.setattr(main, "query_router", None)
+        monkeypatch.setattr(main, "rag_chain", None)
+
+    def test_query_is_limited_per_client(self, monkeypatch):
+        self._limit(monkeypatch, capacity=1)
+        monkeypatch.setattr(main.settings, "trusted_client_hosts", ["testclient"])
+        first = client.post("/query", json={"message": "Who is the CTO?"}, headers={"X-Client-Id": "alice"})
+        assert first.status_code == 503  # admitted; no chain loaded
+        second = client.post("/query", json={"message": "Who is the CTO?"}, headers={"X-Client-Id": "alice"})
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        other = client.post("/query", json={"message": "Who is the CTO?"}, headers={"X-Client-Id": "bob"})
+        assert other.status_code == 503
+
+    def test_client_id_needs_a_trusted_caller(self, monkeypatch):
+        self._limit(monkeypatch, capacity=1)
+        monkeypatch.setattr(main.settings, "client_id_secret", "s3cret")
+        query = {"message": "Who is the CTO?"}
+        assert client.post("/query", json=query, headers={"X-Client-Id": "alice"}).status_code == 503
+        # An untrusted caller cannot pick a fresh identity to escape its quota
+        assert client.post("/query", json=query, headers={"X-Client-Id": "mallory"}).status_code == 429
+        assert client.post("/query", json=query, headers={"X-Client-Id": "bob", "X-Client-Secret": "wrong"}).status_code == 429
+        assert client.post("/query", json=query, headers={"X-Client-Id": "bob", "X-Client-Secret": "s3cret"}).status_code == 503
+
+    def test_batch_spends_one_token_per_query(self, monkeypatch):
+        self._limit(monkeypatch, capacity=3)
+        batch = {"queries": [{"message": "a"}, {"message": "b"}]}
+        assert client.post("/query/batch", json=batch, headers={"X-Client-Id": "script"}).status_code == 200
+        assert client.post("/query/batch", json=batch, headers={"X-Client-Id": "script"}).status_code == 429
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(main.settings, "enable_rate_limiting", False)
+        monkeypatch.setattr(main, "rate_limiter", TokenBucketLimiter(capacity=1, refill_rate=0.001))
+        monkeypatch.setattr(main, "rag_chain", None)
+        monkeypatch.setattr(main, "query_router", None)
+        for _ in range(3):
+            assert client.post("/query", json={"message": "Who is the CTO?"}).status_code == 503
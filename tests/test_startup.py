@@ -0,0 +1,82 @@
+"""
+Test lazy imports, background initialization and the /ready endpoint
+"""
+import asyncio
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+from langchain_community.llms.fake import FakeListLLM
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+import rag_backend.main as main
+from rag_backend.benchmark import StubOllamaServer
+from rag_backend.config import settings
+from rag_backend.rag_agent.context_budget import BudgetedRetrievalQA
+from rag_backend.rag_agent.embedding_pipeline import HashingEmbeddings
+from rag_backend.rag_agent.rag_chain import warm_up
+from rag_backend.startup import StartupProgress
+
+client = TestClient(main.app)
+
+def _chain():
+    docs = [Document(page_content=f"Name: Person {i} | Department: Engineering", metadata={"row_index": i})
+            for i in range(4)]
+    store = FAISS.from_documents(docs, HashingEmbeddings(dim=32))
+    return BudgetedRetrievalQA.from_chain_type(
+        llm=FakeListLLM(responses=["ok"] * 5), retriever=store.as_retriever(search_kwargs={"k": 2}),
+        return_source_documents=True,
+    )
+
+def _fresh_startup(monkeypatch, stub, build):
+    monkeypatch.setattr(main, "startup", StartupProgress())
+    monkeypatch.setattr(main, "rag_chain", None)
+    monkeypatch.setattr(main, "loaded_index_version", None)
+    monkeypatch.setattr(main, "build_rag_chain", build)
+    monkeypatch.setattr(main.answer_cache, "embed_fn", None)
+    monkeypatch.setattr(settings, "ollama_base_url", stub.url)
+    monkeypatch.setattr(settings, "enable_query_router", False)
+    monkeypatch.setattr(settings, "index_watch_interval", 0)
+
+def test_app_import_skips_the_rag_pipeline():
+    code = ("import sys, rag_backend.main; "
+            "print(sorted(m for m in ('langchain', 'faiss', 'pandas') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+def test_warm_up_runs_retrieval_and_one_generation():
+    chain = _chain()
+    assert warm_up(chain, "Who works in Engineering?") == 2
+    assert chain.combine_documents_chain.llm_chain.llm.i == 1
+
+class TestInitialization:
+    def test_not_ready_until_initialized(self, monkeypatch):
+        with StubOllamaServer(dim=32) as stub:
+            _fresh_startup(monkeypatch, stub, _chain)
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["steps"]["index"]["status"] == "pending"
+
+            asyncio.run(main.initialize())
+            data = client.get("/ready").json()
+            assert client.get("/ready").status_code == 200
+            assert data["ready"] and data["finished"]
+            assert {name: step["status"] for name, step in data["steps"].items()} == {
+                "query_router": "skipped", "index": "done", "models": "done", "warmup": "done",
+            }
+            # Both models were loaded into Ollama before the first query
+            assert stub.requests["/api/generate"] == 1 and stub.requests["/api/embeddings"] == 1
+
+    def test_failed_index_keeps_app_unready(self, monkeypatch):
+        def broken():
+            raise FileNotFoundError("faiss_index/index.faiss")
+
+        with StubOllamaServer(dim=32) as stub:
+            _fresh_startup(monkeypatch, stub, broken)
+            monkeypatch.setattr(settings, "startup_preload_models", False)
+            asyncio.run(main.initialize())
+        response = client.get("/ready")
+        assert response.status_code == 503
+        steps = response.json()["steps"]
+        assert steps["index"]["status"] == "failed" and "index.faiss" in steps["index"]["error"]
+        assert steps["models"]["status"] == "skipped" and steps["warmup"]["status"] == "skipped"